@@ -0,0 +1,61 @@
+"""Spending analytics benchmark.
+
+    python -m benchmarks.bench_analytics [rows ...]
+
+For growing ledgers (1M rows by default at the top end) times the
+analytics report built from CurrencyRollup against the same series
+grouped straight from the raw Transaction rows, the cached
+LedgerService.analytics() hit that the dashboard and AI prompt see
+between writes, and add_transaction() with both rollups to maintain.
+"""
+import sys
+import time
+
+from pony.orm import db_session
+
+from . import synthetic
+from chatbotcrud.analytics import spending_report
+from chatbotcrud.core import LedgerService, RatesService
+from chatbotcrud.models import db
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def raw_grouping():
+    """The same grouping without a rollup: one GROUP BY over every transaction."""
+    with db_session:
+        return db.select(
+            'SELECT date("timestamp"), "category", "currency", SUM("amount_home_currency"), COUNT(*)'
+            ' FROM "Transaction" GROUP BY 1, 2, 3'
+        )
+
+
+def best_of(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes=DEFAULT_SIZES):
+    synthetic.bind_temp_database()
+    rates = RatesService()
+    rates.load()
+    ledger = LedgerService(rates)
+    print(f"{'rows':>10} {'rollup (ms)':>12} {'raw scan (ms)':>14} {'cached (ms)':>12} {'add (ms)':>9}")
+    for n in sizes:
+        synthetic.fill_ledger(n)
+        settings = ledger.settings()
+        rollup = best_of(lambda: spending_report(settings))
+        raw = best_of(raw_grouping, repeat=1)
+        ledger.analytics()
+        cached = best_of(ledger.analytics, repeat=100)
+        add = best_of(lambda: ledger.add_transaction("Coffee", 25000, 'IDR', "Makanan & Minuman"), repeat=20)
+        print(f"{n:>10} {rollup * 1000:>12.1f} {raw * 1000:>14.1f} {cached * 1000:>12.3f} {add * 1000:>9.2f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
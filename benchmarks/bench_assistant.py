@@ -0,0 +1,94 @@
+"""AI assistant time-to-first-token benchmark against a local mock server.
+
+    python -m benchmarks.bench_assistant [--tokens 100] [--delay 0.01]
+
+The mock emits one SSE event per token, delay seconds apart, like
+streamGenerateContent. Compares the old blocking request (the answer is
+only shown once the whole body has arrived, on a fresh connection) with
+GeminiClient.stream() on a pooled session: time to first token and time
+to the full answer, median over a few messages.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from chatbotcrud.assistant import GeminiClient, build_payload
+
+MESSAGES = 5
+
+
+class MockStream(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    tokens = 100
+    delay = 0.01
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i in range(self.tokens):
+            time.sleep(self.delay)
+            event = {'candidates': [{'content': {'parts': [{'text': f"token{i} "}]}}]}
+            data = f"data: {json.dumps(event)}\r\n\r\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def blocking(url, payload):
+    """The old path: one requests.post per message, text available only at the end."""
+    started = time.perf_counter()
+    response = requests.post(url, params={'alt': 'sse', 'key': 'bench'}, json=payload, timeout=30)
+    response.content
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+def streaming(client, payload):
+    async def run():
+        started = time.perf_counter()
+        first = None
+        async for _ in client.stream(payload):
+            if first is None:
+                first = time.perf_counter() - started
+        return first, time.perf_counter() - started
+    return asyncio.run(run())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time-to-first-token, blocking vs streaming.")
+    parser.add_argument('--tokens', type=int, default=MockStream.tokens)
+    parser.add_argument('--delay', type=float, default=MockStream.delay)
+    args = parser.parse_args(argv)
+
+    handler = type('Handler', (MockStream,), {'tokens': args.tokens, 'delay': args.delay})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1beta/models/mock:streamGenerateContent"
+    payload = build_payload([{"role": "user", "parts": [{"text": "Berapa sisa budget saya?"}]}])
+    client = GeminiClient('bench', url)
+
+    print(f"{args.tokens} tokens, {args.delay * 1000:.0f} ms apart, median of {MESSAGES} messages")
+    print(f"{'mode':<10} {'first token ms':>15} {'full answer ms':>15}")
+    for name, run in (('blocking', lambda: blocking(url, payload)), ('streaming', lambda: streaming(client, payload))):
+        results = [run() for _ in range(MESSAGES)]
+        first = statistics.median(r[0] for r in results)
+        full = statistics.median(r[1] for r in results)
+        print(f"{name:<10} {first * 1000:>15.1f} {full * 1000:>15.1f}")
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,56 @@
+"""Conversion audit log benchmark.
+
+    python -m benchmarks.bench_conversions [conversions]
+
+Records the same conversions in ConversionHistory three ways: one Pony
+insert and commit per conversion (what a naive audit hook would do),
+ConversionLog.record() on the hot path, and the batched flush that the
+log's thread pays later. Then times compact() on the result with a row
+cap below it.
+"""
+import sys
+import time
+
+from pony.orm import db_session
+
+from . import synthetic
+from chatbotcrud.conversions import ConversionLog
+from chatbotcrud.models import ConversionHistory
+
+DEFAULT_CONVERSIONS = 5_000
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def per_call_insert(n):
+    for i in range(n):
+        with db_session:
+            ConversionHistory(from_currency='USD', to_currency='IDR', amount=float(i), result=16000.0 * i)
+
+
+def main(n=DEFAULT_CONVERSIONS):
+    synthetic.bind_temp_database()
+    log = ConversionLog(max_rows=n * 2)
+
+    def record_all():
+        for i in range(n):
+            log.record('USD', 'IDR', float(i), 16000.0 * i)
+
+    naive = timed(lambda: per_call_insert(n))
+    record = timed(record_all)
+    flush = timed(log.flush)
+    log.max_rows = n // 2
+    compact = timed(log.compact)
+    print(f"{n:,} conversions")
+    print(f"  insert + commit per call: {naive * 1000:>9.1f} ms ({naive / n * 1e6:.1f} us each)")
+    print(f"  ConversionLog.record():   {record * 1000:>9.1f} ms ({record / n * 1e6:.1f} us each)")
+    print(f"  batched flush:            {flush * 1000:>9.1f} ms (one transaction)")
+    print(f"  compact to {log.max_rows:,} rows:    {compact * 1000:>9.1f} ms ({log.compacted:,} rows folded)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CONVERSIONS)
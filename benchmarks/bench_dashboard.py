@@ -0,0 +1,55 @@
+"""Dashboard aggregation benchmark.
+
+    python -m benchmarks.bench_dashboard [rows ...]
+
+Times the dashboard aggregates (read from the SpendingRollup table)
+against the old per-entity Python scans for growing ledgers.
+"""
+import sys
+import time
+
+from pony.orm import db_session
+
+from . import synthetic
+from chatbotcrud.aggregates import dashboard_aggregates, today_start
+from chatbotcrud.models import Transaction
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def python_scan():
+    """The pre-aggregation implementation: three full scans over Transaction."""
+    start = today_start()
+    with db_session:
+        total = sum(t.amount_home_currency for t in Transaction.select()[:])
+        today = sum(t.amount_home_currency for t in Transaction.select()[:] if t.timestamp >= start)
+        categories = {}
+        for t in Transaction.select()[:]:
+            entry = categories.setdefault(t.category, [0, 0])
+            entry[0] += t.amount_home_currency
+            entry[1] += 1
+    return total, today, categories
+
+
+def best_of(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes=DEFAULT_SIZES):
+    synthetic.bind_temp_database()
+    print(f"{'rows':>10} {'rollup (ms)':>12} {'python (ms)':>12}")
+    for n in sizes:
+        synthetic.fill_ledger(n)
+        sql_time = best_of(dashboard_aggregates)
+        py_time = best_of(python_scan, repeat=1)
+        print(f"{n:>10} {sql_time * 1000:>12.1f} {py_time * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,52 @@
+"""Ledger export benchmark.
+
+    python -m benchmarks.bench_export [rows]
+
+Fills a fresh database with synthetic transactions (1M by default),
+exports them in every format and reports time, rows/sec and file size.
+Peak traced memory is measured in a second run per format, at the full
+size and at a tenth of it, to show it depends on the chunk size only.
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from . import synthetic
+from chatbotcrud.export import COLUMNAR_EXTENSION, FORMATS, export_table
+
+DEFAULT_ROWS = 1_000_000
+EXTENSIONS = {'csv': '.csv', 'jsonl': '.jsonl', 'columnar': COLUMNAR_EXTENSION}
+
+
+def traced_peak(path, fmt):
+    tracemalloc.start()
+    export_table('transactions', path, fmt=fmt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(rows=DEFAULT_ROWS):
+    synthetic.bind_temp_database()
+    out_dir = tempfile.mkdtemp(prefix='tmm-export-')
+    peaks = {}
+    for size in (rows // 10, rows):
+        synthetic.fill_ledger(size)
+        for fmt in FORMATS:
+            path = os.path.join(out_dir, 'ledger' + EXTENSIONS[fmt])
+            peaks[fmt, size] = traced_peak(path, fmt)
+
+    print(f"{rows} rows")
+    print(f"{'format':>9} {'seconds':>8} {'rows/sec':>10} {'MB':>7} "
+          f"{'peak KiB @' + str(rows // 10):>16} {'peak KiB @' + str(rows):>16}")
+    for fmt in FORMATS:
+        path = os.path.join(out_dir, 'ledger' + EXTENSIONS[fmt])
+        result = export_table('transactions', path, fmt=fmt)
+        print(f"{fmt:>9} {result['seconds']:>8.2f} {result['rows_per_sec']:>10,.0f} "
+              f"{result['bytes'] / 1e6:>7.1f} {peaks[fmt, rows // 10] / 1024:>16,.0f} "
+              f"{peaks[fmt, rows] / 1024:>16,.0f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
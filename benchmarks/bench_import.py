@@ -0,0 +1,53 @@
+"""Statement import throughput.
+
+    python -m benchmarks.bench_import [rows]
+
+Writes a synthetic CSV statement, imports it into a fresh database with
+import_statement() at a few chunk sizes and reports rows/sec. Peak
+memory (which depends on the chunk size, not the file size) is measured
+in a separate run because tracemalloc slows the import down several
+times.
+"""
+import csv
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from . import synthetic
+from chatbotcrud.importer import import_statement
+from chatbotcrud.rates import RateCache, RateHistoryIndex
+
+DEFAULT_ROWS = 100_000
+CHUNK_SIZES = (500, 5000, 20000)
+
+
+def write_statement(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Description', 'Amount', 'Currency', 'Category'])
+        for description, amount, currency, _, category, timestamp in synthetic.generate_rows(rows):
+            writer.writerow([timestamp, description, amount, currency, category])
+
+
+def main(rows=DEFAULT_ROWS):
+    synthetic.bind_temp_database()
+    path = os.path.join(tempfile.mkdtemp(prefix='tmm-import-'), 'statement.csv')
+    write_statement(path, rows)
+    print(f"{rows} rows, {os.path.getsize(path) / 1e6:.1f} MB CSV")
+    for chunk_size in CHUNK_SIZES:
+        synthetic.clear_ledger()
+        result = import_statement(path, RateCache(), history=RateHistoryIndex(),
+                                  chunk_size=chunk_size, restart=True)
+        synthetic.clear_ledger()
+        tracemalloc.start()
+        import_statement(path, RateCache(), history=RateHistoryIndex(),
+                         chunk_size=chunk_size, restart=True)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  chunk {chunk_size:>6}: {result['seconds']:.2f}s, "
+              f"{result['rows_per_sec']:>9,.0f} rows/sec, peak {peak / 1024:,.0f} KiB")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
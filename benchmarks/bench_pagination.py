@@ -0,0 +1,42 @@
+"""Recent-transactions paging benchmark.
+
+    python -m benchmarks.bench_pagination [rows]
+
+Walks the whole history page by page with TransactionPager and reports
+per-page query time near the start, middle and end of the ledger together
+with the memory held by the pager.
+"""
+import sys
+import time
+import tracemalloc
+
+from . import synthetic
+from chatbotcrud.pagination import TransactionPager
+
+DEFAULT_ROWS = 100_000
+
+
+def main(rows=DEFAULT_ROWS):
+    synthetic.bind_temp_database()
+    synthetic.fill_ledger(rows)
+    pager = TransactionPager()
+    tracemalloc.start()
+    pager.current()
+    timings = []
+    while pager.has_older():
+        started = time.perf_counter()
+        pager.older()
+        timings.append(time.perf_counter() - started)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pages = len(timings) + 1
+    print(f"{rows} rows, {pages} pages of {pager.page_size}, {pager.queries} queries")
+    for label, chunk in (('first 100', timings[:100]), ('middle 100', timings[pages // 2 - 50:pages // 2 + 50]),
+                         ('last 100', timings[-100:])):
+        print(f"  {label:>10}: {sum(chunk) / len(chunk) * 1000:.3f} ms/page")
+    print(f"  memory: {current / 1024:.0f} KiB held, {peak / 1024:.0f} KiB peak")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
@@ -0,0 +1,100 @@
+"""Per-keystroke latency of the live conversion preview.
+
+    python -m benchmarks.bench_preview [sessions]
+
+Replays typed amounts ("1", "15", "150", ...) across all currencies and
+times each keystroke three ways: the old path (settings query plus
+conversion for every key), the memoised preview on first sight of an
+amount, and the memoised preview when the amount was typed before. It
+then feeds a burst of keystrokes 40 ms apart through the debounce to
+show how many previews are actually computed.
+"""
+import asyncio
+import sys
+import time
+
+from pony.orm import db_session
+
+from . import synthetic
+from chatbotcrud.models import ExchangeRate, UserSettings
+from chatbotcrud.preview import (
+    ConversionPreview, PREVIEW_CACHE_SIZE, PREVIEW_DEBOUNCE, parse_amount,
+)
+from chatbotcrud.rates import RateCache
+
+DEFAULT_SESSIONS = 200
+AMOUNTS = ('1500000', '27500', '98000', '350')
+KEY_INTERVAL = 0.04
+
+
+def keystrokes(sessions):
+    for i in range(sessions):
+        amount = AMOUNTS[i % len(AMOUNTS)]
+        currency = synthetic.CURRENCIES[i % len(synthetic.CURRENCIES)]
+        for end in range(1, len(amount) + 1):
+            yield amount[:end], currency
+
+
+def old_path(rate_cache, amount_text, currency_code):
+    amount = parse_amount(amount_text)
+    with db_session:
+        settings = UserSettings.select().first()
+        home_currency = settings.home_currency
+    converted = rate_cache.convert(amount, currency_code)
+    return f"≈ {converted:,.0f} {home_currency}" if currency_code != home_currency else ""
+
+
+def time_keys(func, keys):
+    started = time.perf_counter()
+    for amount_text, currency_code in keys:
+        func(amount_text, currency_code)
+    return (time.perf_counter() - started) / len(keys)
+
+
+async def debounced_burst(preview, amount_text):
+    loop = asyncio.get_running_loop()
+    computed = []
+    handle = None
+
+    def update():
+        computed.append(preview.text(typed, 'USD'))
+
+    for end in range(1, len(amount_text) + 1):
+        typed = amount_text[:end]
+        if handle is not None:
+            handle.cancel()
+        handle = loop.call_later(PREVIEW_DEBOUNCE, update)
+        await asyncio.sleep(KEY_INTERVAL)
+    await asyncio.sleep(PREVIEW_DEBOUNCE * 2)
+    return computed
+
+
+def main(sessions=DEFAULT_SESSIONS):
+    synthetic.bind_temp_database()
+    with db_session:
+        for i, code in enumerate(synthetic.CURRENCIES):
+            if code != 'IDR':
+                ExchangeRate(currency_code=code, rate=0.0001 * (i + 1))
+    rate_cache = RateCache()
+    rate_cache.load()
+    keys = list(keystrokes(sessions))
+
+    old = time_keys(lambda a, c: old_path(rate_cache, a, c), keys)
+    # Sebanyak yang muat di LRU, supaya putaran kedua benar-benar hit
+    distinct = list(dict.fromkeys(keys))[:PREVIEW_CACHE_SIZE]
+    preview = ConversionPreview(rate_cache)
+    cold = time_keys(preview.text, distinct)
+    warm = time_keys(preview.text, distinct)
+    print(f"{len(keys)} keystrokes")
+    print(f"  settings query + convert: {old * 1e6:8.1f} us/key")
+    print(f"  preview, first sight:     {cold * 1e6:8.1f} us/key")
+    print(f"  preview, memoised:        {warm * 1e6:8.1f} us/key  {preview.stats()}")
+
+    typed = AMOUNTS[0]
+    computed = asyncio.run(debounced_burst(ConversionPreview(rate_cache), typed))
+    print(f"  debounce: {len(typed)} keys {KEY_INTERVAL * 1000:.0f} ms apart -> "
+          f"{len(computed)} preview(s), last {computed[-1]!r}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SESSIONS)
@@ -0,0 +1,70 @@
+"""Ledger repricing benchmark.
+
+    python -m benchmarks.bench_reprice [rows ...]
+
+Times convert_many() on its own and full reprice_ledger() runs after a
+home-currency change, at current rates and at each transaction's
+historical rate. Exits with status 1 if repricing 100k rows (either way)
+takes REPRICE_TARGET seconds or more.
+"""
+import sys
+import time
+from datetime import date, timedelta
+
+from pony.orm import db_session
+
+from . import synthetic
+from chatbotcrud.models import ExchangeRate, UserSettings
+from chatbotcrud.rates import RateCache, RateHistoryIndex, record_rate_history, reprice_ledger
+
+DEFAULT_SIZES = (10_000, 100_000)
+# Target: reprice 100k transactions well under a second
+TARGET_ROWS = 100_000
+REPRICE_TARGET = 1.0
+
+
+def seed_rates():
+    with db_session:
+        for code in synthetic.CURRENCIES:
+            if code != 'IDR' and not ExchangeRate.exists(currency_code=code):
+                ExchangeRate(currency_code=code, rate=1 / (1000 + len(code) * 37.0))
+        UserSettings.select().first().home_currency = 'USD'
+        today = date.today()
+        for offset in range(120):
+            record_rate_history({r.currency_code: r.rate * (1 + offset / 1000) for r in ExchangeRate.select()},
+                                today - timedelta(days=offset))
+
+
+def main(sizes=DEFAULT_SIZES):
+    synthetic.bind_temp_database()
+    seed_rates()
+    cache = RateCache()
+    missed = []
+    print(f"{'rows':>10} {'convert_many (ms)':>18} {'reprice (ms)':>13} {'historical (ms)':>16}")
+    for n in sizes:
+        synthetic.fill_ledger(n)
+        rows = list(synthetic.generate_rows(n))
+        amounts = [row[1] for row in rows]
+        currencies = [row[2] for row in rows]
+
+        started = time.perf_counter()
+        cache.convert_many(amounts, currencies)
+        convert_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        reprice_ledger(cache)
+        reprice_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        reprice_ledger(cache, history=RateHistoryIndex())
+        history_time = time.perf_counter() - started
+        print(f"{n:>10} {convert_time * 1000:>18.1f} {reprice_time * 1000:>13.1f} {history_time * 1000:>16.1f}")
+        if n == TARGET_ROWS and max(reprice_time, history_time) >= REPRICE_TARGET:
+            missed.append(n)
+    for n in missed:
+        print(f"MISSED TARGET: repricing {n:,} rows took {REPRICE_TARGET:.1f} s or more")
+    return 1 if missed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES))
@@ -0,0 +1,53 @@
+"""Transaction search benchmark.
+
+    python -m benchmarks.bench_search [rows]
+
+Fills a ledger whose descriptions are drawn from a small travel
+vocabulary (so common words match tens of thousands of rows), then types
+a few queries one keystroke at a time and times search_transactions()
+for every prefix against the LIKE '%...%' scan it replaces.
+"""
+import statistics
+import sys
+import time
+
+from pony.orm import db_session
+
+from . import synthetic
+from chatbotcrud.models import db
+from chatbotcrud.search import SEARCH_LIMIT, search_transactions
+
+DEFAULT_ROWS = 500_000
+QUERIES = ("kopi", "nasi goreng", "belanja", "tokyo ramen 4242", "12345")
+
+
+def like_scan(text):
+    """The pre-FTS way: a substring scan over both columns."""
+    with db_session:
+        return db.select(
+            'SELECT "id" FROM "Transaction" WHERE "description" LIKE $pattern OR "category" LIKE $pattern'
+            ' ORDER BY "timestamp" DESC LIMIT $limit', {'pattern': f"%{text}%", 'limit': SEARCH_LIMIT})
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main(rows=DEFAULT_ROWS):
+    synthetic.bind_temp_database()
+    started = time.perf_counter()
+    synthetic.fill_ledger(rows, words=synthetic.DESCRIPTION_WORDS)
+    print(f"{rows:,} rows inserted and indexed in {time.perf_counter() - started:.1f} s")
+    print(f"{'query':<20} {'results':>8} {'fts max (ms)':>13} {'fts median (ms)':>16} {'like (ms)':>10}")
+    for query in QUERIES:
+        keystrokes = [timed(search_transactions, query[:i]) for i in range(1, len(query) + 1)]
+        elapsed = [seconds for seconds, _ in keystrokes]
+        like, _ = timed(like_scan, query)
+        print(f"{query:<20} {len(keystrokes[-1][1]):>8} {max(elapsed) * 1000:>13.1f}"
+              f" {statistics.median(elapsed) * 1000:>16.2f} {like * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
@@ -0,0 +1,151 @@
+"""SQLite connection tuning benchmark.
+
+    python -m benchmarks.bench_sqlite [rows] [--actions 200]
+
+Runs the same user actions under two setups, each in a fresh process
+because the pragmas are applied when Pony opens its connection:
+
+- default: rollback journal, synchronous=FULL, SQLite's default cache and
+  no mmap; every helper opens its own db_session, as the app used to.
+- tuned: models.SQLITE_PRAGMAS (WAL, synchronous=NORMAL, larger cache,
+  mmap); each action runs in one db_session.
+
+Actions are a dashboard refresh (summary, recent page, home currency) and
+an add-and-refresh (insert a transaction, then refresh the dashboard).
+Reports latency, commits and SQL statements per action, plus fsyncs per
+action estimated from the commits: with a rollback journal and
+synchronous=FULL every commit syncs the journal twice and the database
+file once; in WAL mode with synchronous=NORMAL commits do not sync at all
+and only checkpoints do (one sync of the WAL and one of the database).
+The tuned run forces one checkpoint after each action loop and counts it,
+which overstates its syncs: on its own SQLite only checkpoints every
+wal_autocheckpoint (1000) pages.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import nullcontext
+
+from . import SRC_DIR
+
+DEFAULT_ROWS = 100_000
+DEFAULT_ACTIONS = 200
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'DELETE'),
+    ('synchronous', 'FULL'),
+    ('cache_size', -2000),
+    ('mmap_size', 0),
+)
+SYNCS_PER_COMMIT = {'default': 3, 'tuned': 0}
+SYNCS_PER_CHECKPOINT = 2
+
+
+def run_config(config, rows, actions):
+    """Measure one setup in this process; must run before anything binds the database."""
+    from pony.orm import db_session
+
+    from chatbotcrud import models
+    from chatbotcrud.core import LedgerService, RatesService
+    from chatbotcrud.diagnostics import statement_listener
+    from chatbotcrud.pagination import TransactionPager
+
+    if config == 'default':
+        models.SQLITE_PRAGMAS = DEFAULT_PRAGMAS
+    from . import synthetic
+
+    db_path = synthetic.bind_temp_database()
+    synthetic.fill_ledger(rows)
+    rates = RatesService()
+    rates.load()
+    ledger = LedgerService(rates)
+    session = db_session if config == 'tuned' else nullcontext()
+
+    def refresh():
+        ledger.summary()
+        TransactionPager(prefetch=False).current()
+        rates.home_currency()
+
+    def dashboard():
+        with session:
+            refresh()
+
+    def add_and_refresh():
+        with session:
+            ledger.add_transaction("Benchmark", 12.5, 'USD', "Lainnya")
+            refresh()
+
+    results = {}
+    for name, action in (('dashboard', dashboard), ('add_and_refresh', add_and_refresh)):
+        statements = []
+        timings = []
+        with statement_listener(statements.append):
+            for _ in range(actions):
+                started = time.perf_counter()
+                action()
+                timings.append(time.perf_counter() - started)
+        commits = sum(1 for sql in statements if sql.startswith('COMMIT'))
+        fsyncs = commits * SYNCS_PER_COMMIT[config]
+        if config == 'tuned':
+            # Checkpoint otomatis tiap wal_autocheckpoint halaman; di sini dipaksa sekali per putaran
+            _checkpoint(db_path)
+            fsyncs += SYNCS_PER_CHECKPOINT
+        results[name] = {
+            'median_ms': statistics.median(timings) * 1000,
+            'p95_ms': sorted(timings)[int(len(timings) * 0.95)] * 1000,
+            'commits': commits / actions,
+            'statements': len(statements) / actions,
+            'fsyncs': fsyncs / actions,
+        }
+    return results
+
+
+def _checkpoint(db_path):
+    """Force a WAL checkpoint from a separate connection (Pony's is idle between actions)."""
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        connection.close()
+
+
+def measure(config, rows, actions):
+    """Run run_config in a fresh process and return its results."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.getcwd()]))
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_sqlite', str(rows), '--actions', str(actions),
+         '--config', config],
+        env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare default and tuned SQLite settings.")
+    parser.add_argument('rows', type=int, nargs='?', default=DEFAULT_ROWS)
+    parser.add_argument('--actions', type=int, default=DEFAULT_ACTIONS)
+    parser.add_argument('--config', choices=sorted(SYNCS_PER_COMMIT), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.config:
+        print(json.dumps(run_config(args.config, args.rows, args.actions)))
+        return 0
+
+    print(f"{args.rows:,} transactions, {args.actions} actions each")
+    print(f"{'action':<17} {'setup':<8} {'median ms':>10} {'p95 ms':>8} {'commits':>8} "
+          f"{'statements':>11} {'fsyncs*':>8}")
+    results = {config: measure(config, args.rows, args.actions) for config in ('default', 'tuned')}
+    for action in ('dashboard', 'add_and_refresh'):
+        for config in ('default', 'tuned'):
+            r = results[config][action]
+            print(f"{action:<17} {config:<8} {r['median_ms']:>10.3f} {r['p95_ms']:>8.3f} "
+                  f"{r['commits']:>8.2f} {r['statements']:>11.1f} {r['fsyncs']:>8.2f}")
+    print("* per action, estimated from commits and WAL checkpoints (see module docstring)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""Cold-start benchmark against a local exchange-rate stub.
+
+    python -m benchmarks.bench_startup
+
+Serves a fake exchangerate-api endpoint that answers immediately, answers
+after a delay, or accepts connections and never answers, then starts the
+app in a fresh process per mode and reports time-to-first-window. For
+comparison it also times the blocking fetch that used to run before the
+window was created.
+
+Needs the toga dummy backend (pip install toga-dummy).
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SLOW_DELAY = 3.0
+MODES = ('fast', 'slow', 'dead')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = json.dumps({
+            'result': 'success',
+            'conversion_rates': {'IDR': 1, 'USD': 0.000061, 'JPY': 0.0094},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(mode):
+    """Start a stub for mode and return (url, stop)."""
+    if mode == 'dead':
+        # Listening socket that never accepts: connect succeeds, reads hang
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(1)
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/latest/IDR", sock.close
+
+    handler = type('Handler', (StubHandler,), {'delay': SLOW_DELAY if mode == 'slow' else 0.0})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+    return f"http://127.0.0.1:{server.server_port}/latest/IDR", stop
+
+
+def child(url):
+    """Runs in the subprocess: start the app and time it."""
+    os.environ.setdefault('TOGA_BACKEND', 'toga_dummy')
+    from chatbotcrud import app as app_module
+
+    app_module.EXCHANGE_RATE_API_KEY = 'benchmark'
+    app_module.EXCHANGE_RATE_API_URL = url
+
+    started = time.perf_counter()
+    app = app_module.main()
+    first_window = time.perf_counter() - started
+
+    started = time.perf_counter()
+    app.update_exchange_rates_from_api(force=True)
+    blocking_fetch = time.perf_counter() - started
+    print(json.dumps({'first_window': first_window, 'blocking_fetch': blocking_fetch}))
+
+
+def run_mode(mode):
+    url, stop = start_stub(mode)
+    try:
+        env = dict(os.environ, HOME=tempfile.mkdtemp(prefix='tmm-startup-'))
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_startup', '--child', url],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    finally:
+        stop()
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'stub':>6} {'first window (ms)':>18} {'blocking fetch (ms)':>20}")
+    for mode in MODES:
+        result = run_mode(mode)
+        print(f"{mode:>6} {result['first_window'] * 1000:>18.1f} {result['blocking_fetch'] * 1000:>20.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        child(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,236 @@
+"""Benchmark suite with a tracked baseline.
+
+    python -m benchmarks.suite [--sizes 1000 100000 1000000] [--update] [--threshold 0.25]
+
+Fills synthetic ledgers of each size (every CURRENCY_MAP currency and
+TRAVEL_CATEGORIES entry) and times what the dashboard does per refresh:
+the financial summary, the category breakdown and the recent-transactions
+page, each including the table rows it produces. It also times bulk and
+single conversions, opening the database headless (a fresh process per
+size) and time-to-first-window of the app.
+
+Every metric is the median of many runs (REPEAT in process,
+SUBPROCESS_REPEAT for the fresh-process startups), so one lucky or
+unlucky run moves neither the baseline nor the result.
+
+Results go to benchmarks/results.json. They are compared with
+benchmarks/baseline.json and the run exits with status 1 if any tracked
+metric is slower than its baseline by more than the threshold and by
+more than its noise floor: an absolute floor in NOISE_FLOORS for the
+in-process timings, and SUBPROCESS_NOISE (a fraction of the baseline)
+for the startups, whose jitter grows with the time itself. --update
+writes the results as the new baseline; a missing baseline is created
+on the first run. Timings are machine-specific, so refresh the baseline
+with --update on the machine that enforces it.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from . import SRC_DIR, synthetic
+from chatbotcrud.core import LedgerService, RatesService
+from chatbotcrud.models import CURRENCY_MAP
+from chatbotcrud.pagination import TransactionPager
+from chatbotcrud.tables import apply_rows, category_rows, transaction_rows
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_PATH = os.path.join(BENCH_DIR, 'results.json')
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.25
+# Selisih absolut (detik) di bawah ini dianggap noise, berapa pun persentasenya
+NOISE_FLOORS = {
+    'financial_summary': 0.001,
+    'category_breakdown': 0.001,
+    'recent_transactions': 0.001,
+    'convert_many_100k': 0.01,
+    'convert_single_100k': 0.01,
+}
+DEFAULT_NOISE_FLOOR = 0.001
+# Startup di proses baru: noise sebanding dengan waktunya, jadi floor-nya relatif
+SUBPROCESS_METRICS = ('headless_startup', 'window_startup')
+SUBPROCESS_NOISE = 0.5
+CONVERSIONS = 100_000
+REPEAT = 41
+SUBPROCESS_REPEAT = 9
+
+try:
+    from toga.sources import ListSource
+except ImportError:
+    ListSource = None
+
+
+def median_of(func, repeat=REPEAT):
+    """Median seconds per call of func, with the garbage collector paused like timeit does."""
+    timings = []
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if collecting:
+            gc.enable()
+    return statistics.median(timings)
+
+
+def fill_table(accessors, rows):
+    """Load rows into a fresh ListSource like a first dashboard refresh (skipped without toga-core)."""
+    if ListSource is not None:
+        apply_rows(ListSource(accessors=accessors), rows)
+
+
+def dashboard_metrics(ledger):
+    """Seconds per dashboard step on the ledger currently bound."""
+    home_currency = ledger.rates.home_currency()
+
+    def category_breakdown():
+        rows = category_rows(ledger.summary()['categories'], home_currency)
+        fill_table(['category', 'amount', 'count'], rows)
+
+    def recent_transactions():
+        rows = transaction_rows(TransactionPager(prefetch=False).current(), home_currency)
+        fill_table(['description', 'amount', 'category', 'date'], rows)
+
+    return {
+        'financial_summary': median_of(ledger.summary),
+        'category_breakdown': median_of(category_breakdown),
+        'recent_transactions': median_of(recent_transactions),
+    }
+
+
+def conversion_metrics(rates):
+    currencies = list(CURRENCY_MAP.values())
+    amounts = [float(i % 1000 + 1) for i in range(CONVERSIONS)]
+    codes = [currencies[i % len(currencies)] for i in range(CONVERSIONS)]
+
+    def one_by_one():
+        convert = rates.convert
+        for amount, code in zip(amounts, codes):
+            convert(amount, code)
+
+    return {
+        'convert_many_100k': median_of(lambda: rates.cache.convert_many(amounts, codes)),
+        'convert_single_100k': median_of(one_by_one),
+    }
+
+
+def headless_startup(db_path, repeat=SUBPROCESS_REPEAT):
+    """Fresh-process time to import the core and open db_path."""
+    code = ("import sys, time; started = time.perf_counter(); "
+            "from chatbotcrud.core import open_ledger; open_ledger(sys.argv[1]); "
+            "print(time.perf_counter() - started)")
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code, db_path], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def window_startup(repeat=SUBPROCESS_REPEAT):
+    """Time-to-first-window from bench_startup, or None without the toga dummy backend."""
+    from . import bench_startup
+
+    try:
+        return statistics.median(bench_startup.run_mode('fast')['first_window'] for _ in range(repeat))
+    except (subprocess.CalledProcessError, ValueError, IndexError):
+        return None
+
+
+def run(sizes):
+    db_path = synthetic.bind_temp_database()
+    rates = RatesService()
+    ledger = LedgerService(rates)
+    metrics = {}
+    for size in sizes:
+        synthetic.fill_ledger(size)
+        rates.load()
+        for name, seconds in dashboard_metrics(ledger).items():
+            metrics[f'{name}@{size}'] = seconds
+        metrics[f'headless_startup@{size}'] = headless_startup(db_path)
+    metrics.update(conversion_metrics(rates))
+    startup = window_startup()
+    if startup is not None:
+        metrics['window_startup'] = startup
+    return metrics
+
+
+def noise_floor(name, previous):
+    """Slowdown of metric name (in seconds) that is never reported as a regression."""
+    metric = name.split('@')[0]
+    if metric in SUBPROCESS_METRICS:
+        return previous * SUBPROCESS_NOISE
+    return NOISE_FLOORS.get(metric, DEFAULT_NOISE_FLOOR)
+
+
+def compare(metrics, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return (name, baseline, current) for every metric that regressed past threshold."""
+    regressions = []
+    for name, current in sorted(metrics.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current > previous * (1 + threshold) and current - previous > noise_floor(name, previous):
+            regressions.append((name, previous, current))
+    return regressions
+
+
+def load_metrics(path):
+    with open(path) as f:
+        return json.load(f)['metrics']
+
+
+def write_metrics(path, metrics):
+    with open(path, 'w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': f"{platform.system()} {platform.machine()}",
+            'metrics': metrics,
+        }, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against the tracked baseline.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline (default 0.25)")
+    parser.add_argument('--update', action='store_true', help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    metrics = run(args.sizes)
+    write_metrics(RESULTS_PATH, metrics)
+    baseline = load_metrics(args.baseline) if os.path.exists(args.baseline) else {}
+
+    print(f"{'metric':<34} {'baseline (ms)':>14} {'current (ms)':>13} {'change':>8}")
+    for name, current in sorted(metrics.items()):
+        previous = baseline.get(name)
+        change = f"{(current / previous - 1) * 100:+7.1f}%" if previous else ''
+        previous_ms = f"{previous * 1000:.3f}" if previous is not None else '-'
+        print(f"{name:<34} {previous_ms:>14} {current * 1000:>13.3f} {change:>8}")
+
+    if args.update or not baseline:
+        write_metrics(args.baseline, metrics)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    regressions = compare(metrics, baseline, args.threshold)
+    for name, previous, current in regressions:
+        print(f"REGRESSION {name}: {previous * 1000:.3f} ms -> {current * 1000:.3f} ms")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+"""Synthetic ledgers for benchmarks."""
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from pony.orm import db_session
+
+from chatbotcrud.aggregates import rebuild_rollup
+from chatbotcrud.models import db, init_database, CURRENCY_MAP, TRAVEL_CATEGORIES
+from chatbotcrud.search import bulk_index, rebuild_index
+
+CURRENCIES = list(CURRENCY_MAP.values())
+
+
+def bind_temp_database():
+    """Bind the entities to a fresh SQLite file in a temp dir and return its path."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix='tmm-bench-'), 'tourist_money_manager.sqlite')
+    init_database(db_path)
+    return db_path
+
+
+# Kata-kata untuk deskripsi yang mirip catatan perjalanan sungguhan (benchmark pencarian)
+DESCRIPTION_WORDS = (
+    "Kopi", "Teh", "Nasi", "Goreng", "Sate", "Bakso", "Ramen", "Sushi", "Pizza", "Burger",
+    "Taxi", "Grab", "Gojek", "Bus", "Kereta", "Ferry", "Tiket", "Museum", "Pantai", "Tour",
+    "Hotel", "Hostel", "Villa", "Laundry", "Souvenir", "Kaos", "Batik", "Sandal", "Apotek", "SIM",
+    "Bali", "Ubud", "Jakarta", "Bandung", "Yogyakarta", "Lombok", "Tokyo", "Osaka", "Bangkok", "Singapore",
+)
+
+
+def generate_rows(n, days=90, seed=42, end=None, words=None):
+    """Yield n Transaction rows spread over the last days days.
+
+    Currency and category cycle through every CURRENCY_MAP code and
+    TRAVEL_CATEGORIES entry, so each (currency, category) pair appears
+    within the first few hundred rows; amounts and times are random.
+    Descriptions are "Synthetic transaction <i>", or with words three
+    random picks from it followed by <i>.
+    """
+    rnd = random.Random(seed)
+    end = end or datetime.now()
+    span = days * 86400
+    for i in range(n):
+        amount = round(rnd.uniform(1, 500), 2)
+        description = f"{' '.join(rnd.sample(words, 3))} {i}" if words else f"Synthetic transaction {i}"
+        yield (
+            description,
+            amount,
+            CURRENCIES[i % len(CURRENCIES)],
+            amount * 1000,
+            TRAVEL_CATEGORIES[i // len(CURRENCIES) % len(TRAVEL_CATEGORIES)],
+            str(end - timedelta(seconds=rnd.randrange(span))),
+        )
+
+
+def clear_ledger():
+    with db_session:
+        with bulk_index():
+            db.execute('DELETE FROM "Transaction"')
+        db.execute('DELETE FROM "SpendingRollup"')
+        db.execute('DELETE FROM "CurrencyRollup"')
+    rebuild_index()
+
+
+def fill_ledger(n, **kwargs):
+    """Replace the ledger with n synthetic transactions using one bulk insert."""
+    clear_ledger()
+    with db_session, bulk_index():
+        db.get_connection().executemany(
+            'INSERT INTO "Transaction" (description, amount, currency, amount_home_currency, category, timestamp)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            generate_rows(n, **kwargs),
+        )
+    rebuild_rollup()
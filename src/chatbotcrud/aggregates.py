@@ -0,0 +1,182 @@
+import argparse
+import math
+from datetime import datetime
+from pony.orm import db_session, flush, select, sum
+
+from .diagnostics import executemany
+from .models import db, CurrencyRollup, SpendingRollup
+
+# Toleransi pembulatan saat membandingkan rollup dengan data mentah: absolut untuk total
+# mendekati nol, relatif untuk total besar (jumlah IDR bisa sampai triliunan)
+ROLLUP_TOLERANCE = 1e-6
+ROLLUP_REL_TOLERANCE = 1e-9
+
+
+def today_start(now=None):
+    now = now or datetime.now()
+    return datetime.combine(now.date(), datetime.min.time())
+
+
+def dashboard_aggregates(now=None):
+    """Compute total, today and per-category spending from the rollup table.
+
+    Everything runs inside one db_session and reads SpendingRollup, which
+    holds one row per (day, category), so the cost grows with the number
+    of days and categories rather than with the number of transactions.
+    Categories are returned as (category, amount, count) tuples ordered
+    by amount, largest first.
+    """
+    today = today_start(now).date()
+    with db_session:
+        categories = select(
+            (r.category, sum(r.amount), sum(r.tx_count)) for r in SpendingRollup
+        )[:]
+        today_spent = sum(r.amount for r in SpendingRollup if r.day == today)
+
+    categories = sorted(((cat, amount or 0, cnt) for cat, amount, cnt in categories if cnt),
+                        key=lambda row: row[1], reverse=True)
+    return {
+        'total_spent': sum(amount for _, amount, _ in categories),
+        'today_spent': today_spent or 0,
+        'categories': categories,
+    }
+
+
+# --- Pemeliharaan rollup ---
+
+def _apply_delta(entity, key, amount, count):
+    row = entity.get(**key)
+    if row is None:
+        if count <= 0:
+            return
+        row = entity(**key)
+    row.amount += amount
+    row.tx_count += count
+    if row.tx_count <= 0:
+        row.delete()
+        # Flush supaya delta berikutnya di sesi yang sama bisa membuat baris baru dengan key ini
+        flush()
+
+
+def apply_delta(day, category, currency, amount, count):
+    """Add amount/count to the rollup rows for (day, category) and (day, category, currency).
+
+    Must be called inside the db_session that writes the transaction, so
+    the rollups and the ledger commit (or roll back) together.
+    """
+    _apply_delta(SpendingRollup, dict(day=day, category=category), amount, count)
+    _apply_delta(CurrencyRollup, dict(day=day, category=category, currency=currency), amount, count)
+
+
+def record_transaction(transaction, sign=1):
+    """Apply a Transaction to the rollups: sign=1 for insert, sign=-1 for delete.
+
+    An update is a delete of the old values followed by an insert of the
+    new ones.
+    """
+    apply_delta(transaction.timestamp.date(), transaction.category, transaction.currency,
+                sign * transaction.amount_home_currency, sign)
+
+
+def add_to_rollup(deltas):
+    """Add {(day, category, currency): (amount, count)} for bulk-inserted rows in upserts.
+
+    The raw-SQL counterpart of apply_delta() for inserts (positive counts)
+    only; like apply_delta() it belongs in the session that inserts the rows.
+    """
+    per_category = {}
+    for (day, category, _), (amount, count) in deltas.items():
+        total, total_count = per_category.get((day, category), (0.0, 0))
+        per_category[(day, category)] = (total + amount, total_count + count)
+    connection = db.get_connection()
+    executemany(
+        connection,
+        'INSERT INTO "SpendingRollup" ("day", "category", "amount", "tx_count") VALUES (?, ?, ?, ?)'
+        ' ON CONFLICT ("day", "category") DO UPDATE SET'
+        ' "amount" = "amount" + excluded."amount", "tx_count" = "tx_count" + excluded."tx_count"',
+        ((str(day), category, amount, count) for (day, category), (amount, count) in per_category.items())
+    )
+    executemany(
+        connection,
+        'INSERT INTO "CurrencyRollup" ("day", "category", "currency", "amount", "tx_count") VALUES (?, ?, ?, ?, ?)'
+        ' ON CONFLICT ("day", "category", "currency") DO UPDATE SET'
+        ' "amount" = "amount" + excluded."amount", "tx_count" = "tx_count" + excluded."tx_count"',
+        ((str(day), category, currency, amount, count)
+         for (day, category, currency), (amount, count) in deltas.items())
+    )
+
+
+def _groups(sql):
+    return {tuple(row[:-2]): (row[-2], row[-1]) for row in db.select(sql)}
+
+
+def _compare(expected, actual):
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        exp, act = expected.get(key), actual.get(key)
+        if exp is None or act is None or exp[1] != act[1] or not math.isclose(
+                exp[0], act[0], rel_tol=ROLLUP_REL_TOLERANCE, abs_tol=ROLLUP_TOLERANCE):
+            mismatches.append((*key, exp, act))
+    return mismatches
+
+
+@db_session
+def rebuild_rollup():
+    """Recompute SpendingRollup and CurrencyRollup from the raw Transaction rows."""
+    db.execute('DELETE FROM "SpendingRollup"')
+    db.execute('DELETE FROM "CurrencyRollup"')
+    db.execute(
+        'INSERT INTO "CurrencyRollup" ("day", "category", "currency", "amount", "tx_count")'
+        ' SELECT date("timestamp"), "category", "currency", SUM("amount_home_currency"), COUNT(*)'
+        ' FROM "Transaction" GROUP BY 1, 2, 3'
+    )
+    # SpendingRollup dari CurrencyRollup yang jauh lebih kecil, bukan scan kedua atas Transaction
+    db.execute(
+        'INSERT INTO "SpendingRollup" ("day", "category", "amount", "tx_count")'
+        ' SELECT "day", "category", SUM("amount"), SUM("tx_count") FROM "CurrencyRollup" GROUP BY 1, 2'
+    )
+
+
+@db_session
+def verify_rollup():
+    """Compare both rollups with the raw rows.
+
+    Returns a list of mismatches, each the rollup key followed by
+    expected and actual (amount, count) pairs or None:
+    (day, category, expected, actual) for SpendingRollup, then
+    (day, category, currency, expected, actual) for CurrencyRollup.
+    Empty when the rollups are consistent.
+    """
+    return _compare(
+        _groups('SELECT date("timestamp"), "category", SUM("amount_home_currency"), COUNT(*)'
+                ' FROM "Transaction" GROUP BY 1, 2'),
+        _groups('SELECT "day", "category", "amount", "tx_count" FROM "SpendingRollup"'),
+    ) + _compare(
+        _groups('SELECT date("timestamp"), "category", "currency", SUM("amount_home_currency"), COUNT(*)'
+                ' FROM "Transaction" GROUP BY 1, 2, 3'),
+        _groups('SELECT "day", "category", "currency", "amount", "tx_count" FROM "CurrencyRollup"'),
+    )
+
+
+def main(argv=None):
+    from .models import init_database
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the spending rollup.")
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    parser.add_argument('database', help="path to tourist_money_manager.sqlite")
+    args = parser.parse_args(argv)
+
+    init_database(args.database)
+    mismatches = verify_rollup()
+    for *key, expected, actual in mismatches:
+        print(f"{' '.join(key)}: expected {expected}, found {actual}")
+    if args.command == 'rebuild':
+        rebuild_rollup()
+        print(f"Rollup rebuilt ({len(mismatches)} mismatched groups fixed)")
+        return 0
+    print("Rollup OK" if not mismatches else f"{len(mismatches)} mismatched groups")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
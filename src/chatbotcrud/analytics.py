@@ -0,0 +1,113 @@
+"""Spending time series and budget forecast.
+
+spending_series() reads CurrencyRollup (one row per day, category and
+original currency, kept in sync with Transaction) in a single query and
+folds it into per-day and per-week buckets plus per-category and
+per-currency totals, so its cost grows with the number of days rather
+than with the number of transactions. budget_forecast() turns the daily
+series into a burn rate and the date the travel budget runs out at that
+pace. LedgerService.analytics() caches the combined report per ledger
+version for the dashboard and the AI assistant.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+from pony.orm import db_session
+
+from .models import db
+
+# Burn rate = rata-rata pengeluaran per hari selama jendela terakhir ini
+BURN_RATE_DAYS = 7
+
+# start adalah tanggal (hari, atau Senin untuk minggu); categories/currencies: {nama: amount}
+Bucket = namedtuple('Bucket', ['start', 'amount', 'count', 'categories', 'currencies'])
+
+
+def week_start(day):
+    """Monday of day's week."""
+    return day - timedelta(days=day.weekday())
+
+
+def _add(buckets, start, category, currency, amount, count):
+    bucket = buckets.get(start)
+    if bucket is None:
+        bucket = buckets[start] = [0.0, 0, {}, {}]
+    bucket[0] += amount
+    bucket[1] += count
+    bucket[2][category] = bucket[2].get(category, 0.0) + amount
+    bucket[3][currency] = bucket[3].get(currency, 0.0) + amount
+
+
+def _totals(totals):
+    """[(name, amount, count)] ordered by amount, largest first."""
+    return sorted(((name, amount, count) for name, (amount, count) in totals.items()),
+                  key=lambda row: row[1], reverse=True)
+
+
+def spending_series():
+    """Daily and weekly spending buckets plus per-category and per-currency totals.
+
+    Amounts are in the home currency. Returns a dict with 'daily' and
+    'weekly' lists of Bucket (oldest first, only periods with spending),
+    'categories' and 'currencies' lists of (name, amount, count) ordered
+    by amount, and 'total_spent'.
+    """
+    with db_session:
+        rows = db.select('SELECT "day", "category", "currency", "amount", "tx_count" FROM "CurrencyRollup"')
+    daily, weekly, categories, currencies = {}, {}, {}, {}
+    for day, category, currency, amount, count in rows:
+        day = date.fromisoformat(day)
+        _add(daily, day, category, currency, amount, count)
+        _add(weekly, week_start(day), category, currency, amount, count)
+        for totals, name in ((categories, category), (currencies, currency)):
+            total, total_count = totals.get(name, (0.0, 0))
+            totals[name] = (total + amount, total_count + count)
+    return {
+        'daily': [Bucket(start, *daily[start]) for start in sorted(daily)],
+        'weekly': [Bucket(start, *weekly[start]) for start in sorted(weekly)],
+        'categories': _totals(categories),
+        'currencies': _totals(currencies),
+        'total_spent': sum(amount for amount, _ in categories.values()),
+    }
+
+
+def budget_forecast(daily, travel_budget, today=None, window=BURN_RATE_DAYS):
+    """Burn rate and budget depletion for a daily series (spending_series()['daily']).
+
+    The trip starts on the first day with spending. burn_rate is the
+    average over the last window days (fewer early in the trip);
+    days_left and depletion_date say when the remaining budget runs out
+    at that pace. Both are None without a budget or without recent
+    spending, and 0 / today once the budget is used up.
+    """
+    today = today or date.today()
+    total = sum(bucket.amount for bucket in daily)
+    trip_days = max((today - daily[0].start).days + 1, 0) if daily else 0
+    window_days = min(window, trip_days)
+    window_start = today - timedelta(days=window_days - 1)
+    recent = sum(bucket.amount for bucket in daily if window_start <= bucket.start <= today)
+    burn_rate = recent / window_days if window_days > 0 else 0.0
+    remaining = travel_budget - total
+    days_left = depletion_date = None
+    if travel_budget > 0:
+        if remaining <= 0:
+            days_left, depletion_date = 0, today
+        elif burn_rate > 0:
+            days_left = remaining / burn_rate
+            depletion_date = today + timedelta(days=int(days_left))
+    return {
+        'trip_days': trip_days,
+        'average_daily': total / trip_days if trip_days > 0 else 0.0,
+        'burn_rate': burn_rate,
+        'days_left': days_left,
+        'depletion_date': depletion_date,
+    }
+
+
+def spending_report(settings, today=None):
+    """spending_series() plus 'forecast' against settings.travel_budget and 'home_currency'."""
+    report = spending_series()
+    report['home_currency'] = settings.home_currency
+    report['forecast'] = budget_forecast(report['daily'], settings.travel_budget, today)
+    return report
+
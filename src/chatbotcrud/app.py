@@ -1,12 +1,25 @@
 import toga
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW, CENTER, LEFT, RIGHT
+import asyncio
+import logging
 import os
-from datetime import datetime, timedelta
-from pony.orm import Database, Required, PrimaryKey, db_session, select, desc, sum, commit
-import requests
-import json
-import threading
+from datetime import datetime
+from functools import partial
+from pony.orm import db_session
+
+from .analytics import BURN_RATE_DAYS
+from .assistant import AssistantError, ChatTranscript, ContextBuilder, GeminiClient
+from .core import DATABASE_NAME, LedgerService, RatesService, validate_transaction
+from .diagnostics import Profiler, configure_logging, format_snapshot, log_event, metrics
+from .conversions import ConversionLog
+from .models import CURRENCY_MAP, REVERSE_CURRENCY_MAP, TRAVEL_CATEGORIES, init_database
+from .pagination import TransactionPager
+from .preview import ConversionPreview, PREVIEW_DEBOUNCE, format_amount, parse_amount
+from .responses import RequestCoalescer, ResponseCache, local_answer, response_key
+from .search import SEARCH_DEBOUNCE, match_expression
+from .tables import apply_rows, category_rows, count_widgets, transaction_rows
+from .writer import LedgerWriter, overlay_rows, overlay_summary
 
 # --- KELAS STYLE ---
 class Styles:
@@ -44,193 +57,166 @@ class Styles:
         # ---  --- Tombol disabled untuk aksi CRUD
         self.button_disabled = Pack(flex=1, padding=12, background_color=self.colors['disabled'], color=self.colors['white'])
 
-# Konfigurasi Database
-db = Database()
-
-# Definisi Entity Database
-class ConversionHistory(db.Entity):
-    id = PrimaryKey(int, auto=True)
-    from_currency = Required(str)
-    to_currency = Required(str)
-    amount = Required(float)
-    result = Required(float)
-    timestamp = Required(datetime, default=datetime.now)
-
-class ExchangeRate(db.Entity):
-    currency_code = PrimaryKey(str)
-    rate = Required(float)
-    last_updated = Required(datetime, default=datetime.now)
-
-class Transaction(db.Entity):
-    id = PrimaryKey(int, auto=True)
-    description = Required(str)
-    amount = Required(float)
-    currency = Required(str)
-    amount_home_currency = Required(float)
-    category = Required(str)
-    timestamp = Required(datetime, default=datetime.now)
-
-class UserSettings(db.Entity):
-    id = PrimaryKey(int, auto=True)
-    home_currency = Required(str, default='IDR')
-    travel_budget = Required(float, default=0.0)
-
 # Konfigurasi API EXCHANGE RATE
 EXCHANGE_RATE_API_KEY = ""  # 
 EXCHANGE_RATE_API_URL = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_API_KEY}/latest/IDR"
 
 # API AI menggunakan Google Gemini
 GEMINI_API_KEY = "" # =
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
-
-# Konstanta Aplikasi
-CURRENCY_MAP = {
-    "US Dollar (USD)": "USD", "Japanese Yen (¥)": "JPY", "Euro (€)": "EUR",
-    "British Pound (£)": "GBP", "Australian Dollar (A$)": "AUD", "Singapore Dollar (S$)": "SGD",
-    "Malaysian Ringgit (RM)": "MYR", "Chinese Yuan (¥)": "CNY", "Indonesian Rupiah (IDR)": "IDR",
-    "Thai Baht (THB)": "THB", "Korean Won (₩)": "KRW", "Philippine Peso (₱)": "PHP",
-    "Vietnamese Dong (₫)": "VND"
-}
-REVERSE_CURRENCY_MAP = {code: name for name, code in CURRENCY_MAP.items()}
-TRAVEL_CATEGORIES = [
-    "Makanan & Minuman", "Transportasi", "Akomodasi", "Tiket Masuk",
-    "Belanja", "Souvenir", "Kesehatan", "Komunikasi", "Lainnya"
-]
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:streamGenerateContent"
 
 class TouristMoneyManagerApp(toga.App):
 
     def startup(self):
+        configure_logging()
+        # Profiling opt-in: TMM_PROFILE=1 merekam sejak startup; bisa juga dari layar Diagnostics
+        self.profiler = Profiler(output_dir=os.path.join(self.paths.data, 'profiles'))
+        if os.environ.get('TMM_PROFILE'):
+            self.profiler.start()
         self.styles = Styles()
         self.setup_database()
-        self.update_exchange_rates_from_api()
+        # Logika bisnis ada di service headless (core.py); app hanya mengurus UI
+        self.rates = RatesService(EXCHANGE_RATE_API_URL)
+        self.rates.load()
+        # Audit konversi ditampung di memori dan ditulis per batch oleh thread sendiri
+        self.conversion_log = ConversionLog()
+        self.conversion_log.start()
+        self.ledger = LedgerService(self.rates, conversions=self.conversion_log)
+        self.conversion_preview = ConversionPreview(self.rates.cache)
+        # Semua penulisan ledger lewat satu thread writer; hasilnya kembali ke loop UI
+        self.writer = LedgerWriter(self.ledger, dispatch=self.loop.call_soon_threadsafe)
+        self.writer.start()
+        self._preview_handle = None
+        self._search_handle = None
+        self.transaction_pager = TransactionPager()
         self.chat_history = []
+        self.chat_context = ContextBuilder(self.ledger)
+        self.chat_transcript = ChatTranscript()
+        self.response_cache = ResponseCache()
+        self.ai_requests = RequestCoalescer()
+        # Satu session HTTP untuk semua pesan: koneksi keep-alive dipakai ulang
+        self.gemini = GeminiClient(GEMINI_API_KEY, GEMINI_API_URL)
         # ---  --- Variabel untuk menyimpan ID transaksi yang dipilih
         self.selected_transaction_id = None
+        self.editing_transaction_id = None
+        # Layar dibangun sekali lalu dipakai ulang; ui_stats mencatat widget yang dibuat per navigasi
+        self._screens = {}
+        self.ui_stats = {'navigations': 0, 'widgets_created': 0, 'last_navigation': None}
         self.main_window = toga.MainWindow(title=self.formal_name, size=(500, 800))
-        self.main_window.content = self.build_dashboard()
+        self.show_dashboard(None)
         self.main_window.show()
+        # Kurs terbaru diambil di background; window tampil dari kurs tersimpan di ExchangeRate
+        self.loop.create_task(self.refresh_exchange_rates())
+
+    def on_exit(self):
+        # Tulis dulu semua yang masih antre sebelum aplikasi ditutup
+        self.writer.stop()
+        self.conversion_log.stop()
+        return True
 
     def setup_database(self):
         """Set up the database connection."""
         try:
-            data_dir = self.paths.data
-            if not os.path.exists(data_dir):
-                os.makedirs(data_dir)
-            db_path = os.path.join(data_dir, 'tourist_money_manager.sqlite')
-            db.bind(provider='sqlite', filename=db_path, create_db=True)
-            db.generate_mapping(create_tables=True)
-            with db_session:
-                if not UserSettings.select().exists():
-                    UserSettings(home_currency='IDR', travel_budget=0.0)
+            db_path = os.path.join(self.paths.data, DATABASE_NAME)
+            init_database(db_path)
             return True
         except Exception as e:
-            print(f"Database setup failed: {str(e)}")
+            log_event('db.setup_failed', logging.ERROR, error=str(e))
             return False
 
     def get_user_settings(self):
-        with db_session:
-            settings = UserSettings.select().first()
-            return settings if settings else UserSettings(home_currency='IDR', travel_budget=0.0)
+        return self.ledger.settings()
 
-    def update_exchange_rates_from_api(self):
-        """Update exchange rates from API dengan API key."""
-        try:
-            if not EXCHANGE_RATE_API_KEY or EXCHANGE_RATE_API_KEY == "YOUR_API_KEY_HERE":
-                print("Warning: Exchange Rate API key not configured")
-                return False
-            
-            response = requests.get(EXCHANGE_RATE_API_URL, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get('result') == 'success' and 'conversion_rates' in data:
-                rates = data['conversion_rates']
-                with db_session:
-                    for code in CURRENCY_MAP.values():
-                        if code in rates and code != 'IDR':
-                            rate = rates[code]
-                            rate_obj = ExchangeRate.get(currency_code=code)
-                            if rate_obj:
-                                rate_obj.rate = rate
-                                rate_obj.last_updated = datetime.now()
-                            else:
-                                ExchangeRate(currency_code=code, rate=rate)
-                print("Exchange rates updated successfully")
-                return True
-            else:
-                print(f"API Error: {data.get('error-type', 'Unknown error')}")
-        except Exception as e:
-            print(f"Failed to update exchange rates: {str(e)}")
-        return False
+    def update_exchange_rates_from_api(self, force=False):
+        """Update exchange rates from API dengan API key (hanya jika kurs sudah kedaluwarsa)."""
+        if not EXCHANGE_RATE_API_KEY or EXCHANGE_RATE_API_KEY == "YOUR_API_KEY_HERE":
+            log_event('rates.api_key_missing', logging.WARNING)
+            return False
+        updated = self.rates.refresh(force=force)
+        if updated:
+            log_event('rates.updated')
+        return updated
+
+    async def refresh_exchange_rates(self):
+        """Keep rates fresh: fetch on a worker thread whenever the TTL expires."""
+        while True:
+            updated = await self.loop.run_in_executor(None, self.update_exchange_rates_from_api)
+            if updated:
+                self.update_conversion_display()
+            if self.rates.refresher is None:
+                return
+            await asyncio.sleep(self.rates.refresher.seconds_until_due())
 
     def get_exchange_rate(self, currency_code):
-        if currency_code == 'IDR':
-            return 1.0
-        with db_session:
-            rate_obj = ExchangeRate.get(currency_code=currency_code)
-            return rate_obj.rate if rate_obj else None
+        return self.rates.get_rate(currency_code)
 
     def convert_to_home_currency(self, amount, from_currency):
-        settings = self.get_user_settings()
-        home_currency = settings.home_currency
-        if from_currency == home_currency:
-            return amount
-        if from_currency == 'IDR':
-            rate = self.get_exchange_rate(home_currency)
-            return amount * rate if rate else amount
-        elif home_currency == 'IDR':
-            rate = self.get_exchange_rate(from_currency)
-            return amount / rate if rate else amount
-        else:
-            from_rate = self.get_exchange_rate(from_currency)
-            to_rate = self.get_exchange_rate(home_currency)
-            if from_rate and to_rate:
-                idr_amount = amount / from_rate
-                return idr_amount * to_rate
-            return amount
+        # Dilayani dari cache kurs di memori, tanpa query ke SQLite; dicatat ke log audit
+        # (preview form memakai ConversionPreview dan tidak dicatat)
+        result = self.rates.convert(amount, from_currency)
+        self.conversion_log.record(from_currency, self.rates.home_currency(), amount, result)
+        return result
 
     def build_dashboard(self):
-        # ---  --- Reset selected transaction saat kembali ke dashboard
-        self.selected_transaction_id = None
-        
+        # Dibangun sekali; data diisi oleh refresh_dashboard setiap kali layar ditampilkan
         container = toga.Box(style=self.styles.main_container)
         title_label = toga.Label("Tourist Money Manager", style=self.styles.header_title)
         subtitle_label = toga.Label("Your Travel Finance Assistant", style=self.styles.header_subtitle)
         container.add(title_label)
         container.add(subtitle_label)
 
-        summary = self.get_financial_summary()
-        settings = self.get_user_settings()
-        if settings.travel_budget > 0:
-            budget_card = toga.Box(style=self.styles.card)
-            budget_card.add(toga.Label("Travel Budget", style=self.styles.card_title))
-            budget_card.add(toga.Label(f"{settings.travel_budget:,.0f} {settings.home_currency}", style=self.styles.card_value))
-            remaining = settings.travel_budget - summary['total_spent']
-            remaining_color = self.styles.colors['success'] if remaining >= 0 else self.styles.colors['danger']
-            remaining_card = toga.Box(style=self.styles.card)
-            remaining_card.add(toga.Label("Remaining Budget", style=self.styles.card_title))
-            remaining_card.add(toga.Label(f"{remaining:,.0f} {settings.home_currency}", style=Pack(font_size=18, font_weight='bold', color=remaining_color)))
-            card_row1 = toga.Box(style=self.styles.card_container)
-            card_row1.add(budget_card)
-            card_row1.add(remaining_card)
-            container.add(card_row1)
+        # Kartu budget hanya dipasang ke container jika travel_budget > 0
+        budget_card = toga.Box(style=self.styles.card)
+        budget_card.add(toga.Label("Travel Budget", style=self.styles.card_title))
+        self.budget_value_label = toga.Label("", style=self.styles.card_value)
+        budget_card.add(self.budget_value_label)
+        remaining_card = toga.Box(style=self.styles.card)
+        remaining_card.add(toga.Label("Remaining Budget", style=self.styles.card_title))
+        self.remaining_value_label = toga.Label("", style=Pack(font_size=18, font_weight='bold', color=self.styles.colors['success']))
+        remaining_card.add(self.remaining_value_label)
+        self.budget_card_row = toga.Box(style=self.styles.card_container)
+        self.budget_card_row.add(budget_card)
+        self.budget_card_row.add(remaining_card)
 
         today_card = toga.Box(style=self.styles.card)
         today_card.add(toga.Label("Today's Spending", style=self.styles.card_title))
-        today_card.add(toga.Label(f"{summary['today_spent']:,.0f} {settings.home_currency}", style=self.styles.card_value))
+        self.today_value_label = toga.Label("", style=self.styles.card_value)
+        today_card.add(self.today_value_label)
         total_card = toga.Box(style=self.styles.card)
         total_card.add(toga.Label("Total Trip Spending", style=self.styles.card_title))
-        total_card.add(toga.Label(f"{summary['total_spent']:,.0f} {settings.home_currency}", style=self.styles.card_value))
+        self.total_value_label = toga.Label("", style=self.styles.card_value)
+        total_card.add(self.total_value_label)
         card_row2 = toga.Box(style=self.styles.card_container)
         card_row2.add(today_card)
         card_row2.add(total_card)
         container.add(card_row2)
 
+        # Laju pengeluaran dan perkiraan budget habis dari ledger.analytics()
+        burn_card = toga.Box(style=self.styles.card)
+        burn_card.add(toga.Label(f"Daily Burn Rate ({BURN_RATE_DAYS} days)", style=self.styles.card_title))
+        self.burn_rate_value_label = toga.Label("", style=self.styles.card_value)
+        burn_card.add(self.burn_rate_value_label)
+        depletion_card = toga.Box(style=self.styles.card)
+        depletion_card.add(toga.Label("Budget Lasts", style=self.styles.card_title))
+        self.depletion_value_label = toga.Label("", style=self.styles.card_value)
+        depletion_card.add(self.depletion_value_label)
+        card_row3 = toga.Box(style=self.styles.card_container)
+        card_row3.add(burn_card)
+        card_row3.add(depletion_card)
+        container.add(card_row3)
+
         container.add(toga.Label("Spending by Category", style=self.styles.section_label))
         self.category_table = toga.Table(headings=['Category', 'Amount', 'Count'], style=self.styles.table)
         container.add(self.category_table)
         
         container.add(toga.Label("Recent Transactions", style=self.styles.section_label))
+        # Pencarian full-text: selama kotak ini terisi, tabel menampilkan hasil pencarian
+        search_box = toga.Box(style=Pack(direction=ROW, padding_bottom=10, alignment=CENTER))
+        self.search_input = toga.TextInput(placeholder="Search description or category", on_change=self.on_search_change, style=self.styles.form_input)
+        btn_clear_search = toga.Button("Clear", on_press=self.on_clear_search, style=self.styles.button_dark)
+        search_box.add(self.search_input)
+        search_box.add(btn_clear_search)
+        container.add(search_box)
         # ---  --- Menambahkan on_select handler ke tabel
         self.recent_table = toga.Table(
             headings=['Description', 'Amount', 'Category', 'Date'],
@@ -239,6 +225,16 @@ class TouristMoneyManagerApp(toga.App):
         )
         container.add(self.recent_table)
 
+        # Navigasi halaman riwayat transaksi (keyset pagination)
+        page_box = toga.Box(style=Pack(direction=ROW, padding_bottom=10, alignment=CENTER))
+        self.btn_newer_page = toga.Button("◀ Newer", on_press=self.on_newer_page, style=self.styles.button_dark)
+        self.recent_page_label = toga.Label("", style=Pack(flex=1, text_align=CENTER))
+        self.btn_older_page = toga.Button("Older ▶", on_press=self.on_older_page, style=self.styles.button_dark)
+        page_box.add(self.btn_newer_page)
+        page_box.add(self.recent_page_label)
+        page_box.add(self.btn_older_page)
+        container.add(page_box)
+
         # ---  --- Tombol untuk Edit dan Delete
         crud_button_box = toga.Box(style=Pack(direction=ROW, padding_bottom=10))
         self.btn_edit_transaction = toga.Button("Edit Transaction", on_press=self.show_edit_transaction, style=self.styles.button_disabled, enabled=False)
@@ -257,15 +253,44 @@ class TouristMoneyManagerApp(toga.App):
         btn_settings = toga.Button("Settings", on_press=self.show_settings, style=self.styles.button_dark)
         container.add(btn_settings)
         
-        self.load_category_breakdown()
-        self.load_recent_transactions()
-        
         return container
 
-    def build_add_transaction(self):
+    def refresh_dashboard(self):
+        """Push current totals and table rows into the existing dashboard widgets."""
+        # Nilai dari SQLite ditambah perubahan yang masih antre di writer
+        summary = overlay_summary(self.ledger.summary(), self.writer.pending)
+        home_currency = summary['home_currency']
+        container = self._screens['dashboard']
+        if summary['travel_budget'] > 0:
+            self.budget_value_label.text = f"{summary['travel_budget']:,.0f} {home_currency}"
+            remaining = summary['remaining']
+            self.remaining_value_label.text = f"{remaining:,.0f} {home_currency}"
+            self.remaining_value_label.style.color = self.styles.colors['success'] if remaining >= 0 else self.styles.colors['danger']
+            if self.budget_card_row not in container.children:
+                container.insert(2, self.budget_card_row)
+        elif self.budget_card_row in container.children:
+            container.remove(self.budget_card_row)
+
+        self.today_value_label.text = f"{summary['today_spent']:,.0f} {home_currency}"
+        self.total_value_label.text = f"{summary['total_spent']:,.0f} {home_currency}"
+        # Analytics hanya dari data yang sudah tersimpan; diperbarui setelah writer selesai
+        forecast = self.ledger.analytics()['forecast']
+        self.burn_rate_value_label.text = f"{forecast['burn_rate']:,.0f} {home_currency}/day"
+        if forecast['days_left'] is None:
+            self.depletion_value_label.text = "-"
+        elif forecast['days_left'] <= 0:
+            self.depletion_value_label.text = "Budget used up"
+        else:
+            self.depletion_value_label.text = f"{forecast['days_left']:.0f} days ({forecast['depletion_date']:%d %b %Y})"
+
+        self.load_category_breakdown(summary['categories'])
+        self.load_recent_transactions()
+
+    def build_transaction_form(self):
+        # Satu form untuk tambah dan edit transaksi; isinya diatur oleh show_add/show_edit
         container = toga.Box(style=self.styles.main_container)
-        header_label = toga.Label("Add New Transaction", style=self.styles.header_title)
-        container.add(header_label)
+        self.transaction_form_header = toga.Label("Add New Transaction", style=self.styles.header_title)
+        container.add(self.transaction_form_header)
 
         form_box = toga.Box(style=self.styles.form_box)
         desc_label = toga.Label("Description", style=self.styles.form_label)
@@ -290,66 +315,35 @@ class TouristMoneyManagerApp(toga.App):
         container.add(self.conversion_label)
 
         btn_box = toga.Box(style=self.styles.button_box)
-        btn_save = toga.Button("Save Transaction", on_press=self.on_save_transaction, style=self.styles.button_primary)
+        self.btn_submit_transaction = toga.Button("Save Transaction", on_press=self.on_submit_transaction, style=self.styles.button_primary)
         btn_back = toga.Button("Back to Dashboard", on_press=self.show_dashboard, style=self.styles.button_danger)
-        btn_box.add(btn_save)
+        btn_box.add(self.btn_submit_transaction)
         btn_box.add(btn_back)
         container.add(btn_box)
 
         return container
 
-    # ---  --- Fungsi untuk membangun UI Edit Transaction
-    def build_edit_transaction(self, transaction_id):
-        with db_session:
-            transaction = Transaction.get(id=transaction_id)
-            if not transaction:
-                self.main_window.error_dialog("Error", "Transaction not found.")
-                return self.build_dashboard()
-
-        container = toga.Box(style=self.styles.main_container)
-        header_label = toga.Label("Edit Transaction", style=self.styles.header_title)
-        container.add(header_label)
-
-        form_box = toga.Box(style=self.styles.form_box)
-        desc_label = toga.Label("Description", style=self.styles.form_label)
-        self.transaction_description = toga.TextInput(value=transaction.description, style=self.styles.form_input)
-        desc_row = toga.Box(style=self.styles.form_row); desc_row.add(desc_label); desc_row.add(self.transaction_description); form_box.add(desc_row)
-
-        amount_label = toga.Label("Amount", style=self.styles.form_label)
-        self.transaction_amount = toga.TextInput(value=str(transaction.amount), on_change=self.on_amount_change, style=self.styles.form_input)
-        amount_row = toga.Box(style=self.styles.form_row); amount_row.add(amount_label); amount_row.add(self.transaction_amount); form_box.add(amount_row)
-
-        currency_label = toga.Label("Currency", style=self.styles.form_label)
-        self.transaction_currency = toga.Selection(
-            items=list(CURRENCY_MAP.keys()),
-            value=REVERSE_CURRENCY_MAP.get(transaction.currency),
-            on_select=self.on_currency_change,
-            style=self.styles.form_input
-        )
-        currency_row = toga.Box(style=self.styles.form_row); currency_row.add(currency_label); currency_row.add(self.transaction_currency); form_box.add(currency_row)
-
-        category_label = toga.Label("Category", style=self.styles.form_label)
-        self.transaction_category = toga.Selection(items=TRAVEL_CATEGORIES, value=transaction.category, style=self.styles.form_input)
-        category_row = toga.Box(style=self.styles.form_row); category_row.add(category_label); category_row.add(self.transaction_category); form_box.add(category_row)
-        
-        container.add(form_box)
-
-        self.conversion_label = toga.Label("", style=self.styles.conversion_label)
-        container.add(self.conversion_label)
-        self.update_conversion_display() # Panggil sekali untuk inisialisasi
-
-        btn_box = toga.Box(style=self.styles.button_box)
-        # ---  --- Tombol update memanggil on_update_transaction dengan transaction_id
-        btn_update = toga.Button("Update Transaction", on_press=lambda w: self.on_update_transaction(w, transaction_id), style=self.styles.button_primary)
-        btn_back = toga.Button("Back to Dashboard", on_press=self.show_dashboard, style=self.styles.button_danger)
-        btn_box.add(btn_update)
-        btn_box.add(btn_back)
-        container.add(btn_box)
-
-        return container
+    def refresh_transaction_form(self, transaction=None):
+        """Fill the form for a new transaction, or with the values of transaction for editing."""
+        # ---  --- ID transaksi yang sedang diedit (None = transaksi baru)
+        self.editing_transaction_id = transaction.id if transaction else None
+        if transaction:
+            self.transaction_form_header.text = "Edit Transaction"
+            self.btn_submit_transaction.text = "Update Transaction"
+            self.transaction_description.value = transaction.description
+            self.transaction_amount.value = format_amount(transaction.amount)
+            self.transaction_currency.value = REVERSE_CURRENCY_MAP.get(transaction.currency)
+            self.transaction_category.value = transaction.category
+        else:
+            self.transaction_form_header.text = "Add New Transaction"
+            self.btn_submit_transaction.text = "Save Transaction"
+            self.transaction_description.value = ""
+            self.transaction_amount.value = ""
+            self.transaction_currency.value = list(CURRENCY_MAP.keys())[0]
+            self.transaction_category.value = TRAVEL_CATEGORIES[0]
+        self.update_conversion_display()
 
     def build_ai_assistant(self):
-        # (Kode tidak berubah)
         container = toga.Box(style=self.styles.main_container)
         header_label = toga.Label("Tour-Fin AI Assistant", style=self.styles.header_title)
         self.chat_display = toga.MultilineTextInput(readonly=True, style=Pack(flex=1, padding=10, font_size=12))
@@ -357,7 +351,6 @@ class TouristMoneyManagerApp(toga.App):
         self.chat_input = toga.TextInput(placeholder="Ask me about finance or local tips...", style=self.styles.form_input)
         btn_send = toga.Button("Send", on_press=self.on_send_message, style=self.styles.button_primary)
         btn_back = toga.Button("Back to Dashboard", on_press=self.show_dashboard, style=Pack(padding=10, background_color=self.styles.colors['danger'], color=self.styles.colors['white']))
-        self.update_chat_display()
         input_box.add(self.chat_input)
         input_box.add(btn_send)
         container.add(header_label)
@@ -367,16 +360,13 @@ class TouristMoneyManagerApp(toga.App):
         return container
 
     def build_settings(self):
-        # (Kode tidak berubah)
         container = toga.Box(style=self.styles.main_container)
         header_label = toga.Label("Settings", style=self.styles.header_title)
         container.add(header_label)
-        settings = self.get_user_settings()
         form_box = toga.Box(style=self.styles.form_box)
         currency_label = toga.Label("Home Currency", style=self.styles.form_label)
         self.settings_home_currency = toga.Selection(
             items=list(CURRENCY_MAP.keys()),
-            value=REVERSE_CURRENCY_MAP.get(settings.home_currency, "Indonesian Rupiah (IDR)"),
             style=self.styles.form_input
         )
         currency_row = toga.Box(style=self.styles.form_row)
@@ -385,7 +375,6 @@ class TouristMoneyManagerApp(toga.App):
         form_box.add(currency_row)
         budget_label = toga.Label("Travel Budget", style=self.styles.form_label)
         self.settings_budget = toga.TextInput(
-            value=str(settings.travel_budget),
             placeholder="Enter your travel budget",
             style=self.styles.form_input
         )
@@ -400,89 +389,131 @@ class TouristMoneyManagerApp(toga.App):
         btn_box.add(btn_save)
         btn_box.add(btn_back)
         container.add(btn_box)
+        btn_diagnostics = toga.Button("Diagnostics", on_press=self.show_diagnostics, style=self.styles.button_dark)
+        container.add(btn_diagnostics)
+        return container
+
+    def refresh_settings(self):
+        settings = self.get_user_settings()
+        self.settings_home_currency.value = REVERSE_CURRENCY_MAP.get(settings.home_currency, "Indonesian Rupiah (IDR)")
+        self.settings_budget.value = format_amount(settings.travel_budget)
+
+    def build_diagnostics(self):
+        container = toga.Box(style=self.styles.main_container)
+        container.add(toga.Label("Diagnostics", style=self.styles.header_title))
+        self.diagnostics_text = toga.MultilineTextInput(readonly=True, style=Pack(flex=1, padding=10, font_size=11))
+        container.add(self.diagnostics_text)
+        btn_box = toga.Box(style=self.styles.button_box)
+        btn_refresh = toga.Button("Refresh", on_press=self.show_diagnostics, style=self.styles.button_primary)
+        self.btn_profile = toga.Button("", on_press=self.on_toggle_profiling, style=self.styles.button_secondary)
+        btn_reset = toga.Button("Reset", on_press=self.on_reset_metrics, style=self.styles.button_danger)
+        btn_box.add(btn_refresh)
+        btn_box.add(self.btn_profile)
+        btn_box.add(btn_reset)
+        container.add(btn_box)
+        btn_back = toga.Button("Back to Settings", on_press=self.show_settings, style=self.styles.button_dark)
+        container.add(btn_back)
         return container
 
+    def refresh_diagnostics(self):
+        sections = [format_snapshot(metrics.snapshot())]
+        sections.append("Rate cache: " + ", ".join(f"{k}={v}" for k, v in self.rates.cache.stats().items()))
+        if self.rates.refresher is not None:
+            sections.append("Rate refresher: " + ", ".join(f"{k}={v}" for k, v in self.rates.refresher.stats().items()))
+        sections.append("AI responses: " + ", ".join(f"{k}={v}" for k, v in self.response_cache.stats().items())
+                        + f", coalesced={self.ai_requests.coalesced}")
+        sections.append("Ledger writer: " + ", ".join(f"{k}={v}" for k, v in self.writer.stats().items()))
+        sections.append("Conversion log: " + ", ".join(f"{k}={v}" for k, v in self.conversion_log.stats().items()))
+        sections.append(f"Pager: page {self.transaction_pager.page_number + 1}, {self.transaction_pager.queries} queries")
+        sections.append(f"UI: {self.ui_stats['navigations']} navigations, {self.ui_stats['widgets_created']} widgets created")
+        if self.profiler.last_report:
+            saved = f" (saved to {self.profiler.last_path})" if self.profiler.last_path else ""
+            sections.append(f"Last profile{saved}:\n{self.profiler.last_report}")
+        self.diagnostics_text.value = "\n\n".join(sections)
+        self.btn_profile.text = "Stop Profiling" if self.profiler.active else "Start Profiling"
+
+    def on_toggle_profiling(self, widget):
+        if self.profiler.active:
+            self.profiler.stop()
+        else:
+            self.profiler.start()
+        self.refresh_diagnostics()
+
+    def on_reset_metrics(self, widget):
+        metrics.reset()
+        self.refresh_diagnostics()
+
     def on_amount_change(self, widget):
-        self.update_conversion_display()
+        # Preview dihitung setelah ketikan berhenti sejenak, bukan per tombol
+        if self._preview_handle is not None:
+            self._preview_handle.cancel()
+        self._preview_handle = self.loop.call_later(PREVIEW_DEBOUNCE, self.update_conversion_display)
 
     def on_currency_change(self, widget):
         self.update_conversion_display()
 
     def update_conversion_display(self):
-        try:
-            if not hasattr(self, 'transaction_amount') or not hasattr(self, 'transaction_currency'):
-                return
-            amount_str = self.transaction_amount.value
-            currency_selection = self.transaction_currency.value
-            if not amount_str or not currency_selection:
-                self.conversion_label.text = ""
-                return
-            amount = float(amount_str.replace(",", "").replace(".", ""))
-            currency_code = CURRENCY_MAP[currency_selection]
-            settings = self.get_user_settings()
-            converted = self.convert_to_home_currency(amount, currency_code)
-            if currency_code != settings.home_currency:
-                self.conversion_label.text = f"≈ {converted:,.0f} {settings.home_currency}"
-            else:
-                self.conversion_label.text = ""
-        except (ValueError, KeyError):
-            self.conversion_label.text = ""
+        """Show the converted amount; uses cached rates only, never the database."""
+        if self._preview_handle is not None:
+            self._preview_handle.cancel()
+            self._preview_handle = None
+        if not hasattr(self, 'transaction_amount') or not hasattr(self, 'transaction_currency'):
+            return
+        currency_code = CURRENCY_MAP.get(self.transaction_currency.value)
+        text = self.conversion_preview.text(self.transaction_amount.value, currency_code)
+        if self.conversion_label.text != text:
+            self.conversion_label.text = text
+
+    def on_submit_transaction(self, widget):
+        if self.editing_transaction_id is None:
+            self.on_save_transaction(widget)
+        else:
+            self.on_update_transaction(widget, self.editing_transaction_id)
+
+    def read_transaction_form(self):
+        """(description, amount, currency, category) from the form; None if a field is empty."""
+        if not all([self.transaction_description.value, self.transaction_amount.value,
+                    self.transaction_currency.value, self.transaction_category.value]):
+            self.main_window.info_dialog("Validation Error", "All fields must be filled!")
+            return None
+        return (self.transaction_description.value, parse_amount(self.transaction_amount.value),
+                CURRENCY_MAP[self.transaction_currency.value], self.transaction_category.value)
 
     def on_save_transaction(self, widget):
         try:
-            if not all([self.transaction_description.value, self.transaction_amount.value,
-                        self.transaction_currency.value, self.transaction_category.value]):
-                self.main_window.info_dialog("Validation Error", "All fields must be filled!")
+            values = self.read_transaction_form()
+            if values is None:
                 return
-            amount = float(self.transaction_amount.value.replace(",", "").replace(".", ""))
-            if amount <= 0:
-                raise ValueError("Amount must be positive")
-            currency_code = CURRENCY_MAP[self.transaction_currency.value]
-            home_amount = self.convert_to_home_currency(amount, currency_code)
-            with db_session:
-                Transaction(
-                    description=self.transaction_description.value, amount=amount,
-                    currency=currency_code, amount_home_currency=home_amount,
-                    category=self.transaction_category.value
-                )
-            self.main_window.info_dialog("Success", "Transaction saved successfully!")
-            self.show_dashboard(widget)
+            validate_transaction(*values)
         except ValueError as e:
             self.main_window.error_dialog("Invalid Input", str(e))
-        except Exception as e:
-            self.main_window.error_dialog("Error", f"Error saving transaction: {str(e)}")
-            
+            return
+        description, amount, currency, category = values
+        # Optimistis: dashboard langsung menampilkan transaksi baru, SQLite ditulis di thread writer
+        row = (None, description, amount, currency, self.rates.convert(amount, currency), category, datetime.now())
+        self.writer.submit('add_transaction', *values, row=row, on_done=self.write_finished(
+            "Transaction saved successfully!", "Error saving transaction"))
+        self.transaction_pager.reset()
+        self.show_dashboard(widget)
+
     # Fungsi untuk menghandle update transaction
     def on_update_transaction(self, widget, transaction_id):
         try:
-            # Validasi input
-            if not all([self.transaction_description.value, self.transaction_amount.value,
-                        self.transaction_currency.value, self.transaction_category.value]):
-                self.main_window.info_dialog("Validation Error", "All fields must be filled!")
+            values = self.read_transaction_form()
+            if values is None:
                 return
-            amount = float(self.transaction_amount.value.replace(",", "").replace(".", ""))
-            if amount <= 0:
-                raise ValueError("Amount must be positive")
-            currency_code = CURRENCY_MAP[self.transaction_currency.value]
-            home_amount = self.convert_to_home_currency(amount, currency_code)
-
-            # Update data di database
-            with db_session:
-                transaction_to_update = Transaction.get(id=transaction_id)
-                if transaction_to_update:
-                    transaction_to_update.description = self.transaction_description.value
-                    transaction_to_update.amount = amount
-                    transaction_to_update.currency = currency_code
-                    transaction_to_update.amount_home_currency = home_amount
-                    transaction_to_update.category = self.transaction_category.value
-                    transaction_to_update.timestamp = datetime.now() # Update timestamp juga
-            
-            self.main_window.info_dialog("Success", "Transaction updated successfully!")
-            self.show_dashboard(widget)
+            validate_transaction(*values)
         except ValueError as e:
             self.main_window.error_dialog("Invalid Input", str(e))
-        except Exception as e:
-            self.main_window.error_dialog("Error", f"Error updating transaction: {str(e)}")
+            return
+        description, amount, currency, category = values
+        row = (transaction_id, description, amount, currency, self.rates.convert(amount, currency), category,
+               datetime.now())
+        self.writer.submit('update_transaction', transaction_id, *values, row=row,
+                           previous=self.ledger.transaction_row(transaction_id),
+                           on_done=self.write_finished("Transaction updated successfully!",
+                                                       "Error updating transaction", must_exist=True))
+        self.show_dashboard(widget)
 
     # ---  --- Fungsi untuk menghandle delete transaction
     async def on_delete_transaction(self, widget):
@@ -497,208 +528,223 @@ class TouristMoneyManagerApp(toga.App):
         )
 
         if confirmed:
-            try:
-                with db_session:
-                    transaction_to_delete = Transaction.get(id=self.selected_transaction_id)
-                    if transaction_to_delete:
-                        transaction_to_delete.delete()
-                        commit() # Simpan perubahan
-                self.main_window.info_dialog("Success", "Transaction deleted successfully.")
-                # Refresh dashboard untuk update tampilan
-                self.show_dashboard(widget)
-            except Exception as e:
-                self.main_window.error_dialog("Error", f"Failed to delete transaction: {str(e)}")
-
+            transaction_id = self.selected_transaction_id
+            self.writer.submit('delete_transaction', transaction_id,
+                               previous=self.ledger.transaction_row(transaction_id),
+                               on_done=self.write_finished("Transaction deleted successfully.",
+                                                           "Failed to delete transaction", must_exist=True))
+            # Refresh dashboard untuk update tampilan (baris langsung hilang)
+            self.show_dashboard(widget)
 
     def on_save_settings(self, widget):
-        # (Kode tidak berubah)
         try:
             home_currency = CURRENCY_MAP[self.settings_home_currency.value]
-            budget = float(self.settings_budget.value.replace(",", "").replace(".", ""))
-            with db_session:
-                settings = UserSettings.select().first()
-                if settings:
-                    settings.home_currency = home_currency
-                    settings.travel_budget = budget
-                else:
-                    UserSettings(home_currency=home_currency, travel_budget=budget)
-            self.main_window.info_dialog("Success", "Settings saved successfully!")
-            self.show_dashboard(widget)
+            budget = parse_amount(self.settings_budget.value)
         except ValueError:
             self.main_window.error_dialog("Invalid Input", "Invalid budget amount!")
-        except Exception as e:
-            self.main_window.error_dialog("Error", f"Error saving settings: {str(e)}")
+            return
+        self.writer.submit('save_settings', home_currency, budget, on_done=self.write_finished(
+            "Settings saved successfully!", "Error saving settings"))
+        self.show_dashboard(widget)
+
+    def write_finished(self, success_message, error_prefix, must_exist=False):
+        """on_done callback for a writer command, run on the UI thread after its commit.
+
+        The dashboard is refreshed from SQLite (which drops the optimistic
+        values if the write failed) and the outcome is reported.
+        """
+        def on_done(result, error):
+            if error is None and must_exist and not result:
+                error = "the transaction no longer exists"
+            self.transaction_pager.reset()
+            if self.main_window.content is self._screens.get('dashboard'):
+                self.show_dashboard(None)
+            if error is not None:
+                self.main_window.error_dialog("Error", f"{error_prefix}: {error}")
+            else:
+                self.main_window.info_dialog("Success", success_message)
+        return on_done
 
     def on_send_message(self, widget):
-        # (Kode tidak berubah)
         message = self.chat_input.value.strip()
         if not message:
             return
         self.chat_history.append({"role": "user", "content": message})
+        self.chat_transcript.append("user", message)
         self.chat_input.value = ""
         self.update_chat_display()
-        self.chat_display.value += "\n\nAssistant: Thinking..."
-        threading.Thread(target=self.fetch_ai_response).start()
-
-    def fetch_ai_response(self):
-        # (Kode tidak berubah)
-        response_text = self.get_ai_response_from_gemini(self.chat_history)
+        self.loop.create_task(self.stream_ai_response())
+
+    async def stream_ai_response(self):
+        """Answer the newest question: locally, from the response cache, or streamed from Gemini."""
+        question = self.chat_history[-1]['content']
+        self.update_chat_display(self.chat_transcript.with_partial("assistant", "Thinking..."))
+        # Pertanyaan angka murni (sisa budget, pengeluaran hari ini) dijawab tanpa jaringan
+        response_text = local_answer(question, self.ledger.summary())
+        if response_text is None:
+            if not GEMINI_API_KEY or GEMINI_API_KEY == "YOUR_GEMINI_API_KEY_HERE":
+                response_text = "❌ Error: Gemini API Key belum dikonfigurasi. Silakan dapatkan API key gratis di https://makersuite.google.com/app/apikey"
+            else:
+                key = response_key(question, self.chat_context.fingerprint(self.chat_history))
+                # Pertanyaan sama yang masih diproses (mis. Send ditekan dua kali) menunggu jawaban
+                # yang sama, termasuk pencarian di cache
+                response_text, _ = await self.ai_requests.run(key, partial(self.cached_answer, key, question))
         self.chat_history.append({"role": "assistant", "content": response_text})
-        self.loop.call_soon_threadsafe(self.update_chat_display)
+        self.chat_transcript.append("assistant", response_text)
+        self.update_chat_display()
 
-    def get_ai_response_from_gemini(self, conversation_history):
-        # (Kode tidak berubah, pastikan Anda memasukkan API Key)
-        if not GEMINI_API_KEY or GEMINI_API_KEY == "YOUR_GEMINI_API_KEY_HERE":
-            return "❌ Error: Gemini API Key belum dikonfigurasi. Silakan dapatkan API key gratis di https://makersuite.google.com/app/apikey"
-        
-        summary = self.get_financial_summary()
-        settings = self.get_user_settings()
-        
-        system_prompt = f"""🤖 **Tour-Fin AI Assistant** - Travel Finance Expert
-Anda adalah asisten perjalanan yang ahli dalam:
-• Manajemen Keuangan Perjalanan
-• Rekomendasi Destinasi Wisata Indonesia
-• Tips Budgeting dan Penghematan
-• Saran Kuliner dan Budaya Lokal
-📊 **DATA KEUANGAN USER SAAT INI:**
-┌─────────────────────────────────────┐
-│ Mata Uang Utama    : {settings.home_currency}           │
-│ Total Pengeluaran  : {summary['total_spent']:,.0f} {settings.home_currency}    │
-│ Pengeluaran Hari Ini: {summary['today_spent']:,.0f} {settings.home_currency}   │
-│ Budget Perjalanan  : {settings.travel_budget:,.0f} {settings.home_currency}    │
-│ Sisa Budget        : {(settings.travel_budget - summary['total_spent']):,.0f} {settings.home_currency} │
-└─────────────────────────────────────┘
-🎯 **INSTRUKSI RESPONS:**
-✅ SELALU sebutkan data keuangan user dalam respons jika relevan
-✅ Berikan analisis spending pattern berdasarkan data
-✅ Saran penghematan atau peringatan jika budget menipis
-✅ Respons dalam Bahasa Indonesia yang ramah dan informatif
-✅ Berikan rekomendasi praktis dan actionable
-Selalu responsif, helpful, dan personal dalam setiap jawaban!"""
-
-        last_user_message = ""
-        for msg in reversed(conversation_history):
-            if msg['role'] == 'user':
-                last_user_message = msg['content']
-                break
-        
-        payload = {
-            "contents": [{"parts": [{"text": f"{system_prompt}\n\nUser: {last_user_message}\n\nBerikan respons yang informatif dan personal berdasarkan data keuangan user di atas."}]}],
-            "generationConfig": {"temperature": 0.7, "topK": 40, "topP": 0.95, "maxOutputTokens": 500},
-            "safetySettings": [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"}
-            ]
-        }
-        
+    async def cached_answer(self, key, question):
+        """The cached answer for key, or Gemini's (cached once complete); returns (text, complete)."""
+        # ResponseCache menulis ke SQLite (hits, last_used, eviction); dijalankan di executor agar
+        # UI tidak menunggu lock tulis yang sedang dipegang LedgerWriter
+        text = await self.loop.run_in_executor(None, self.response_cache.get, key)
+        if text is not None:
+            return text, True
+        text, complete = await self.stream_gemini_answer()
+        if complete:
+            await self.loop.run_in_executor(None, self.response_cache.put, key, question, text)
+        return text, complete
+
+    async def stream_gemini_answer(self):
+        """Stream Gemini's answer into chat_display; returns (text, complete)."""
+        parts = []
         try:
-            url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-            headers = {"Content-Type": "application/json"}
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'candidates' in data and len(data['candidates']) > 0:
-                    candidate = data['candidates'][0]
-                    if 'content' in candidate and 'parts' in candidate['content']:
-                        return candidate['content']['parts'][0]['text'].strip()
-                return "❌ Maaf, AI tidak dapat memberikan respons saat ini."
-            else:
-                error_data = response.json() if response.content else {}
-                error_message = error_data.get('error', {}).get('message', 'Unknown error')
-                print(f"Gemini API Error: {response.status_code} - {error_message}")
-                return f"❌ Error API ({response.status_code}): {error_message}."
-        except requests.exceptions.Timeout:
-            return "⏱️ Maaf, permintaan timeout."
-        except requests.exceptions.RequestException as e:
-            print(f"Request Error: {e}")
-            return "❌ Terjadi kesalahan jaringan."
+            async for chunk in self.gemini.stream(self.chat_context.build(self.chat_history)):
+                parts.append(chunk)
+                self.update_chat_display(self.chat_transcript.with_partial("assistant", "".join(parts)))
+            return "".join(parts).strip(), True
+        except AssistantError as e:
+            return "".join(parts).strip() + ("\n\n" if parts else "") + str(e), False
         except Exception as e:
-            print(f"Unexpected Error: {e}")
-            return "❌ Terjadi kesalahan tak terduga."
+            log_event('ai.unexpected_error', logging.ERROR, error=str(e))
+            return "❌ Terjadi kesalahan tak terduga.", False
 
-    def update_chat_display(self):
-        # (Kode tidak berubah)
+    def update_chat_display(self, text=None):
+        # Teks transkrip sudah tersusun (dan dibatasi panjangnya); tidak digabung ulang dari chat_history
         if hasattr(self, 'chat_display'):
-            chat_text = []
-            for msg in self.chat_history:
-                role = "🧑 Anda" if msg['role'] == 'user' else "🤖 Assistant"
-                chat_text.append(f"{role}: {msg['content']}")
-            self.chat_display.value = "\n\n".join(chat_text)
+            self.chat_display.value = self.chat_transcript.text if text is None else text
             self.chat_display.scroll_to_bottom()
 
     def get_financial_summary(self):
+        return self.ledger.summary()
+
+    def load_category_breakdown(self, categories=None):
+        # Agregasi per kategori dihitung di SQL (GROUP BY), bukan loop Python
+        if categories is None:
+            categories = self.ledger.summary()['categories']
+        apply_rows(self.category_table.data, category_rows(categories, self.rates.home_currency()))
+
+    def load_recent_transactions(self, transactions=None):
+        # Halaman saat ini dari pager; ID transaksi disimpan di baris tabel (tidak ditampilkan)
+        query = self.search_input.value
+        if transactions is None and match_expression(query) is not None:
+            transactions = self.ledger.search(query)
+            apply_rows(self.recent_table.data, transaction_rows(transactions, self.rates.home_currency()),
+                       key='transaction_id')
+            self.recent_page_label.text = f"{len(transactions)} found" if transactions else "No matches"
+            self.btn_newer_page.enabled = self.btn_older_page.enabled = False
+        else:
+            if transactions is None:
+                transactions = self.transaction_pager.current()
+            transactions = overlay_rows(transactions, self.writer.pending, newest=not self.transaction_pager.has_newer())
+            apply_rows(self.recent_table.data, transaction_rows(transactions, self.rates.home_currency()),
+                       key='transaction_id')
+            self.update_page_controls()
+        # Sinkronkan tombol Edit/Delete dengan baris yang (masih) terpilih. Transaksi terpilih yang
+        # hilang dari tabel (dihapus, pindah halaman) tidak boleh berpindah ke baris lain di posisinya
+        row, selected = self.recent_table.selection, self.selected_transaction_id
+        if selected is not None and getattr(row, 'transaction_id', None) != selected:
+            row = None
+        self.select_transaction(row)
+
+    def on_search_change(self, widget):
+        # Cari setelah ketikan berhenti sejenak, bukan per tombol
+        if self._search_handle is not None:
+            self._search_handle.cancel()
+        self._search_handle = self.loop.call_later(SEARCH_DEBOUNCE, self.run_search)
+
+    def run_search(self):
+        self._search_handle = None
+        with metrics.scope('ui.search'), db_session:
+            self.load_recent_transactions()
+
+    def on_clear_search(self, widget):
+        self.search_input.value = ""
+        if self._search_handle is not None:
+            self._search_handle.cancel()
+        self.run_search()
+
+    def update_page_controls(self):
+        self.recent_page_label.text = f"Page {self.transaction_pager.page_number + 1}"
+        self.btn_newer_page.enabled = self.transaction_pager.has_newer()
+        self.btn_older_page.enabled = self.transaction_pager.has_older()
+
+    def on_older_page(self, widget):
         with db_session:
-            today_start = datetime.combine(datetime.now().date(), datetime.min.time())
-            total_spent = sum(t.amount_home_currency for t in Transaction.select()) or 0
-            today_spent = sum(t.amount_home_currency for t in Transaction.select() if t.timestamp >= today_start) or 0
-            return {'total_spent': total_spent, 'today_spent': today_spent}
+            self.load_recent_transactions(self.transaction_pager.older())
 
-    def load_category_breakdown(self):
+    def on_newer_page(self, widget):
         with db_session:
-            categories = {}
-            for t in Transaction.select():
-                cat = t.category
-                if cat not in categories:
-                    categories[cat] = {'amount': 0, 'count': 0}
-                categories[cat]['amount'] += t.amount_home_currency
-                categories[cat]['count'] += 1
-            settings = self.get_user_settings()
-            table_data = [[cat, f"{data['amount']:,.0f} {settings.home_currency}", str(data['count'])]
-                          for cat, data in sorted(categories.items(), key=lambda x: x[1]['amount'], reverse=True)]
-            self.category_table.data = table_data
-
-    def load_recent_transactions(self):
-        with db_session:
-            # ---  --- Memuat ID transaksi bersama data lainnya
-            transactions = list(select(t for t in Transaction).order_by(desc(Transaction.timestamp))[:10])
-            settings = self.get_user_settings()
-            table_data = []
-            for t in transactions:
-                amount_str = (f"{t.amount:,.0f} {t.currency}" if t.currency == settings.home_currency else
-                              f"{t.amount:,.2f} {t.currency} (≈{t.amount_home_currency:,.0f} {settings.home_currency})")
-                table_data.append(
-                    # ---  --- Menyimpan ID di data, tapi tidak menampilkannya di heading
-                    (
-                        t.id, # Data ID untuk internal
-                        t.description[:30] + ("..." if len(t.description) > 30 else ""),
-                        amount_str, 
-                        t.category, 
-                        t.timestamp.strftime("%m/%d %H:%M")
-                    )
-                )
-            # ---  --- Memotong data ID saat menampilkannya ke tabel
-            self.recent_table.data = [row[1:] for row in table_data]
-            # ---  --- Menyimpan data lengkap (dengan ID) untuk referensi
-            self._full_recent_data = table_data
-
+            self.load_recent_transactions(self.transaction_pager.newer())
+
+    def show_screen(self, name, refresh, *args):
+        """Show a cached screen, building its widgets only the first time.
+
+        refresh(*args) pushes current data into the widgets inside one
+        db_session; its time and query count are recorded under
+        screen.<name>, the one-off build under ui.build.<name>.
+        """
+        screen = self._screens.get(name)
+        created = 0
+        if screen is None:
+            with metrics.timer(f'ui.build.{name}'):
+                screen = self._screens[name] = getattr(self, f'build_{name}')()
+            created = count_widgets(screen)
+        self.ui_stats['navigations'] += 1
+        self.ui_stats['widgets_created'] += created
+        self.ui_stats['last_navigation'] = (name, created)
+        with metrics.scope(f'screen.{name}'), db_session:
+            refresh(*args)
+        self.main_window.content = screen
+        return screen
 
     def show_dashboard(self, widget):
-        self.main_window.content = self.build_dashboard()
+        self.show_screen('dashboard', self.refresh_dashboard)
 
     def show_add_transaction(self, widget):
-        self.main_window.content = self.build_add_transaction()
+        self.show_screen('transaction_form', self.refresh_transaction_form)
 
     # ---  --- Fungsi untuk menampilkan halaman edit
     def show_edit_transaction(self, widget):
-        if self.selected_transaction_id:
-            self.main_window.content = self.build_edit_transaction(self.selected_transaction_id)
-        else:
+        if not self.selected_transaction_id:
             self.main_window.info_dialog("No Selection", "Please select a transaction to edit.")
+            return
+        with db_session:
+            transaction = self.ledger.get_transaction(self.selected_transaction_id)
+            if transaction:
+                self.show_screen('transaction_form', self.refresh_transaction_form, transaction)
+        if not transaction:
+            self.main_window.error_dialog("Error", "Transaction not found.")
 
     def show_ai_assistant(self, widget):
-        self.main_window.content = self.build_ai_assistant()
+        self.show_screen('ai_assistant', self.update_chat_display)
 
     def show_settings(self, widget):
-        self.main_window.content = self.build_settings()
+        self.show_screen('settings', self.refresh_settings)
+
+    def show_diagnostics(self, widget):
+        self.show_screen('diagnostics', self.refresh_diagnostics)
 
     # ---  --- Handler ketika baris di tabel transaksi dipilih
-    def on_select_transaction(self, widget, row):
-        if row is not None:
-            # Dapatkan ID dari data lengkap yang kita simpan
-            self.selected_transaction_id = self._full_recent_data[row.index][0]
+    def on_select_transaction(self, widget, **kwargs):
+        self.select_transaction(widget.selection)
+
+    def select_transaction(self, row):
+        # Baris tanpa ID masih antre di LedgerWriter: belum bisa diedit/dihapus. Setelah commit
+        # tabel dimuat ulang dan fungsi ini dipanggil lagi, jadi tombolnya aktif sendiri
+        if row is not None and row.transaction_id is not None:
+            # ID transaksi tersimpan langsung di baris tabel
+            self.selected_transaction_id = row.transaction_id
             # Aktifkan tombol Edit dan Delete
             self.btn_edit_transaction.enabled = True
             self.btn_delete_transaction.enabled = True
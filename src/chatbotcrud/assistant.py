@@ -0,0 +1,297 @@
+"""Streaming client and request context for the Gemini AI assistant.
+
+GeminiClient keeps one requests.Session, so successive messages reuse a
+pooled keep-alive connection instead of a new TLS handshake each time.
+It calls streamGenerateContent with alt=sse and yields the answer text
+as the server produces it; stream() is an async generator for the app's
+event loop, fed from a worker thread that reads the response.
+
+ContextBuilder turns the chat history into a request: a system
+instruction with the user's finances (rebuilt only when the ledger or
+settings change) and as many recent turns as fit a token budget.
+ChatTranscript keeps the text shown in the chat window, appended one
+message at a time and capped in length.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import date
+
+import requests
+
+from .analytics import BURN_RATE_DAYS
+from .diagnostics import log_event, metrics
+
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:streamGenerateContent"
+# (connect, read): read adalah jeda maksimum antar potongan, bukan durasi seluruh jawaban
+GEMINI_TIMEOUT = (10, 30)
+GENERATION_CONFIG = {"temperature": 0.7, "topK": 40, "topP": 0.95, "maxOutputTokens": 500}
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
+
+# Perkiraan kasar token Gemini (~4 karakter per token); cukup untuk menjaga ukuran prompt
+CHARS_PER_TOKEN = 4
+HISTORY_TOKEN_BUDGET = 1500
+HISTORY_MAX_MESSAGES = 20
+CHAT_DISPLAY_CHARS = 20000
+ROLE_LABELS = {'user': "🧑 Anda", 'assistant': "🤖 Assistant"}
+
+SYSTEM_PROMPT = """Anda adalah Tour-Fin AI Assistant, asisten perjalanan yang ahli dalam manajemen keuangan perjalanan, rekomendasi destinasi wisata Indonesia, tips budgeting dan penghematan, serta kuliner dan budaya lokal.
+Data keuangan user saat ini (mata uang {home_currency}):
+- Total pengeluaran: {total_spent:,.0f}
+- Pengeluaran hari ini: {today_spent:,.0f}
+- Budget perjalanan: {travel_budget:,.0f}
+- Sisa budget: {remaining:,.0f}
+- Kategori terbesar: {categories}
+- Rata-rata pengeluaran per hari ({burn_rate_days} hari terakhir): {burn_rate:,.0f}
+- Perkiraan budget habis: {depletion}
+- Pengeluaran per minggu (mulai Senin): {weeks}
+- Mata uang transaksi: {currencies}
+Sebutkan data keuangan user jika relevan, analisis pola pengeluaran, beri saran penghematan atau peringatan jika budget menipis, dan beri rekomendasi praktis. Jawab dalam Bahasa Indonesia yang ramah dan informatif."""
+TOP_CATEGORIES = 5
+RECENT_WEEKS = 4
+
+_END = object()
+
+
+class AssistantError(Exception):
+    """A failed request; str() is the message shown to the user in the chat."""
+
+
+def build_payload(contents):
+    """generateContent request body for contents ([{"role", "parts": [{"text"}]}])."""
+    return {"contents": contents, "generationConfig": GENERATION_CONFIG, "safetySettings": SAFETY_SETTINGS}
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _depletion_text(forecast):
+    if forecast['days_left'] is None:
+        return "-"
+    if forecast['days_left'] <= 0:
+        return "budget sudah habis"
+    return f"{forecast['days_left']:.0f} hari lagi (sekitar {forecast['depletion_date']:%d-%m-%Y})"
+
+
+def render_system_prompt(summary, report):
+    """System instruction text for a LedgerService.summary() and LedgerService.analytics()."""
+    categories = ", ".join(f"{category} {amount:,.0f} ({count}x)"
+                           for category, amount, count in summary['categories'][:TOP_CATEGORIES]) or "-"
+    weeks = ", ".join(f"{bucket.start:%d-%m} {bucket.amount:,.0f}" for bucket in report['weekly'][-RECENT_WEEKS:]) or "-"
+    currencies = ", ".join(f"{currency} {amount:,.0f} ({count}x)"
+                           for currency, amount, count in report['currencies'][:TOP_CATEGORIES]) or "-"
+    forecast = report['forecast']
+    return SYSTEM_PROMPT.format(**dict(summary, categories=categories, weeks=weeks, currencies=currencies,
+                                       burn_rate_days=BURN_RATE_DAYS, burn_rate=forecast['burn_rate'],
+                                       depletion=_depletion_text(forecast)))
+
+
+def history_window(history, token_budget=HISTORY_TOKEN_BUDGET, max_messages=HISTORY_MAX_MESSAGES):
+    """The newest messages of history that fit token_budget, oldest first.
+
+    The latest message is always kept (cut to the budget if it alone is
+    too long) and the window starts at a user turn, as Gemini expects.
+    A user message repeating the one right before it (Send pressed twice
+    before the answer came) is sent once.
+    """
+    window = []
+    used = 0
+    for index in range(len(history) - 1, -1, -1):
+        message = history[index]
+        if index and message['role'] == 'user' and history[index - 1] == message:
+            continue
+        tokens = estimate_tokens(message['content'])
+        if window and (used + tokens > token_budget or len(window) >= max_messages):
+            break
+        if not window and tokens > token_budget:
+            message = dict(message, content=message['content'][-token_budget * CHARS_PER_TOKEN:])
+            tokens = token_budget
+        window.append(message)
+        used += tokens
+    window.reverse()
+    while len(window) > 1 and window[0]['role'] != 'user':
+        window.pop(0)
+    return window
+
+
+class ContextBuilder:
+    """Gemini requests for a chat: cached finance snapshot plus a bounded history window.
+
+    The system instruction is rendered from ledger.summary() and
+    ledger.analytics() only when ledger.version, the settings snapshot or
+    the date changed since the last request; rebuilds counts how often
+    that happened.
+    """
+
+    def __init__(self, ledger, token_budget=HISTORY_TOKEN_BUDGET, max_messages=HISTORY_MAX_MESSAGES):
+        self.ledger = ledger
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.rebuilds = 0
+        self._key = None
+        self._system_prompt = None
+
+    def system_prompt(self):
+        # Kunci dibaca sebelum data: version baru naik setelah commit, jadi prompt
+        # yang dirender dari ledger sebelum commit tidak tersimpan dengan versi baru
+        key = (self.ledger.version, self.ledger.settings(), date.today())
+        if key != self._key:
+            self._system_prompt = render_system_prompt(self.ledger.summary(), self.ledger.analytics())
+            self._key = key
+            self.rebuilds += 1
+        return self._system_prompt
+
+    def fingerprint(self, history):
+        """What the answer to history's last message depends on besides the question.
+
+        The system prompt plus the earlier messages of the window sent with
+        it, for responses.response_key(): the same question after a
+        different conversation gets its own cache entry.
+        """
+        earlier = history_window(history, self.token_budget, self.max_messages)[:-1]
+        return "\0".join([self.system_prompt(), *(f"{m['role']}:{m['content']}" for m in earlier)])
+
+    def build(self, history):
+        """Request body for the chat so far (history ends with the user's new message)."""
+        contents = [{"role": "user" if message['role'] == 'user' else "model",
+                     "parts": [{"text": message['content']}]}
+                    for message in history_window(history, self.token_budget, self.max_messages)]
+        payload = build_payload(contents)
+        payload["systemInstruction"] = {"parts": [{"text": self.system_prompt()}]}
+        return payload
+
+
+class ChatTranscript:
+    """Text of the chat window, appended per message and capped at max_chars.
+
+    Older messages are dropped from the front once the text grows past
+    max_chars, so setting the widget's value costs the same in a long
+    chat as in a short one.
+    """
+
+    def __init__(self, max_chars=CHAT_DISPLAY_CHARS):
+        self.max_chars = max_chars
+        self.text = ""
+        self._blocks = deque()
+
+    def append(self, role, content):
+        block = f"{ROLE_LABELS.get(role, role)}: {content}"
+        self._blocks.append(len(block))
+        self.text = f"{self.text}\n\n{block}" if len(self._blocks) > 1 else block
+        while len(self.text) > self.max_chars and len(self._blocks) > 1:
+            self.text = self.text[self._blocks.popleft() + 2:]
+        return self.text
+
+    def with_partial(self, role, content):
+        """The text plus a message that is still being streamed in."""
+        block = f"{ROLE_LABELS.get(role, role)}: {content}"
+        return f"{self.text}\n\n{block}" if self.text else block
+
+
+def _chunk_text(event):
+    """Text parts of one streamed GenerateContentResponse."""
+    candidates = event.get('candidates') or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get('content') or {}).get('parts') or []
+    return "".join(part.get('text', "") for part in parts)
+
+
+class GeminiClient:
+    """Gemini streamGenerateContent over one pooled keep-alive session."""
+
+    def __init__(self, api_key, url=GEMINI_STREAM_URL, session=None, timeout=GEMINI_TIMEOUT):
+        self.api_key = api_key
+        self.url = url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def iter_text(self, payload, cancelled=None):
+        """Blocking generator of answer text chunks; raises AssistantError on failure.
+
+        cancelled is an optional threading.Event that stops reading (and
+        releases the connection) between chunks.
+        """
+        started = time.perf_counter()
+        first_chunk = True
+        produced = False
+        try:
+            with self.session.post(self.url, params={'alt': 'sse', 'key': self.api_key}, json=payload,
+                                   stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    try:
+                        message = response.json().get('error', {}).get('message', 'Unknown error')
+                    except ValueError:
+                        message = 'Unknown error'
+                    log_event('ai.api_error', logging.WARNING, status=response.status_code, error=message)
+                    raise AssistantError(f"❌ Error API ({response.status_code}): {message}.")
+                # chunk_size=None: setiap potongan diproses begitu tiba, tanpa menunggu buffer penuh
+                for line in response.iter_lines(chunk_size=None):
+                    if cancelled is not None and cancelled.is_set():
+                        return
+                    # Server-sent events: setiap event adalah satu baris "data: {json}"
+                    if not line.startswith(b'data:'):
+                        continue
+                    text = _chunk_text(json.loads(line[5:].decode('utf-8')))
+                    if not text:
+                        continue
+                    if first_chunk:
+                        metrics.record('api.gemini.first_token', time.perf_counter() - started)
+                        first_chunk = False
+                    produced = True
+                    yield text
+        except requests.exceptions.Timeout:
+            log_event('ai.timeout', logging.WARNING)
+            raise AssistantError("⏱️ Maaf, permintaan timeout.")
+        except requests.exceptions.RequestException as e:
+            log_event('ai.request_error', logging.WARNING, error=str(e))
+            raise AssistantError("❌ Terjadi kesalahan jaringan.")
+        except ValueError as e:
+            log_event('ai.bad_response', logging.WARNING, error=str(e))
+            raise AssistantError("❌ Maaf, AI tidak dapat memberikan respons saat ini.")
+        finally:
+            metrics.record('api.gemini', time.perf_counter() - started)
+        if not produced:
+            raise AssistantError("❌ Maaf, AI tidak dapat memberikan respons saat ini.")
+
+    async def stream(self, payload):
+        """Async generator of answer text chunks for the running event loop.
+
+        The HTTP read runs on the loop's default executor and each chunk is
+        handed back with call_soon_threadsafe as soon as it arrives.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def pump():
+            try:
+                for text in self.iter_text(payload, cancelled):
+                    loop.call_soon_threadsafe(chunks.put_nowait, text)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, _END)
+
+        reader = loop.run_in_executor(None, pump)
+        try:
+            while True:
+                item = await chunks.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Konsumen berhenti lebih awal: hentikan pembacaan di thread worker
+            cancelled.set()
+            await reader
@@ -0,0 +1,175 @@
+"""Command-line client for the ledger; never imports toga.
+
+    python -m chatbotcrud.cli [--db PATH] add|list|search|summary|import|export|bench ...
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from .analytics import BURN_RATE_DAYS, spending_report
+from .models import TRAVEL_CATEGORIES, CURRENCY_MAP
+from .search import SEARCH_LIMIT
+
+BENCH_REPEAT = 50
+BENCH_CONVERSIONS = 100_000
+
+
+def cmd_add(ledger, args):
+    timestamp = datetime.fromisoformat(args.date) if args.date else None
+    transaction_id = ledger.add_transaction(args.description, args.amount, args.currency.upper(),
+                                            args.category, timestamp=timestamp)
+    print(f"Added transaction {transaction_id}")
+
+
+def _print_rows(ledger, rows):
+    home_currency = ledger.rates.home_currency()
+    for t_id, description, amount, currency, amount_home, category, timestamp in rows:
+        print(f"{t_id:>7}  {timestamp:%Y-%m-%d %H:%M}  {amount:>12,.2f} {currency}"
+              f"  {amount_home:>14,.0f} {home_currency}  {category:<18} {description}")
+
+
+def cmd_list(ledger, args):
+    _print_rows(ledger, ledger.recent(args.limit))
+
+
+def cmd_search(ledger, args):
+    _print_rows(ledger, ledger.search(" ".join(args.query), args.limit))
+
+
+def cmd_summary(ledger, args):
+    summary = ledger.summary()
+    currency = summary['home_currency']
+    print(f"Total spending : {summary['total_spent']:,.0f} {currency}")
+    print(f"Today          : {summary['today_spent']:,.0f} {currency}")
+    if summary['travel_budget'] > 0:
+        print(f"Budget         : {summary['travel_budget']:,.0f} {currency}")
+        print(f"Remaining      : {summary['remaining']:,.0f} {currency}")
+    forecast = ledger.analytics()['forecast']
+    print(f"Burn rate      : {forecast['burn_rate']:,.0f} {currency}/day (last {BURN_RATE_DAYS} days)")
+    if forecast['depletion_date'] is not None:
+        print(f"Budget lasts   : {forecast['days_left']:.1f} days (until {forecast['depletion_date']})")
+    for category, amount, count in summary['categories']:
+        print(f"  {category:<18} {amount:>14,.0f} {currency}  ({count})")
+
+
+def cmd_import(ledger, args):
+    def report(result):
+        print(f"{result['rows_read']} rows read, {result['imported']} imported, "
+              f"{result['rows_per_sec']:,.0f} rows/sec")
+
+    result = ledger.import_statement(args.statement, fmt=args.format, default_currency=args.currency,
+                                     chunk_size=args.chunk_size, restart=args.restart, progress=report)
+    if result['already_finished']:
+        print("Statement was already imported (use --restart to import it again)")
+        return
+    if result['resumed_from']:
+        print(f"Resumed after row {result['resumed_from']}")
+    for line_number, reason in result['errors']:
+        print(f"line {line_number}: {reason}")
+    print(f"Imported {result['imported']} transactions, skipped {result['skipped']}, "
+          f"{result['seconds']:.2f}s ({result['rows_per_sec']:,.0f} rows/sec)")
+
+
+def cmd_export(ledger, args):
+    result = ledger.export(args.table, args.output, fmt=args.format, chunk_size=args.chunk_size)
+    print(f"Exported {result['rows']} rows to {args.output} ({result['bytes'] / 1e6:.1f} MB, "
+          f"{result['seconds']:.2f}s, {result['rows_per_sec']:,.0f} rows/sec)")
+
+
+def _best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def cmd_bench(ledger, args):
+    """Time the main read paths against this database."""
+    currencies = list(CURRENCY_MAP.values())
+    amounts = [float(i % 1000 + 1) for i in range(BENCH_CONVERSIONS)]
+    codes = [currencies[i % len(currencies)] for i in range(BENCH_CONVERSIONS)]
+    timings = [
+        ('summary', _best_of(ledger.summary, args.repeat)),
+        ('recent page', _best_of(ledger.recent, args.repeat)),
+        ('search', _best_of(lambda: ledger.search("kopi"), args.repeat)),
+        # Tanpa cache LedgerService.analytics(): biaya satu kali per versi ledger
+        ('analytics', _best_of(lambda: spending_report(ledger.settings()), args.repeat)),
+        (f'convert {BENCH_CONVERSIONS:,}', _best_of(lambda: ledger.rates.cache.convert_many(amounts, codes),
+                                                     max(1, args.repeat // 10))),
+    ]
+    for name, seconds in timings:
+        print(f"{name:>16}: {seconds * 1000:8.2f} ms")
+
+
+def build_parser():
+    from .core import default_database_path
+    from .export import COLUMNAR_EXTENSION, EXPORT_CHUNK_SIZE, EXPORT_TABLES, FORMATS
+    from .importer import IMPORT_CHUNK_SIZE
+
+    parser = argparse.ArgumentParser(prog='chatbotcrud', description="Tourist Money Manager ledger tools.")
+    parser.add_argument('--db', default=default_database_path(),
+                        help="path to tourist_money_manager.sqlite (default: $TMM_DATABASE or the app's data dir)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="add one transaction")
+    add.add_argument('description')
+    add.add_argument('amount', type=float)
+    add.add_argument('currency', help="currency code, e.g. JPY")
+    add.add_argument('category', choices=TRAVEL_CATEGORIES)
+    add.add_argument('--date', help="ISO date/time (default: now)")
+    add.set_defaults(handler=cmd_add)
+
+    listing = commands.add_parser('list', help="show the newest transactions")
+    listing.add_argument('--limit', type=int, default=20)
+    listing.set_defaults(handler=cmd_list)
+
+    searching = commands.add_parser('search', help="find transactions by description or category")
+    searching.add_argument('query', nargs='+', help="words to match; the last one may be a prefix")
+    searching.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    searching.set_defaults(handler=cmd_search)
+
+    commands.add_parser('summary', help="totals, budget and per-category spending").set_defaults(handler=cmd_summary)
+
+    importing = commands.add_parser('import', help="import a CSV or OFX statement")
+    importing.add_argument('statement', help="CSV or OFX/QFX file")
+    importing.add_argument('--format', choices=['csv', 'ofx'], help="default: from the file extension")
+    importing.add_argument('--currency', help="currency for rows without one (default: home currency)")
+    importing.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    importing.add_argument('--restart', action='store_true', help="ignore the saved position and import from the top")
+    importing.set_defaults(handler=cmd_import)
+
+    exporting = commands.add_parser('export', help="export a table to CSV, JSON Lines or columnar")
+    exporting.add_argument('table', choices=sorted(EXPORT_TABLES))
+    exporting.add_argument('output', help=f"output file (.csv, .jsonl or {COLUMNAR_EXTENSION})")
+    exporting.add_argument('--format', choices=FORMATS, help="default: from the output extension")
+    exporting.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+    exporting.set_defaults(handler=cmd_export)
+
+    bench = commands.add_parser('bench', help="time summary, paging and conversion on this database")
+    bench.add_argument('--repeat', type=int, default=BENCH_REPEAT)
+    bench.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    from .core import open_ledger
+
+    args = build_parser().parse_args(argv)
+    ledger = open_ledger(args.db)
+    try:
+        args.handler(ledger, args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        # Konversi yang tercatat baru ditulis ke ConversionHistory saat log dihentikan
+        if ledger.conversions is not None:
+            ledger.conversions.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+"""Buffered audit log of currency conversions in ConversionHistory.
+
+ConversionLog.record() only appends to an in-memory buffer, so pricing a
+transaction never waits for an extra INSERT. A background thread writes
+the buffer with one executemany every flush_interval seconds, or as soon
+as batch_size conversions are waiting. compact() keeps the table bounded:
+rows older than the retention window, and the oldest rows beyond
+max_rows, are folded into daily ConversionRollup rows (totals and the
+lowest/highest rate used; a conversion of 0 counts but has no rate) and
+deleted.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from pony.orm import db_session
+
+from .diagnostics import executemany, log_event, metrics
+from .models import db
+
+CONVERSION_FLUSH_INTERVAL = 5.0
+CONVERSION_BATCH_SIZE = 256
+CONVERSION_RETENTION = timedelta(days=30)
+CONVERSION_MAX_ROWS = 10_000
+
+
+class ConversionLog:
+    """Batched, buffered appender for ConversionHistory with retention and compaction.
+
+    record() is safe to call from any thread. start() runs the flusher
+    thread (which also compacts once on startup); without it, call
+    flush() yourself. stop() writes whatever is still buffered.
+    """
+
+    def __init__(self, flush_interval=CONVERSION_FLUSH_INTERVAL, batch_size=CONVERSION_BATCH_SIZE,
+                 retention=CONVERSION_RETENTION, max_rows=CONVERSION_MAX_ROWS, clock=datetime.now):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self.max_rows = max_rows
+        self.clock = clock
+        self.recorded = 0
+        self.written = 0
+        self.flushes = 0
+        self.compacted = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        # Perkiraan jumlah baris ConversionHistory; dihitung sekali, lalu ditambah per flush
+        self._rows = None
+
+    def record(self, from_currency, to_currency, amount, result, timestamp=None, transaction_id=None):
+        """Buffer one conversion (of transaction_id, if it priced one); it reaches the database with the next flush."""
+        entry = (from_currency, to_currency, amount, result, str(timestamp or self.clock()), transaction_id)
+        with self._lock:
+            self._buffer.append(entry)
+            self.recorded += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='conversion-log', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher thread (if running) and write the remaining buffer."""
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        self._guarded(self.compact)
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._guarded(self.flush)
+
+    def _guarded(self, func):
+        try:
+            func()
+        except Exception as e:
+            log_event('conversions.error', logging.ERROR, action=func.__name__, error=str(e))
+
+    def flush(self):
+        """Write the buffered conversions in one statement; returns how many were written."""
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+        if not entries:
+            return 0
+        try:
+            with metrics.timer('conversions.flush'), db_session:
+                executemany(
+                    db.get_connection(),
+                    'INSERT INTO "ConversionHistory" ("from_currency", "to_currency", "amount", "result",'
+                    ' "timestamp", "transaction_id") VALUES (?, ?, ?, ?, ?, ?)', entries)
+                rows = self._row_count() + len(entries)
+                self._rows = rows
+                if rows > self.max_rows:
+                    self.compact()
+        except Exception:
+            # Jangan hilangkan audit: kembalikan ke buffer untuk flush berikutnya
+            with self._lock:
+                self._buffer[:0] = entries
+            raise
+        self.written += len(entries)
+        self.flushes += 1
+        return len(entries)
+
+    def _row_count(self):
+        if self._rows is None:
+            return db.select('SELECT COUNT(*) FROM "ConversionHistory"')[0]
+        return self._rows
+
+    @db_session
+    def compact(self, now=None):
+        """Fold rows past the retention window or beyond max_rows into ConversionRollup.
+
+        Returns the number of ConversionHistory rows removed.
+        """
+        cutoff = str((now or self.clock()) - self.retention)
+        connection = db.get_connection()
+        total = connection.execute('SELECT COUNT(*) FROM "ConversionHistory"').fetchone()[0]
+        if total > self.max_rows:
+            # Baris tertua di atas batas juga diringkas: cutoff maju ke baris pertama yang disimpan
+            keep_from = connection.execute(
+                'SELECT "timestamp" FROM "ConversionHistory" ORDER BY "timestamp" LIMIT 1 OFFSET ?',
+                (total - self.max_rows,)).fetchone()[0]
+            cutoff = max(cutoff, keep_from)
+        # Konversi dengan amount 0 ikut dihitung, tapi tidak punya kurs (result / 0 = NULL).
+        # Hari yang hanya berisi konversi seperti itu menyimpan kurs 0.0 (belum ada kurs);
+        # amount 0 pada baris ringkasan menandainya, jadi kurs berikutnya menggantikannya
+        connection.execute(
+            'INSERT INTO "ConversionRollup" ("day", "from_currency", "to_currency", "amount", "result",'
+            ' "conversions", "min_rate", "max_rate")'
+            ' SELECT date("timestamp"), "from_currency", "to_currency", SUM("amount"), SUM("result"), COUNT(*),'
+            ' coalesce(MIN("result" / nullif("amount", 0)), 0.0), coalesce(MAX("result" / nullif("amount", 0)), 0.0)'
+            ' FROM "ConversionHistory" WHERE "timestamp" < ? GROUP BY 1, 2, 3'
+            ' ON CONFLICT ("day", "from_currency", "to_currency") DO UPDATE SET'
+            ' "amount" = "amount" + excluded."amount", "result" = "result" + excluded."result",'
+            ' "conversions" = "conversions" + excluded."conversions",'
+            ' "min_rate" = CASE WHEN excluded."amount" = 0 THEN "min_rate" WHEN "amount" = 0 THEN excluded."min_rate"'
+            ' ELSE min("min_rate", excluded."min_rate") END,'
+            ' "max_rate" = CASE WHEN excluded."amount" = 0 THEN "max_rate" WHEN "amount" = 0 THEN excluded."max_rate"'
+            ' ELSE max("max_rate", excluded."max_rate") END',
+            (cutoff,))
+        removed = connection.execute('DELETE FROM "ConversionHistory" WHERE "timestamp" < ?', (cutoff,)).rowcount
+        self._rows = total - removed
+        self.compacted += removed
+        if removed:
+            log_event('conversions.compacted', removed=removed, kept=self._rows)
+        return removed
+
+    def stats(self):
+        return {'recorded': self.recorded, 'written': self.written, 'pending': self.pending(),
+                'flushes': self.flushes, 'compacted': self.compacted}
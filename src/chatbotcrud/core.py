@@ -0,0 +1,316 @@
+"""Headless services behind the app and the CLI.
+
+Nothing here imports toga: the Toga app, the command line and batch jobs
+all go through LedgerService and RatesService.
+"""
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import partial
+
+from pony.orm import db_session, flush
+
+from .aggregates import dashboard_aggregates, record_transaction
+from .analytics import spending_report
+from .conversions import ConversionLog
+from .diagnostics import instrumented
+from .models import Transaction, UserSettings, CURRENCY_MAP, TRAVEL_CATEGORIES, init_database
+from .pagination import PAGE_SIZE, transactions_page
+from .rates import RateCache, RateHistoryIndex, RateRefresher, reprice_ledger
+from .search import SEARCH_LIMIT, search_transactions
+
+DATABASE_NAME = 'tourist_money_manager.sqlite'
+
+# Salinan UserSettings yang tidak bisa diubah; aman dibaca di luar db_session dan dari thread lain
+Settings = namedtuple('Settings', ['home_currency', 'travel_budget'])
+DEFAULT_SETTINGS = Settings('IDR', 0.0)
+
+
+class RatesService:
+    """Exchange rates: the in-memory RateCache plus optional API refreshes.
+
+    api_url is the exchangerate-api endpoint; without one refresh() is a
+    no-op and conversions use whatever ExchangeRate already holds.
+    """
+
+    def __init__(self, api_url=None, rate_cache=None):
+        self.api_url = api_url
+        self.cache = rate_cache or RateCache()
+        self.refresher = None
+
+    def load(self):
+        self.cache.load()
+
+    def home_currency(self):
+        return self.cache.get_home_currency()
+
+    def get_rate(self, currency_code):
+        return self.cache.get_rate(currency_code)
+
+    def convert(self, amount, from_currency):
+        return self.cache.convert(amount, from_currency)
+
+    def refresh(self, force=False):
+        """Fetch new rates if they are stale (or force); True if they changed or were confirmed."""
+        if not self.api_url:
+            return False
+        if self.refresher is None:
+            self.refresher = RateRefresher(self.api_url, rate_cache=self.cache)
+        return self.refresher.refresh(force=force)
+
+
+def validate_transaction(description, amount, currency, category):
+    """Raise ValueError unless the values make a valid transaction."""
+    if not description or not description.strip():
+        raise ValueError("Description is required")
+    if amount <= 0:
+        raise ValueError("Amount must be positive")
+    if currency not in CURRENCY_MAP.values():
+        raise ValueError(f"Unknown currency: {currency}")
+    if category not in TRAVEL_CATEGORIES:
+        raise ValueError(f"Unknown category: {category}")
+
+
+class LedgerService:
+    """Transactions, settings and summaries, with the spending rollup kept in sync.
+
+    Every write goes through one of the methods here, which bumps
+    version so callers can tell that cached views of the ledger are stale.
+    Invalid input raises ValueError.
+
+    Each method opens its own db_session when called on its own and joins
+    the caller's when one is active (Pony sessions nest), so a user action
+    wrapped in one session() reads and writes in a single SQLite
+    transaction with one commit. version only moves once that commit is
+    done: a reader that sees the new version also sees the new rows.
+
+    settings() is read from UserSettings once and then served from memory
+    until save_settings() or invalidate_settings(); analytics() is likewise
+    computed once per ledger version, settings snapshot and day.
+
+    With a ConversionLog, every conversion that prices a transaction is
+    recorded in it with the transaction's id once the write has committed
+    (buffered; the log writes ConversionHistory itself).
+    """
+
+    def __init__(self, rates, conversions=None):
+        self.rates = rates
+        self.conversions = conversions
+        self.version = 0
+        self._settings = None
+        self._analytics = None
+        # Per thread: pekerjaan yang menunggu commit session() terluar (None di luar session)
+        self._local = threading.local()
+
+    @contextmanager
+    def session(self):
+        """db_session for a group of ledger calls, published when it commits.
+
+        Writes inside it bump version only after the outermost session()
+        has committed; if it raises, the transaction rolls back and the
+        queued work is dropped. A plain db_session around ledger calls
+        still groups them, but each write publishes as its method returns.
+        """
+        if getattr(self._local, 'after_commit', None) is not None:
+            with db_session:
+                yield
+            return
+        self._local.after_commit = []
+        try:
+            with db_session:
+                yield
+            queued = self._local.after_commit
+        finally:
+            self._local.after_commit = None
+        for action in queued:
+            action()
+
+    def _after_commit(self, action):
+        """Run action once the enclosing session() commits (at once outside one)."""
+        queued = getattr(self._local, 'after_commit', None)
+        if queued is None:
+            action()
+        else:
+            queued.append(action)
+
+    def _bump_version(self):
+        self.version += 1
+
+    @instrumented('ledger.settings')
+    def settings(self):
+        """The current Settings snapshot (home_currency, travel_budget)."""
+        settings = self._settings
+        if settings is None:
+            with db_session:
+                row = UserSettings.select().first()
+                settings = Settings(row.home_currency, row.travel_budget) if row else DEFAULT_SETTINGS
+            self._settings = settings
+        return settings
+
+    def invalidate_settings(self):
+        """Forget the cached snapshot; the next settings() reads UserSettings again."""
+        self._settings = None
+
+    @instrumented('ledger.save_settings')
+    def save_settings(self, home_currency, travel_budget):
+        """Store the settings; a new home currency reprices the ledger. Returns True if it changed."""
+        if home_currency not in CURRENCY_MAP.values():
+            raise ValueError(f"Unknown currency: {home_currency}")
+        with self.session():
+            settings = UserSettings.select().first()
+            currency_changed = settings is None or settings.home_currency != home_currency
+            if settings:
+                settings.home_currency = home_currency
+                settings.travel_budget = travel_budget
+            else:
+                UserSettings(home_currency=home_currency, travel_budget=travel_budget)
+            self.invalidate_settings()
+            self.rates.load()
+            if currency_changed:
+                # Semua amount_home_currency masih dalam mata uang lama; hitung ulang
+                # dengan kurs pada tanggal masing-masing transaksi
+                reprice_ledger(self.rates.cache, history=RateHistoryIndex())
+                self._after_commit(self._bump_version)
+            # Thread lain bisa membaca snapshot lama sebelum commit; buang lagi setelahnya
+            self._after_commit(self.invalidate_settings)
+        return currency_changed
+
+    @instrumented('ledger.get_transaction')
+    def get_transaction(self, transaction_id):
+        with db_session:
+            return Transaction.get(id=transaction_id)
+
+    @instrumented('ledger.transaction_row')
+    def transaction_row(self, transaction_id):
+        """One transaction in the same tuple form as recent(), or None."""
+        transaction = self.get_transaction(transaction_id)
+        if transaction is None:
+            return None
+        return (transaction.id, transaction.description, transaction.amount, transaction.currency,
+                transaction.amount_home_currency, transaction.category, transaction.timestamp)
+
+    def _log_conversion(self, transaction):
+        """Record the conversion that priced transaction once its write has committed."""
+        if self.conversions is not None:
+            self._after_commit(partial(
+                self.conversions.record, transaction.currency, self.rates.home_currency(), transaction.amount,
+                transaction.amount_home_currency, transaction_id=transaction.id))
+
+    @instrumented('ledger.add_transaction')
+    def add_transaction(self, description, amount, currency, category, timestamp=None):
+        """Insert a transaction converted at current rates; returns its id."""
+        validate_transaction(description, amount, currency, category)
+        with self.session():
+            transaction = Transaction(
+                description=description, amount=amount, currency=currency,
+                amount_home_currency=self.rates.convert(amount, currency), category=category,
+                timestamp=timestamp or datetime.now(),
+            )
+            record_transaction(transaction)
+            # Di dalam session pemanggil belum ada commit; flush agar id sudah terisi
+            flush()
+            self._log_conversion(transaction)
+            self._after_commit(self._bump_version)
+        return transaction.id
+
+    @instrumented('ledger.update_transaction')
+    def update_transaction(self, transaction_id, description, amount, currency, category):
+        """Replace a transaction's values (its timestamp becomes now); False if it does not exist."""
+        validate_transaction(description, amount, currency, category)
+        with self.session():
+            transaction = Transaction.get(id=transaction_id)
+            if transaction is None:
+                return False
+            # Rollup: keluarkan nilai lama, lalu masukkan nilai baru
+            record_transaction(transaction, sign=-1)
+            transaction.description = description
+            transaction.amount = amount
+            transaction.currency = currency
+            transaction.amount_home_currency = self.rates.convert(amount, currency)
+            transaction.category = category
+            transaction.timestamp = datetime.now()
+            record_transaction(transaction)
+            self._log_conversion(transaction)
+            self._after_commit(self._bump_version)
+        return True
+
+    @instrumented('ledger.delete_transaction')
+    def delete_transaction(self, transaction_id):
+        with self.session():
+            transaction = Transaction.get(id=transaction_id)
+            if transaction is None:
+                return False
+            record_transaction(transaction, sign=-1)
+            transaction.delete()
+            self._after_commit(self._bump_version)
+        return True
+
+    @instrumented('ledger.summary')
+    def summary(self):
+        """Totals for the dashboard: spending, budget, remaining and per-category rows."""
+        settings = self.settings()
+        summary = dashboard_aggregates()
+        summary.update(home_currency=settings.home_currency, travel_budget=settings.travel_budget,
+                       remaining=settings.travel_budget - summary['total_spent'])
+        return summary
+
+    @instrumented('ledger.analytics')
+    def analytics(self, today=None):
+        """Daily/weekly series, per-category and per-currency totals and the budget forecast.
+
+        See analytics.spending_report(); the report is shared between
+        callers, so treat it as read-only.
+        """
+        today = today or date.today()
+        settings = self.settings()
+        key = (self.version, settings, today)
+        cached = self._analytics
+        if cached is None or cached[0] != key:
+            cached = self._analytics = (key, spending_report(settings, today))
+        return cached[1]
+
+    @instrumented('ledger.recent')
+    def recent(self, limit=PAGE_SIZE):
+        """The newest transactions as (id, description, amount, currency, home amount, category, timestamp)."""
+        return transactions_page(limit)[0]
+
+    @instrumented('ledger.search')
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Transactions whose description or category match text (ranked, prefix match), as recent() rows."""
+        return search_transactions(text, limit)
+
+    @instrumented('ledger.import_statement')
+    def import_statement(self, path, **kwargs):
+        from .importer import import_statement
+
+        try:
+            return import_statement(path, self.rates.cache, history=RateHistoryIndex(), **kwargs)
+        finally:
+            # Import meng-commit per chunk sendiri
+            self._after_commit(self._bump_version)
+
+    @instrumented('ledger.export')
+    def export(self, table, path, fmt=None, **kwargs):
+        from .export import export_table
+
+        return export_table(table, path, fmt=fmt, **kwargs)
+
+
+def open_ledger(db_path, api_url=None):
+    """Bind the database at db_path and return a LedgerService over it.
+
+    Its ConversionLog is not started: call ledger.conversions.stop() when
+    done to write the recorded conversions.
+    """
+    init_database(db_path)
+    rates = RatesService(api_url)
+    rates.load()
+    return LedgerService(rates, conversions=ConversionLog())
+
+
+def default_database_path():
+    """TMM_DATABASE, or where the desktop app keeps its data on Linux."""
+    return os.environ.get('TMM_DATABASE') or os.path.join(
+        os.path.expanduser('~'), '.local', 'share', 'chatbotcrud', DATABASE_NAME)
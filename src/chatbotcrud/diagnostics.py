@@ -0,0 +1,232 @@
+"""Timing/counter instrumentation, structured logs and opt-in profiling.
+
+metrics is process-wide. SQL statements are counted by a SQLite trace
+callback that models installs on every connection, so scope() can report
+how many queries a block ran on the current thread. SQLite calls it once
+per row of an executemany(), so bulk writers go through executemany()
+here, which pauses the callback and counts the batch as one statement.
+"""
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger('chatbotcrud')
+
+PROFILE_TOP_FUNCTIONS = 25
+PROFILE_TOP_ALLOCATIONS = 10
+
+
+class Metrics:
+    """Thread-safe named counters and timing stats (count, total, max, last)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timings = {}
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, value):
+        with self._lock:
+            stat = self.timings.get(name)
+            if stat is None:
+                self.timings[name] = [1, value, value, value]
+            else:
+                stat[0] += 1
+                stat[1] += value
+                stat[2] = max(stat[2], value)
+                stat[3] = value
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    @contextmanager
+    def scope(self, name):
+        """Record the block's duration under name and its SQL statements under name.queries."""
+        statements = statements_in_thread()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+            self.record(name + '.queries', statements_in_thread() - statements)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'timings': {name: {'count': count, 'total': total, 'mean': total / count,
+                                   'max': peak, 'last': last}
+                            for name, (count, total, peak, last) in self.timings.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+metrics = Metrics()
+
+
+def instrumented(name):
+    """Decorator: run the function inside metrics.scope(name)."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.scope(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Penghitung statement SQL (dipasang oleh models lewat db.on_connect) ---
+_local = threading.local()
+_listeners = []
+
+
+def trace_statement(sql):
+    """sqlite3 trace callback: count every statement the connection runs."""
+    _local.statements = getattr(_local, 'statements', 0) + 1
+    metrics.count('db.statements')
+    if sql.startswith('BEGIN'):
+        metrics.count('db.transactions')
+    if _listeners:
+        for listener in _listeners:
+            listener(sql)
+
+
+def executemany(connection, sql, rows):
+    """connection.executemany(sql, rows), traced as one statement instead of one per row."""
+    connection.set_trace_callback(None)
+    try:
+        return connection.executemany(sql, rows)
+    finally:
+        connection.set_trace_callback(trace_statement)
+        trace_statement(sql)
+
+
+def statements_in_thread():
+    return getattr(_local, 'statements', 0)
+
+
+@contextmanager
+def statement_listener(func):
+    """Call func(sql) for every statement run while the block is active."""
+    _listeners.append(func)
+    try:
+        yield
+    finally:
+        _listeners.remove(func)
+
+
+# --- Log terstruktur: satu objek JSON per baris ---
+def log_event(event, level=logging.INFO, **fields):
+    logger.log(level, event, extra={'fields': fields})
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'event': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(stream=None, level=logging.INFO):
+    """Send chatbotcrud logs as JSON lines to stream (stderr by default)."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+class Profiler:
+    """Opt-in cProfile + tracemalloc capture of the thread that starts it.
+
+    stop() returns a text report (slowest functions by cumulative time and
+    top allocation sites) and, with an output_dir, also writes the raw
+    .prof file there for snakeviz/pstats.
+    """
+
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir
+        self.last_report = ""
+        self.last_path = None
+        self._profile = None
+
+    @property
+    def active(self):
+        return self._profile is not None
+
+    def start(self):
+        if self.active:
+            return
+        self._profile = cProfile.Profile()
+        tracemalloc.start()
+        self._profile.enable()
+        log_event('profiler.started')
+
+    def stop(self):
+        if not self.active:
+            return self.last_report
+        profile, self._profile = self._profile, None
+        profile.disable()
+        allocations = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP_ALLOCATIONS]
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        out.write(f"\nMemory: {current / 1024:,.0f} KiB traced, {peak / 1024:,.0f} KiB peak\n")
+        for stat in allocations:
+            out.write(f"  {stat.size / 1024:>9,.1f} KiB  {stat.count:>7} blocks  {stat.traceback}\n")
+        self.last_report = out.getvalue()
+
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.last_path = os.path.join(self.output_dir, f"profile-{datetime.now():%Y%m%d-%H%M%S}.prof")
+            profile.dump_stats(self.last_path)
+        log_event('profiler.stopped', peak_kib=round(peak / 1024), path=self.last_path)
+        return self.last_report
+
+
+def format_snapshot(snapshot):
+    """Human-readable text for a metrics snapshot (used by the Diagnostics screen)."""
+    lines = ["Counters"]
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f"  {name:<34} {value:>10}")
+    lines.append("")
+    lines.append(f"{'Timings':<36} {'n':>6} {'mean':>9} {'max':>9} {'last':>9}")
+    for name, stat in sorted(snapshot['timings'].items()):
+        if name.endswith('.queries'):
+            lines.append(f"  {name:<34} {stat['count']:>6} {stat['mean']:>9.1f} "
+                         f"{stat['max']:>9.0f} {stat['last']:>9.0f}")
+        else:
+            lines.append(f"  {name:<34} {stat['count']:>6} {stat['mean'] * 1000:>7.2f}ms "
+                         f"{stat['max'] * 1000:>7.2f}ms {stat['last'] * 1000:>7.2f}ms")
+    return "\n".join(lines)
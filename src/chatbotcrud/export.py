@@ -0,0 +1,214 @@
+import argparse
+import csv
+import json
+import os
+import pathlib
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from .models import db
+
+EXPORT_CHUNK_SIZE = 10000
+
+# Tabel yang bisa diekspor: nama -> (tabel SQLite, [(kolom, tipe)])
+EXPORT_TABLES = {
+    'transactions': ('Transaction', [
+        ('id', 'int'), ('description', 'str'), ('amount', 'float'), ('currency', 'str'),
+        ('amount_home_currency', 'float'), ('category', 'str'), ('timestamp', 'str'),
+    ]),
+    'conversions': ('ConversionHistory', [
+        ('id', 'int'), ('from_currency', 'str'), ('to_currency', 'str'), ('amount', 'float'),
+        ('result', 'float'), ('timestamp', 'str'), ('transaction_id', 'int?'),
+    ]),
+}
+FORMATS = ('csv', 'jsonl', 'columnar')
+COLUMNAR_MAGIC = b'TMMCOL1\n'
+COLUMNAR_EXTENSION = '.tmmcol'
+_ARRAY_CODES = {'int': 'q', 'int?': 'q', 'float': 'd'}
+_U32 = struct.Struct('<I')
+
+
+def export_chunks(table, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of at most chunk_size rows of table, in id order.
+
+    One SELECT in one read transaction, read with fetchmany(): SQLite
+    steps the cursor as rows are requested, so only one chunk is in
+    memory and the whole export sees a single consistent snapshot. It runs
+    on its own read-only connection: Pony's get_connection() opens BEGIN
+    IMMEDIATE, which would hold the write lock (and block the app's
+    LedgerWriter) for as long as the export takes. With WAL a reader
+    never blocks writers.
+    """
+    sql_table, columns = EXPORT_TABLES[table]
+    names = ', '.join(f'"{name}"' for name, _ in columns)
+    uri = pathlib.Path(db.provider.pool.filename).resolve().as_uri() + '?mode=ro'
+    connection = sqlite3.connect(uri, uri=True, isolation_level=None)
+    try:
+        connection.execute('BEGIN')
+        cursor = connection.execute(f'SELECT {names} FROM "{sql_table}" ORDER BY "id"')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        connection.close()
+
+
+class CsvWriter:
+    def __init__(self, f, columns):
+        self._writer = csv.writer(f)
+        self._writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class JsonLinesWriter:
+    def __init__(self, f, columns):
+        self._f = f
+        self._names = [name for name, _ in columns]
+
+    def write(self, rows):
+        names = self._names
+        self._f.write(''.join(json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n'
+                              for row in rows))
+
+    def close(self):
+        pass
+
+
+class ColumnarWriter:
+    """Compact column-oriented binary file, one row group per chunk.
+
+    Layout: COLUMNAR_MAGIC, a u32-prefixed JSON schema, then row groups
+    of a u32 row count followed by one u32-prefixed zlib block per
+    column, and a zero row count at the end. Numbers are little-endian
+    int64/float64 arrays; nullable ints ('int?') put one validity byte
+    per row before theirs; strings are a u32 length array followed by the
+    UTF-8 bytes. Read it back with read_columnar().
+    """
+
+    def __init__(self, f, columns, level=6):
+        self._f = f
+        self._columns = columns
+        self._level = level
+        schema = json.dumps({'columns': [[name, kind] for name, kind in columns]}).encode()
+        f.write(COLUMNAR_MAGIC + _U32.pack(len(schema)) + schema)
+
+    def write(self, rows):
+        f = self._f
+        f.write(_U32.pack(len(rows)))
+        for values, (_, kind) in zip(zip(*rows), self._columns):
+            if kind == 'str':
+                encoded = [value.encode() for value in values]
+                payload = _to_le(array('I', map(len, encoded))) + b''.join(encoded)
+            elif kind == 'int?':
+                payload = (bytes(value is not None for value in values)
+                           + _to_le(array('q', (0 if value is None else value for value in values))))
+            else:
+                payload = _to_le(array(_ARRAY_CODES[kind], values))
+            block = zlib.compress(payload, self._level)
+            f.write(_U32.pack(len(block)) + block)
+
+    def close(self):
+        self._f.write(_U32.pack(0))
+
+
+def _to_le(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def read_columnar(path):
+    """Yield the rows of a file written by ColumnarWriter, one row group at a time."""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar export")
+        size, = _U32.unpack(f.read(4))
+        columns = json.loads(f.read(size))['columns']
+        while True:
+            count, = _U32.unpack(f.read(4))
+            if not count:
+                break
+            decoded = []
+            for _, kind in columns:
+                size, = _U32.unpack(f.read(4))
+                payload = zlib.decompress(f.read(size))
+                if kind == 'str':
+                    lengths = array('I')
+                    lengths.frombytes(payload[:4 * count])
+                    if sys.byteorder == 'big':
+                        lengths.byteswap()
+                    position, values = 4 * count, []
+                    for length in lengths:
+                        values.append(payload[position:position + length].decode())
+                        position += length
+                else:
+                    valid = None
+                    if kind == 'int?':
+                        valid, payload = payload[:count], payload[count:]
+                    values = array(_ARRAY_CODES[kind])
+                    values.frombytes(payload)
+                    if sys.byteorder == 'big':
+                        values.byteswap()
+                    if valid is not None:
+                        values = [value if present else None for value, present in zip(values, valid)]
+                decoded.append(values)
+            yield from zip(*decoded)
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == COLUMNAR_EXTENSION:
+        return 'columnar'
+    return 'jsonl' if extension in ('.jsonl', '.ndjson') else 'csv'
+
+
+def export_table(table, path, fmt=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream table ('transactions' or 'conversions') to path as CSV, JSON Lines or columnar.
+
+    Memory stays at one chunk regardless of the table size. Returns a
+    dict with the row count, elapsed seconds, rows/sec and file size.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    _, columns = EXPORT_TABLES[table]
+    started = time.perf_counter()
+    rows = 0
+    if fmt == 'columnar':
+        f = open(path, 'wb')
+    else:
+        f = open(path, 'w', newline='' if fmt == 'csv' else None, encoding='utf-8')
+    with f:
+        writer = {'csv': CsvWriter, 'jsonl': JsonLinesWriter, 'columnar': ColumnarWriter}[fmt](f, columns)
+        for chunk in export_chunks(table, chunk_size):
+            writer.write(chunk)
+            rows += len(chunk)
+        writer.close()
+    seconds = time.perf_counter() - started
+    return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds if seconds else 0.0,
+            'bytes': os.path.getsize(path)}
+
+
+def main(argv=None):
+    """python -m chatbotcrud.export DATABASE TABLE OUTPUT [options]: chatbotcrud.cli's export command."""
+    from . import cli
+
+    parser = argparse.ArgumentParser(prog='python -m chatbotcrud.export', add_help=False)
+    parser.add_argument('database', help="path to tourist_money_manager.sqlite")
+    args, rest = parser.parse_known_args(argv)
+    return cli.main(['--db', args.database, 'export', *rest])
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,288 @@
+import argparse
+import csv
+import hashlib
+import os
+import re
+import time
+from datetime import datetime
+from itertools import islice
+
+from pony.orm import db_session
+
+from .aggregates import add_to_rollup
+from .diagnostics import executemany
+from .models import db, ImportCheckpoint, CURRENCY_MAP, TRAVEL_CATEGORIES
+from .preview import parse_amount
+from .search import bulk_index
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+# Nama kolom CSV yang dikenali, huruf kecil; kolom pertama yang cocok dipakai
+CSV_COLUMNS = {
+    'timestamp': ('timestamp', 'date', 'transaction date', 'posted', 'tanggal'),
+    'description': ('description', 'memo', 'payee', 'name', 'keterangan'),
+    'amount': ('amount', 'value', 'jumlah'),
+    'currency': ('currency', 'mata uang'),
+    'category': ('category', 'kategori'),
+}
+DATE_FORMATS = ('%d/%m/%Y', '%d/%m/%Y %H:%M', '%Y/%m/%d', '%d-%m-%Y', '%d.%m.%Y')
+
+# Kata kunci (kata utuh) di deskripsi statement -> kategori; dicek berurutan, sisanya "Lainnya"
+CATEGORY_KEYWORDS = [
+    ("Akomodasi", ('hotel', 'hostel', 'airbnb', 'resort', 'inn', 'guesthouse', 'booking.com', 'agoda')),
+    ("Transportasi", ('taxi', 'grab', 'gojek', 'uber', 'airline', 'airlines', 'airport', 'rail', 'train',
+                      'metro', 'mrt', 'bus', 'ferry', 'parking', 'fuel', 'petrol', 'toll')),
+    ("Makanan & Minuman", ('restaurant', 'resto', 'cafe', 'coffee', 'kopi', 'starbucks', 'bakery',
+                           'food', 'bar', 'warung', 'mcdonald', 'mcdonalds', 'kfc')),
+    ("Tiket Masuk", ('museum', 'ticket', 'tickets', 'tiket', 'tour', 'tours', 'park', 'zoo', 'temple',
+                     'gallery', 'klook')),
+    ("Souvenir", ('souvenir', 'souvenirs', 'gift', 'gifts', 'oleh')),
+    ("Kesehatan", ('pharmacy', 'apotek', 'clinic', 'hospital', 'doctor', 'watsons', 'guardian')),
+    ("Komunikasi", ('sim', 'telkomsel', 'roaming', 'mobile', 'esim', 'wifi')),
+    ("Belanja", ('mart', 'minimart', 'market', 'supermarket', 'store', 'shop', 'mall', '7-eleven', 'uniqlo')),
+]
+_CATEGORY_PATTERNS = [
+    (name, re.compile(r'\b(?:' + '|'.join(map(re.escape, keywords)) + r')\b'))
+    for name, keywords in CATEGORY_KEYWORDS
+]
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+
+
+def read_csv_rows(path):
+    """Yield (line number, fields) for every data row of a CSV statement.
+
+    fields maps the Transaction field names in CSV_COLUMNS to the raw
+    cell text; columns the file does not have are left out.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        names = [name.strip().lower() for name in header]
+        columns = {}
+        for field, aliases in CSV_COLUMNS.items():
+            for alias in aliases:
+                if alias in names:
+                    columns[field] = names.index(alias)
+                    break
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            fields = {field: row[index] for field, index in columns.items() if index < len(row)}
+            yield reader.line_num, fields
+
+
+def read_ofx_rows(path):
+    """Yield (line number, fields) for every <STMTTRN> in an OFX/QFX statement.
+
+    Works for both SGML (unclosed leaf tags) and XML OFX, one line at a
+    time. Debits are negative in OFX, so the amount sign is flipped to
+    make spending positive; credits come out negative and are rejected
+    by map_row().
+    """
+    default_currency = None
+    fields = None
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line_number, line in enumerate(f, start=1):
+            for closing, tag, value in _OFX_TAG.findall(line):
+                tag, value = tag.upper(), value.strip()
+                if tag == 'STMTTRN':
+                    if closing and fields is not None:
+                        if default_currency:
+                            fields.setdefault('currency', default_currency)
+                        yield line_number, fields
+                    fields = None if closing else {}
+                elif tag == 'CURDEF' and value:
+                    default_currency = value
+                elif fields is None or closing:
+                    continue
+                elif tag == 'DTPOSTED':
+                    fields['timestamp'] = value
+                elif tag == 'TRNAMT':
+                    fields['amount'] = value[1:] if value.startswith('-') else '-' + value
+                elif tag in ('NAME', 'MEMO') and value:
+                    fields['description'] = (fields['description'] + ' ' + value
+                                             if 'description' in fields else value)
+                elif tag == 'CURSYM':
+                    fields['currency'] = value
+
+
+def parse_timestamp(text):
+    """Parse an ISO, OFX (YYYYMMDDHHMMSS[.XXX][TZ]) or day-first date.
+
+    Returns a naive datetime in local time, like the rest of the ledger: an
+    ISO timestamp with a UTC offset is converted to local time.
+    """
+    text = text.strip()
+    ofx = re.match(r'(\d{8})(\d{6})?', text)
+    if ofx:
+        return datetime.strptime(ofx.group(1) + (ofx.group(2) or '000000'), '%Y%m%d%H%M%S')
+    try:
+        timestamp = datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    else:
+        # Dengan offset, Pony membaca kolom ini kembali sebagai str, bukan datetime
+        return timestamp.astimezone().replace(tzinfo=None) if timestamp.tzinfo else timestamp
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date {text!r}")
+
+
+def map_category(category, description):
+    """Pick a TRAVEL_CATEGORIES entry from a category cell or the description."""
+    if category:
+        for known in TRAVEL_CATEGORIES:
+            if category.strip().lower() == known.lower():
+                return known
+    text = f"{category or ''} {description}".lower()
+    for name, pattern in _CATEGORY_PATTERNS:
+        if pattern.search(text):
+            return name
+    return "Lainnya"
+
+
+def map_row(fields, default_currency):
+    """Turn raw statement fields into (description, amount, currency, category, timestamp).
+
+    Raises ValueError for rows that cannot become a spending transaction.
+    """
+    description = (fields.get('description') or '').strip()
+    if not description:
+        raise ValueError("missing description")
+    amount_text = (fields.get('amount') or '').replace(' ', '')
+    if not amount_text:
+        raise ValueError("missing amount")
+    # Sama dengan form: "10.000" (ribuan IDR) dan "12,50" (desimal Eropa) juga terbaca benar
+    amount = parse_amount(amount_text)
+    if amount <= 0:
+        raise ValueError("not a spending row (amount must be positive)")
+    currency = (fields.get('currency') or default_currency or '').strip().upper()
+    if currency not in CURRENCY_MAP.values():
+        raise ValueError(f"unknown currency {currency!r}")
+    if not fields.get('timestamp'):
+        raise ValueError("missing date")
+    timestamp = parse_timestamp(fields['timestamp'])
+    return description, amount, currency, map_category(fields.get('category'), description), timestamp
+
+
+def file_fingerprint(path):
+    """sha256 of the file contents, read in blocks; identifies a statement for resume."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_format(path):
+    return 'ofx' if os.path.splitext(path)[1].lower() in ('.ofx', '.qfx') else 'csv'
+
+
+def _write_chunk(rows, rate_cache, history):
+    """Convert and insert one chunk of mapped rows with the rollup deltas and search index."""
+    descriptions, amounts, currencies, categories, timestamps = zip(*rows)
+    if history is not None:
+        converted = history.convert_many(amounts, currencies, [t.date() for t in timestamps],
+                                         rate_cache.get_home_currency())
+    else:
+        converted = rate_cache.convert_many(amounts, currencies)
+    with bulk_index():
+        executemany(
+            db.get_connection(),
+            'INSERT INTO "Transaction" ("description", "amount", "currency", "amount_home_currency",'
+            ' "category", "timestamp") VALUES (?, ?, ?, ?, ?, ?)',
+            # Format yang sama dengan Pony; str() tanpa mikrodetik membuat optimistic check Pony gagal saat update
+            zip(descriptions, amounts, currencies, converted, categories,
+                (f"{t:%Y-%m-%d %H:%M:%S.%f}" for t in timestamps))
+        )
+    deltas = {}
+    for home_amount, currency, category, timestamp in zip(converted, currencies, categories, timestamps):
+        key = (timestamp.date(), category, currency)
+        total, count = deltas.get(key, (0.0, 0))
+        deltas[key] = (total + home_amount, count + 1)
+    add_to_rollup(deltas)
+
+
+def import_statement(path, rate_cache, history=None, fmt=None, default_currency=None,
+                     chunk_size=IMPORT_CHUNK_SIZE, restart=False, progress=None):
+    """Import a CSV or OFX statement into Transaction, resuming where a previous run stopped.
+
+    Rows are streamed from the file and written chunk_size at a time.
+    Each chunk (its inserts, rollup deltas and the ImportCheckpoint for
+    the file) commits in one transaction, so after a failure the next run
+    skips exactly the rows already imported. With a RateHistoryIndex rows
+    are priced at the rate of their own day. Rows that cannot be mapped
+    are skipped and reported. progress, if given, is called with the
+    running result after every chunk.
+    """
+    fmt = fmt or detect_format(path)
+    reader = read_ofx_rows if fmt == 'ofx' else read_csv_rows
+    default_currency = default_currency or rate_cache.get_home_currency()
+    source = file_fingerprint(path)
+
+    with db_session:
+        checkpoint = ImportCheckpoint.get(source=source)
+        if checkpoint is None:
+            checkpoint = ImportCheckpoint(source=source, path=os.path.abspath(path))
+        elif restart:
+            checkpoint.rows_read = checkpoint.rows_imported = 0
+            checkpoint.finished = False
+        resumed_from = checkpoint.rows_read
+        already_finished = checkpoint.finished
+
+    result = {'rows_read': resumed_from, 'imported': 0, 'skipped': 0, 'errors': [],
+              'resumed_from': resumed_from, 'already_finished': already_finished, 'seconds': 0.0, 'rows_per_sec': 0.0}
+    started = time.perf_counter()
+    records = islice(reader(path), resumed_from, None)
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            break
+        rows = []
+        for line_number, fields in batch:
+            try:
+                rows.append(map_row(fields, default_currency))
+            except ValueError as e:
+                result['skipped'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append((line_number, str(e)))
+        with db_session:
+            if rows:
+                _write_chunk(rows, rate_cache, history)
+            checkpoint = ImportCheckpoint[source]
+            checkpoint.rows_read += len(batch)
+            checkpoint.rows_imported += len(rows)
+            checkpoint.updated = datetime.now()
+        result['rows_read'] += len(batch)
+        result['imported'] += len(rows)
+        result['seconds'] = time.perf_counter() - started
+        result['rows_per_sec'] = result['imported'] / result['seconds'] if result['seconds'] else 0.0
+        if progress is not None:
+            progress(result)
+
+    with db_session:
+        ImportCheckpoint[source].finished = True
+    result['seconds'] = time.perf_counter() - started
+    if result['seconds']:
+        result['rows_per_sec'] = result['imported'] / result['seconds']
+    return result
+
+
+def main(argv=None):
+    """python -m chatbotcrud.importer DATABASE STATEMENT [options]: chatbotcrud.cli's import command."""
+    from . import cli
+
+    parser = argparse.ArgumentParser(prog='python -m chatbotcrud.importer', add_help=False)
+    parser.add_argument('database', help="path to tourist_money_manager.sqlite")
+    args, rest = parser.parse_known_args(argv)
+    return cli.main(['--db', args.database, 'import', *rest])
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
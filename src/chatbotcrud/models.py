@@ -0,0 +1,223 @@
+import os
+from datetime import date, datetime
+from pony.orm import Database, Optional, Required, PrimaryKey, composite_index, db_session
+from pony.orm.dbapiprovider import OperationalError
+
+from .diagnostics import trace_statement
+
+# Konfigurasi Database
+db = Database()
+
+
+# Pragma untuk setiap koneksi SQLite. Dengan WAL pembaca tidak memblokir penulis
+# dan synchronous=NORMAL membuat commit tanpa fsync (sync hanya saat checkpoint);
+# transaksi yang sudah commit tetap aman bila aplikasi crash.
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),  # negatif = KiB, ~16 MB page cache
+    ('mmap_size', 64 * 1024 * 1024),
+)
+
+
+@db.on_connect(provider='sqlite')
+def _configure_connection(database, connection):
+    for name, value in SQLITE_PRAGMAS:
+        connection.execute(f'PRAGMA {name} = {value}')
+    # Setiap statement SQL dihitung untuk diagnostics (query per layar, per aksi)
+    connection.set_trace_callback(trace_statement)
+
+# Definisi Entity Database
+class ConversionHistory(db.Entity):
+    id = PrimaryKey(int, auto=True)
+    from_currency = Required(str)
+    to_currency = Required(str)
+    amount = Required(float)
+    result = Required(float)
+    timestamp = Required(datetime, default=datetime.now, index=True)
+    # Transaksi yang dihargai dengan konversi ini; None untuk konversi di luar ledger
+    transaction_id = Optional(int)
+
+# Ringkasan harian ConversionHistory yang sudah melewati masa simpan (lihat conversions.py)
+class ConversionRollup(db.Entity):
+    day = Required(date)
+    from_currency = Required(str)
+    to_currency = Required(str)
+    amount = Required(float, default=0.0)
+    result = Required(float, default=0.0)
+    conversions = Required(int, default=0)
+    min_rate = Required(float)
+    max_rate = Required(float)
+    PrimaryKey(day, from_currency, to_currency)
+
+class ExchangeRate(db.Entity):
+    currency_code = PrimaryKey(str)
+    rate = Required(float)
+    last_updated = Required(datetime, default=datetime.now)
+
+# Riwayat kurs harian: satu baris per (mata uang, tanggal), tidak pernah ditimpa antar hari
+class RateHistory(db.Entity):
+    currency_code = Required(str)
+    day = Required(date)
+    rate = Required(float)
+    PrimaryKey(currency_code, day)
+
+class Transaction(db.Entity):
+    id = PrimaryKey(int, auto=True)
+    description = Required(str)
+    amount = Required(float)
+    currency = Required(str)
+    amount_home_currency = Required(float)
+    category = Required(str)
+    timestamp = Required(datetime, default=datetime.now, index=True)
+    composite_index(category, timestamp)
+
+# Rollup harian per kategori, diperbarui setiap kali Transaction berubah
+class SpendingRollup(db.Entity):
+    day = Required(date)
+    category = Required(str)
+    amount = Required(float, default=0.0)
+    tx_count = Required(int, default=0)
+    PrimaryKey(day, category)
+
+# Rollup harian per kategori dan mata uang asal, sumber deret waktu analytics
+class CurrencyRollup(db.Entity):
+    day = Required(date)
+    category = Required(str)
+    currency = Required(str)
+    amount = Required(float, default=0.0)
+    tx_count = Required(int, default=0)
+    PrimaryKey(day, category, currency)
+
+# Posisi import statement per file (sha256 isi file), untuk melanjutkan setelah gagal
+class ImportCheckpoint(db.Entity):
+    source = PrimaryKey(str)
+    path = Required(str)
+    rows_read = Required(int, default=0)
+    rows_imported = Required(int, default=0)
+    finished = Required(bool, default=False)
+    updated = Required(datetime, default=datetime.now)
+
+# Cache jawaban AI assistant; key = sha256(pertanyaan dinormalisasi + fingerprint keuangan)
+class AIResponse(db.Entity):
+    key = PrimaryKey(str)
+    question = Required(str)
+    answer = Required(str)
+    created = Required(datetime, default=datetime.now)
+    last_used = Required(datetime, default=datetime.now, index=True)
+    hits = Required(int, default=0)
+
+class UserSettings(db.Entity):
+    id = PrimaryKey(int, auto=True)
+    home_currency = Required(str, default='IDR')
+    travel_budget = Required(float, default=0.0)
+
+# Konstanta Aplikasi
+CURRENCY_MAP = {
+    "US Dollar (USD)": "USD", "Japanese Yen (¥)": "JPY", "Euro (€)": "EUR",
+    "British Pound (£)": "GBP", "Australian Dollar (A$)": "AUD", "Singapore Dollar (S$)": "SGD",
+    "Malaysian Ringgit (RM)": "MYR", "Chinese Yuan (¥)": "CNY", "Indonesian Rupiah (IDR)": "IDR",
+    "Thai Baht (THB)": "THB", "Korean Won (₩)": "KRW", "Philippine Peso (₱)": "PHP",
+    "Vietnamese Dong (₫)": "VND"
+}
+REVERSE_CURRENCY_MAP = {code: name for name, code in CURRENCY_MAP.items()}
+TRAVEL_CATEGORIES = [
+    "Makanan & Minuman", "Transportasi", "Akomodasi", "Tiket Masuk",
+    "Belanja", "Souvenir", "Kesehatan", "Komunikasi", "Lainnya"
+]
+
+# Migrasi skema untuk file database yang sudah ada, dicatat di PRAGMA user_version.
+# Setiap entri adalah satu versi; tambahkan entri baru di akhir, jangan ubah yang lama.
+MIGRATIONS = [
+    # 1: index untuk query dashboard (recent transactions, filter hari ini, per kategori)
+    [
+        'CREATE INDEX IF NOT EXISTS "idx_transaction__timestamp" ON "Transaction" ("timestamp")',
+        'CREATE INDEX IF NOT EXISTS "idx_transaction__category_timestamp" ON "Transaction" ("category", "timestamp")',
+    ],
+    # 2: mulai riwayat kurs dari kurs yang sudah tersimpan
+    [
+        'INSERT OR IGNORE INTO "RateHistory" ("currency_code", "day", "rate")'
+        ' SELECT "currency_code", date("last_updated"), "rate" FROM "ExchangeRate"',
+    ],
+    # 3: indeks full-text (FTS5) atas deskripsi dan kategori, disinkronkan oleh trigger.
+    # External content: teks tetap hanya di Transaction, FTS5 menyimpan indeksnya saja
+    [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "TransactionSearch" USING fts5('
+        '"description", "category", content="Transaction", content_rowid="id",'
+        " tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        # Selama ada baris di sini trigger tidak jalan; dipakai search.bulk_index() untuk import massal
+        'CREATE TABLE IF NOT EXISTS "SearchIndexPause" ("paused" INTEGER NOT NULL)',
+        'CREATE TRIGGER IF NOT EXISTS "trg_transaction__search_insert" AFTER INSERT ON "Transaction"'
+        ' WHEN NOT EXISTS (SELECT 1 FROM "SearchIndexPause") BEGIN'
+        ' INSERT INTO "TransactionSearch" ("rowid", "description", "category")'
+        ' VALUES (new."id", new."description", new."category"); END',
+        'CREATE TRIGGER IF NOT EXISTS "trg_transaction__search_delete" AFTER DELETE ON "Transaction"'
+        ' WHEN NOT EXISTS (SELECT 1 FROM "SearchIndexPause") BEGIN'
+        ' INSERT INTO "TransactionSearch" ("TransactionSearch", "rowid", "description", "category")'
+        ' VALUES (\'delete\', old."id", old."description", old."category"); END',
+        'CREATE TRIGGER IF NOT EXISTS "trg_transaction__search_update"'
+        ' AFTER UPDATE OF "description", "category" ON "Transaction"'
+        ' WHEN NOT EXISTS (SELECT 1 FROM "SearchIndexPause") BEGIN'
+        ' INSERT INTO "TransactionSearch" ("TransactionSearch", "rowid", "description", "category")'
+        ' VALUES (\'delete\', old."id", old."description", old."category");'
+        ' INSERT INTO "TransactionSearch" ("rowid", "description", "category")'
+        ' VALUES (new."id", new."description", new."category"); END',
+        # Transaksi yang sudah ada sebelum migrasi ini
+        'INSERT INTO "TransactionSearch" ("TransactionSearch") VALUES (\'rebuild\')',
+    ],
+    # 4: index untuk retensi dan compaction ConversionHistory
+    [
+        'CREATE INDEX IF NOT EXISTS "idx_conversionhistory__timestamp" ON "ConversionHistory" ("timestamp")',
+    ],
+    # 5: timestamp hasil import lama: offset UTC diubah ke waktu lokal, mikrodetik dilengkapi
+    # (format Pony). Hari transaksi bisa bergeser, jadi rollup dikosongkan agar init_database
+    # membangunnya ulang
+    [
+        'DELETE FROM "SpendingRollup" WHERE EXISTS (SELECT 1 FROM "Transaction"'
+        ' WHERE "timestamp" GLOB \'*[+-][0-9][0-9]:[0-9][0-9]\')',
+        'UPDATE "Transaction" SET "timestamp" = datetime("timestamp", \'localtime\')'
+        ' WHERE "timestamp" GLOB \'*[+-][0-9][0-9]:[0-9][0-9]\'',
+        'UPDATE "Transaction" SET "timestamp" = "timestamp" || \'.000000\' WHERE length("timestamp") = 19',
+    ],
+    # 6: log audit konversi mencatat transaksi yang dihargainya
+    [
+        'ALTER TABLE "ConversionHistory" ADD COLUMN "transaction_id" INTEGER',
+    ],
+]
+
+
+@db_session
+def migrate():
+    """Apply the MIGRATIONS newer than the file's user_version."""
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        for sql in statements:
+            try:
+                db.execute(sql)
+            except OperationalError as e:
+                # File baru: create_tables sudah membuat kolom yang ditambahkan migrasi
+                if 'duplicate column name' not in str(e):
+                    raise
+        db.execute(f'PRAGMA user_version = {number}')
+    return len(MIGRATIONS)
+
+
+def init_database(db_path):
+    """Bind the entities to the SQLite file at db_path and create missing tables."""
+    data_dir = os.path.dirname(db_path)
+    if data_dir and not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    db.bind(provider='sqlite', filename=db_path, create_db=True)
+    # Tabel dicek setelah migrasi: file lama belum punya kolom yang ditambahkan MIGRATIONS
+    db.generate_mapping(create_tables=True, check_tables=False)
+    migrate()
+    db.check_tables()
+    with db_session:
+        if not UserSettings.select().exists():
+            UserSettings(home_currency='IDR', travel_budget=0.0)
+        needs_rollup = Transaction.select().exists() and not (
+            SpendingRollup.select().exists() and CurrencyRollup.select().exists())
+    if needs_rollup:
+        # Database lama belum punya rollup: bangun sekali dari data mentah
+        from .aggregates import rebuild_rollup
+        rebuild_rollup()
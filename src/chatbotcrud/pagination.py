@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from datetime import datetime
+
+from pony.orm import db_session
+
+from .models import db
+
+PAGE_SIZE = 20
+MAX_CACHED_PAGES = 5
+
+_COLUMNS = ('SELECT "id", "description", "amount", "currency", "amount_home_currency",'
+            ' "category", "timestamp" FROM "Transaction"')
+
+
+def transactions_page(limit=PAGE_SIZE, before=None, after=None):
+    """Fetch one page of transactions, newest first, by keyset on (timestamp, id).
+
+    before/after are (timestamp, id) keys as returned with the rows: with
+    before the page holds the rows older than that key, with after the
+    rows newer than it. Each query walks idx_transaction__timestamp from
+    the key, so the cost does not depend on how deep the page is.
+
+    Returns (rows, keys); rows are (id, description, amount, currency,
+    amount_home_currency, category, timestamp) tuples and keys the matching
+    (timestamp, id) cursors in the stored format.
+    """
+    # db.select, bukan get_connection(): Pony membuka BEGIN IMMEDIATE (kunci tulis)
+    # untuk get_connection, sedangkan halaman ini hanya membaca
+    with db_session:
+        if after is not None:
+            after_timestamp, after_id = after
+            raw = db.select(
+                _COLUMNS + ' WHERE ("timestamp", "id") > ($after_timestamp, $after_id)'
+                ' ORDER BY "timestamp", "id" LIMIT $limit')
+            raw.reverse()
+        elif before is not None:
+            before_timestamp, before_id = before
+            raw = db.select(
+                _COLUMNS + ' WHERE ("timestamp", "id") < ($before_timestamp, $before_id)'
+                ' ORDER BY "timestamp" DESC, "id" DESC LIMIT $limit')
+        else:
+            raw = db.select(_COLUMNS + ' ORDER BY "timestamp" DESC, "id" DESC LIMIT $limit')
+    rows = [row[:6] + (datetime.fromisoformat(row[6]),) for row in raw]
+    keys = [(row[6], row[0]) for row in raw]
+    return rows, keys
+
+
+class TransactionPager:
+    """Page through the full transaction history with a bounded page cache.
+
+    Pages are numbered from 0 (newest). Moving to a neighbouring page uses
+    the first/last key of the current page as the keyset cursor, so no
+    offsets or per-page cursor list are kept. At most max_cached_pages
+    pages stay in memory (least recently used are dropped) and the next
+    older page is prefetched after every move.
+    """
+
+    def __init__(self, page_size=PAGE_SIZE, max_cached_pages=MAX_CACHED_PAGES, prefetch=True):
+        self.page_size = page_size
+        self.max_cached_pages = max(2, max_cached_pages)
+        self.prefetch = prefetch
+        self.page_number = 0
+        self.queries = 0
+        self._pages = OrderedDict()
+
+    def reset(self):
+        """Forget cached pages (after the ledger changed) and go back to the newest page."""
+        self._pages.clear()
+        self.page_number = 0
+
+    def _fetch(self, number, **cursor):
+        self.queries += 1
+        page = transactions_page(self.page_size, **cursor)
+        self._pages[number] = page
+        while len(self._pages) > self.max_cached_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def _page(self, number, **cursor):
+        page = self._pages.get(number)
+        if page is None:
+            page = self._fetch(number, **cursor)
+        else:
+            self._pages.move_to_end(number)
+        return page
+
+    def _prefetch_older(self):
+        rows, keys = self._pages[self.page_number]
+        older = self.page_number + 1
+        if self.prefetch and len(rows) == self.page_size and older not in self._pages:
+            self._fetch(older, before=keys[-1])
+            self._pages.move_to_end(self.page_number)
+
+    def _current_page(self):
+        page = self._pages.get(self.page_number)
+        if page is None:
+            # Belum dimuat atau cache di-reset: mulai dari halaman terbaru
+            self.page_number = 0
+            page = self._page(0)
+            self._prefetch_older()
+        return page
+
+    def current(self):
+        """Rows of the current page."""
+        return self._current_page()[0]
+
+    def has_newer(self):
+        return self.page_number > 0
+
+    def has_older(self):
+        rows, _ = self._current_page()
+        older = self._pages.get(self.page_number + 1)
+        if older is not None:
+            return bool(older[0])
+        return len(rows) == self.page_size
+
+    def older(self):
+        """Move one page back in time and return its rows (stays put on the last page)."""
+        rows, keys = self._current_page()
+        if len(rows) < self.page_size:
+            return rows
+        page = self._page(self.page_number + 1, before=keys[-1])
+        if not page[0]:
+            return rows
+        self.page_number += 1
+        self._prefetch_older()
+        return page[0]
+
+    def newer(self):
+        """Move one page forward in time and return its rows."""
+        rows, keys = self._current_page()
+        if self.page_number == 0:
+            return rows
+        page = self._page(self.page_number - 1, after=keys[0])
+        self.page_number -= 1
+        return page[0]
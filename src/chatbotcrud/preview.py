@@ -0,0 +1,70 @@
+from functools import lru_cache
+
+# Jeda setelah ketikan terakhir sebelum preview dihitung, dalam detik
+PREVIEW_DEBOUNCE = 0.15
+PREVIEW_CACHE_SIZE = 256
+
+
+def parse_amount(text):
+    """Parse an amount typed in the form.
+
+    ',' and '.' are thousands separators ("10.000" and "10,000" are
+    10000), except a last separator followed by other than exactly three
+    digits, which is the decimal point ("12.5", "12,50", "1.234,56").
+    """
+    text = text.strip()
+    position = max(text.rfind('.'), text.rfind(','))
+    whole, decimals = text, ''
+    if position >= 0 and len(text) - position - 1 != 3:
+        whole, decimals = text[:position], text[position + 1:]
+    whole = whole.replace(",", "").replace(".", "")
+    return float(f"{whole}.{decimals}" if decimals else whole)
+
+
+def format_amount(value):
+    """Text of a stored amount for the form that parse_amount() reads back unchanged."""
+    if value == int(value):
+        return f"{value:.0f}"
+    text = repr(value)
+    if 'e' in text:
+        text = f"{value:.15f}".rstrip('0')
+    # Tepat tiga digit desimal akan terbaca sebagai ribuan; tambahkan 0
+    return text + '0' if len(text.split('.')[1]) == 3 else text
+
+
+class ConversionPreview:
+    """Text of the live conversion label in the transaction form.
+
+    Results are memoised in an LRU keyed by (amount, currency, home
+    currency, rate table version), and rates come from the RateCache
+    table already in memory, so a keystroke never issues a query. A
+    reload of the rate table bumps its version, which retires the old
+    entries.
+    """
+
+    def __init__(self, rate_cache, maxsize=PREVIEW_CACHE_SIZE):
+        self.rate_cache = rate_cache
+        self._render = lru_cache(maxsize=maxsize)(self._render_uncached)
+
+    def text(self, amount_text, currency_code):
+        if not amount_text or not currency_code:
+            return ""
+        try:
+            amount = parse_amount(amount_text)
+        except ValueError:
+            return ""
+        cache = self.rate_cache
+        if cache.rates is None:
+            return ""
+        return self._render(amount, currency_code, cache.home_currency, cache.version)
+
+    def _render_uncached(self, amount, currency_code, home_currency, version):
+        if currency_code == home_currency:
+            return ""
+        factor = self.rate_cache.loaded_factor(currency_code)
+        if factor is None:
+            return ""
+        return f"≈ {amount * factor:,.0f} {home_currency}"
+
+    def stats(self):
+        return self._render.cache_info()._asdict()
@@ -0,0 +1,389 @@
+import logging
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from datetime import date, datetime, timedelta
+from operator import mul
+
+import requests
+from pony.orm import db_session, min
+
+from .diagnostics import executemany, log_event, metrics
+from .models import db, ExchangeRate, RateHistory, UserSettings, CURRENCY_MAP
+
+# Semua kurs di ExchangeRate relatif terhadap IDR (base API)
+BASE_CURRENCY = 'IDR'
+
+# Penjadwalan refresh kurs
+RATE_TTL = timedelta(hours=6)
+FETCH_TIMEOUT = 10
+BACKOFF_BASE = 60
+BACKOFF_MAX = 3600
+# Jeda minimum antar pengecekan jadwal, dalam detik
+MIN_CHECK_INTERVAL = 60
+
+
+class RateCache:
+    """In-memory copy of the ExchangeRate table plus the home currency.
+
+    The table is read once on first use (or after invalidate()) and every
+    conversion afterwards is a dict lookup. Per currency it keeps
+    (rate, last_updated) as stored in ExchangeRate and the factor that
+    converts an amount in that currency to the home currency.
+    """
+
+    def __init__(self):
+        self.home_currency = None
+        self.rates = None
+        self._factors = {}
+        # Naik setiap kali tabel dimuat ulang; dipakai sebagai bagian key memo
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        with db_session:
+            rates = {r.currency_code: (r.rate, r.last_updated) for r in ExchangeRate.select()}
+            settings = UserSettings.select().first()
+            home_currency = settings.home_currency if settings else BASE_CURRENCY
+        self._factors = self._build_factors(rates, home_currency)
+        self.home_currency = home_currency
+        self.rates = rates
+        self.version += 1
+
+    def invalidate(self):
+        """Drop the cached table; the next lookup reloads it from the database."""
+        self.rates = None
+
+    def _ensure_loaded(self):
+        if self.rates is None:
+            self.misses += 1
+            self.load()
+        else:
+            self.hits += 1
+
+    @staticmethod
+    def _build_factors(rates, home_currency):
+        def idr_rate(code):
+            if code == BASE_CURRENCY:
+                return 1.0
+            entry = rates.get(code)
+            return entry[0] if entry else None
+
+        home_rate = idr_rate(home_currency)
+        factors = {}
+        for code, (rate, _) in rates.items():
+            factors[code] = home_rate / rate if home_rate and rate else 1.0
+        factors[BASE_CURRENCY] = home_rate or 1.0
+        factors[home_currency] = 1.0
+        return factors
+
+    def get_home_currency(self):
+        self._ensure_loaded()
+        return self.home_currency
+
+    def get_rate(self, currency_code):
+        """Rate of currency_code per 1 IDR, or None when no rate is known."""
+        if currency_code == BASE_CURRENCY:
+            return 1.0
+        self._ensure_loaded()
+        entry = self.rates.get(currency_code)
+        return entry[0] if entry else None
+
+    def last_updated(self, currency_code):
+        self._ensure_loaded()
+        entry = self.rates.get(currency_code)
+        return entry[1] if entry else None
+
+    def convert(self, amount, from_currency):
+        """Convert amount to the home currency; unknown rates leave it unchanged."""
+        self._ensure_loaded()
+        return amount * self._factors.get(from_currency, 1.0)
+
+    def loaded_factor(self, currency_code):
+        """Factor to the home currency from the table already in memory.
+
+        Never reads the database: returns None when nothing is loaded yet,
+        so callers on the UI path can skip work instead of blocking.
+        """
+        if self.rates is None:
+            return None
+        return self._factors.get(currency_code, 1.0)
+
+    def convert_many(self, amounts, currencies):
+        """Convert parallel sequences of amounts and currency codes in one pass.
+
+        Builds the factor for each row with a single dict lookup and
+        multiplies element-wise; returns a list of home-currency amounts.
+        """
+        self._ensure_loaded()
+        factor = self._factors.get
+        return list(map(mul, amounts, (factor(code, 1.0) for code in currencies)))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'currencies': len(self.rates) if self.rates is not None else 0}
+
+
+class RateHistoryIndex:
+    """RateHistory preloaded into sorted per-currency arrays.
+
+    rate_as_of() is a bisect over the day ordinals of one currency, so
+    pricing many transactions never issues a query per row. Days before
+    the first recorded rate use the earliest one.
+    """
+
+    def __init__(self):
+        self._days = {}
+        self._rates = {}
+        self.load()
+
+    def load(self):
+        days, rates = {}, {}
+        with db_session:
+            rows = db.select('"currency_code", "day", "rate" FROM "RateHistory" ORDER BY 1, 2')
+        for code, day, rate in rows:
+            days.setdefault(code, []).append(date.fromisoformat(day).toordinal())
+            rates.setdefault(code, []).append(rate)
+        self._days, self._rates = days, rates
+
+    def rate_as_of(self, currency_code, when):
+        """Rate of currency_code per 1 IDR on the date of when (date/datetime or 'YYYY-MM-DD...')."""
+        if currency_code == BASE_CURRENCY:
+            return 1.0
+        days = self._days.get(currency_code)
+        if not days:
+            return None
+        if isinstance(when, str):
+            when = date.fromisoformat(when[:10])
+        position = bisect_right(days, when.toordinal()) - 1
+        return self._rates[currency_code][position if position >= 0 else 0]
+
+    def factor(self, from_currency, home_currency, when):
+        """Multiplier from from_currency to home_currency at when; 1.0 if a rate is missing."""
+        if from_currency == home_currency:
+            return 1.0
+        from_rate = self.rate_as_of(from_currency, when)
+        home_rate = self.rate_as_of(home_currency, when)
+        return home_rate / from_rate if from_rate and home_rate else 1.0
+
+    def convert_many(self, amounts, currencies, days, home_currency):
+        """Convert parallel amounts/currencies/days to home_currency at each row's rate.
+
+        Factors are memoised per (currency, day) so the bisect runs once per
+        distinct pair rather than once per row.
+        """
+        factors = {}
+
+        def factor(code, day):
+            key = (code, day)
+            value = factors.get(key)
+            if value is None:
+                value = factors[key] = self.factor(code, home_currency, day)
+            return value
+        return list(map(mul, amounts, map(factor, currencies, days)))
+
+
+def reprice_ledger(rate_cache, history=None):
+    """Recompute every Transaction.amount_home_currency.
+
+    The factor to the home currency is computed once per currency (or,
+    with a RateHistoryIndex, once per currency and day, so every row is
+    priced at the rate of its own day), stored in a temporary table, and
+    applied with a single UPDATE: no row travels through Python. The whole
+    run is a single transaction and the spending rollup is rebuilt at the
+    end. Returns the number of rows repriced.
+    """
+    from .aggregates import rebuild_rollup
+
+    with db_session:
+        connection = db.get_connection()
+        if history is not None:
+            home_currency = rate_cache.get_home_currency()
+            pairs = connection.execute('SELECT DISTINCT "currency", date("timestamp") FROM "Transaction"').fetchall()
+            factors = [(code, day, history.factor(code, home_currency, day)) for code, day in pairs]
+            day = 'date("timestamp")'
+        else:
+            codes = [row[0] for row in connection.execute('SELECT DISTINCT "currency" FROM "Transaction"')]
+            factors = [(code, '', rate_cache.convert(1.0, code)) for code in codes]
+            day = "''"
+        connection.execute('CREATE TEMP TABLE IF NOT EXISTS "RepriceFactor"'
+                           ' ("currency" TEXT, "day" TEXT, "factor" REAL, PRIMARY KEY ("currency", "day"))')
+        connection.execute('DELETE FROM temp."RepriceFactor"')
+        executemany(connection, 'INSERT INTO temp."RepriceFactor" VALUES (?, ?, ?)', factors)
+        repriced = connection.execute(
+            'UPDATE "Transaction" SET "amount_home_currency" = "amount" * (SELECT "factor" FROM temp."RepriceFactor" f'
+            f' WHERE f."currency" = "Transaction"."currency" AND f."day" = {day})'
+        ).rowcount
+        connection.execute('DROP TABLE temp."RepriceFactor"')
+        rebuild_rollup()
+    return repriced
+
+
+def record_rate_history(rates, day=None):
+    """Upsert one RateHistory row per currency for day (today by default)."""
+    day = day or date.today()
+    for code, rate in rates.items():
+        entry = RateHistory.get(currency_code=code, day=day)
+        if entry:
+            entry.rate = rate
+        else:
+            RateHistory(currency_code=code, day=day, rate=rate)
+
+
+def store_rates(rates):
+    """Write API conversion_rates (per 1 IDR) for the known currencies to ExchangeRate."""
+    now = datetime.now()
+    known = {code: rates[code] for code in CURRENCY_MAP.values()
+             if code in rates and code != BASE_CURRENCY}
+    with db_session:
+        for code, rate in known.items():
+            rate_obj = ExchangeRate.get(currency_code=code)
+            if rate_obj:
+                rate_obj.rate = rate
+                rate_obj.last_updated = now
+            else:
+                ExchangeRate(currency_code=code, rate=rate, last_updated=now)
+        record_rate_history(known, now.date())
+    return len(known)
+
+
+def touch_rates():
+    """Mark the stored rates as confirmed current (HTTP 304 from the API)."""
+    with db_session:
+        now = datetime.now()
+        rates = {}
+        for rate_obj in ExchangeRate.select():
+            rate_obj.last_updated = now
+            rates[rate_obj.currency_code] = rate_obj.rate
+        record_rate_history(rates, now.date())
+
+
+class _InflightFetch:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = False
+
+
+class RateRefresher:
+    """Refresh ExchangeRate from the exchangerate-api /latest/IDR endpoint on a TTL.
+
+    refresh() fetches only when the stored rates are older than ttl (or
+    when forced), backs off exponentially after failures, and lets
+    concurrent callers share one in-flight request. Requests carry the
+    last ETag so an unchanged response costs a 304. Each fetch's latency
+    and outcome is kept in `fetches`.
+    """
+
+    def __init__(self, url, rate_cache=None, ttl=RATE_TTL, timeout=FETCH_TIMEOUT,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 clock=time.monotonic, session=None):
+        self.url = url
+        self.rate_cache = rate_cache
+        self.ttl = ttl
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self.session = session or requests.Session()
+        self.failures = 0
+        self.retry_at = None
+        self.fetches = deque(maxlen=50)
+        self._etag = None
+        self._lock = threading.Lock()
+        self._inflight = None
+
+    def rates_age(self, now=None):
+        """Age of the oldest stored rate, or None when there are no rates."""
+        with db_session:
+            oldest = min(r.last_updated for r in ExchangeRate)
+        if oldest is None:
+            return None
+        return (now or datetime.now()) - oldest
+
+    def is_stale(self, now=None):
+        age = self.rates_age(now)
+        return age is None or age >= self.ttl
+
+    def in_backoff(self):
+        return self.retry_at is not None and self.clock() < self.retry_at
+
+    def seconds_until_due(self):
+        """Seconds until refresh() would next fetch, for scheduling the next check."""
+        if self.in_backoff():
+            return max(MIN_CHECK_INTERVAL, self.retry_at - self.clock())
+        age = self.rates_age()
+        if age is None:
+            return MIN_CHECK_INTERVAL
+        return max(MIN_CHECK_INTERVAL, (self.ttl - age).total_seconds())
+
+    def refresh(self, force=False):
+        """Fetch and store new rates if due. Returns True when rates were updated."""
+        with self._lock:
+            inflight = self._inflight
+            if inflight is None:
+                if not force and (self.in_backoff() or not self.is_stale()):
+                    return False
+                inflight = self._inflight = _InflightFetch()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            # Sudah ada fetch yang berjalan: tunggu dan pakai hasilnya
+            inflight.done.wait()
+            return inflight.result
+        try:
+            inflight.result = self._fetch()
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.done.set()
+        return inflight.result
+
+    def _fetch(self):
+        started = self.clock()
+        outcome = 'error'
+        try:
+            headers = {'If-None-Match': self._etag} if self._etag else {}
+            response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                touch_rates()
+                outcome = 'not-modified'
+            else:
+                response.raise_for_status()
+                data = response.json()
+                if data.get('result') != 'success' or 'conversion_rates' not in data:
+                    raise ValueError(f"API Error: {data.get('error-type', 'Unknown error')}")
+                store_rates(data['conversion_rates'])
+                self._etag = response.headers.get('ETag')
+                outcome = 'updated'
+        except Exception as e:
+            self.failures += 1
+            self.retry_at = self.clock() + min(
+                self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+            log_event('rates.fetch_failed', logging.WARNING, error=str(e), failures=self.failures,
+                      retry_in=self.retry_at - self.clock())
+            return False
+        finally:
+            latency = self.clock() - started
+            self.fetches.append((datetime.now(), latency, outcome))
+            metrics.record('api.exchange_rate', latency)
+            log_event('rates.fetch', outcome=outcome, latency=round(latency, 4))
+
+        self.failures = 0
+        self.retry_at = None
+        if self.rate_cache is not None:
+            # Muat ulang di thread ini, bukan saat lookup berikutnya di UI
+            self.rate_cache.load()
+        return True
+
+    def stats(self):
+        latencies = [latency for _, latency, _ in self.fetches]
+        return {
+            'fetches': len(latencies),
+            'failures': self.failures,
+            'last_latency': latencies[-1] if latencies else None,
+            'max_latency': max(latencies) if latencies else None,
+            'in_backoff': self.in_backoff(),
+        }
@@ -0,0 +1,158 @@
+"""AI assistant answers that avoid a network call.
+
+local_answer() replies to plain numeric questions (remaining budget,
+today's or total spending) straight from the ledger summary.
+ResponseCache keeps Gemini answers in SQLite, keyed by the normalized
+question plus a fingerprint of the user's finances and the conversation
+before it, with a TTL and LRU eviction. RequestCoalescer lets identical questions that are asked while
+one is already in flight share its answer instead of sending another
+request.
+"""
+import asyncio
+import hashlib
+import re
+import unicodedata
+from datetime import datetime, timedelta
+
+from pony.orm import db_session
+
+from .diagnostics import metrics
+from .models import AIResponse
+
+RESPONSE_TTL = timedelta(hours=12)
+RESPONSE_CACHE_SIZE = 200
+
+_WORDS = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+# Pertanyaan yang meminta saran/penjelasan tidak dijawab lokal walaupun menyebut angka
+_ADVICE = re.compile(r"\b(tips?|saran|sarankan|rekomendasi|bagaimana|gimana|cara|kenapa|mengapa|hemat|"
+                     r"how to|how can|why|should|recommend|advice|save|saving)\b")
+_REMAINING = re.compile(r"\b(sisa|tersisa|remaining|left)\b")
+_TODAY = re.compile(r"\b(hari ini|today)\b")
+_SPENDING = re.compile(r"\b(pengeluaran|keluar|habis|belanja|spent|spend|spending|expenses?)\b")
+_TOTAL = re.compile(r"\b(total|semua|all)\b")
+LOCAL_ANSWER_MAX_WORDS = 12
+
+
+def normalize_question(question):
+    """Lowercase, accents and punctuation removed, whitespace collapsed."""
+    text = unicodedata.normalize('NFKD', question.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _SPACES.sub(" ", _WORDS.sub(" ", text)).strip()
+
+
+def response_key(question, fingerprint):
+    """Cache key for question asked in the context described by fingerprint (ContextBuilder.fingerprint)."""
+    return hashlib.sha256(f"{normalize_question(question)}\0{fingerprint}".encode()).hexdigest()
+
+
+def local_answer(question, summary):
+    """Answer a purely numeric question from a LedgerService.summary(), or None.
+
+    Handles the remaining budget, today's spending and total spending (in
+    Indonesian or English); anything longer or asking for advice goes to
+    the model.
+    """
+    text = normalize_question(question)
+    if not text or len(text.split()) > LOCAL_ANSWER_MAX_WORDS or _ADVICE.search(text):
+        return None
+    currency = summary['home_currency']
+    lines = []
+    if _REMAINING.search(text):
+        if summary['travel_budget'] > 0:
+            lines.append(f"💰 Sisa budget Anda: {summary['remaining']:,.0f} {currency} "
+                         f"dari {summary['travel_budget']:,.0f} {currency}.")
+        else:
+            lines.append("💰 Anda belum mengatur budget perjalanan. Atur di menu Settings.")
+    if _TODAY.search(text) and (_SPENDING.search(text) or lines):
+        lines.append(f"📅 Pengeluaran hari ini: {summary['today_spent']:,.0f} {currency}.")
+    if _TOTAL.search(text) and _SPENDING.search(text) and not _TODAY.search(text):
+        lines.append(f"🧾 Total pengeluaran perjalanan: {summary['total_spent']:,.0f} {currency}.")
+    if not lines:
+        return None
+    metrics.count('ai.local_answer')
+    return "\n".join(lines)
+
+
+class ResponseCache:
+    """Persistent AI answers in the AIResponse table with a TTL and LRU eviction.
+
+    get() returns None for missing or expired entries (expired ones are
+    deleted) and marks hits as recently used; put() keeps at most
+    max_entries rows, dropping the least recently used.
+    """
+
+    def __init__(self, ttl=RESPONSE_TTL, max_entries=RESPONSE_CACHE_SIZE, clock=datetime.now):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = self.clock()
+        with db_session:
+            entry = AIResponse.get(key=key)
+            if entry is not None and now - entry.created > self.ttl:
+                entry.delete()
+                entry = None
+            if entry is None:
+                self.misses += 1
+                metrics.count('ai.cache_miss')
+                return None
+            entry.last_used = now
+            entry.hits += 1
+            answer = entry.answer
+        self.hits += 1
+        metrics.count('ai.cache_hit')
+        return answer
+
+    def put(self, key, question, answer):
+        now = self.clock()
+        with db_session:
+            entry = AIResponse.get(key=key)
+            if entry is None:
+                AIResponse(key=key, question=question, answer=answer, created=now, last_used=now)
+            else:
+                entry.set(answer=answer, created=now, last_used=now)
+            excess = AIResponse.select().count() - self.max_entries
+            if excess > 0:
+                for old in AIResponse.select().order_by(AIResponse.last_used)[:excess]:
+                    old.delete()
+
+    def stats(self):
+        with db_session:
+            entries = AIResponse.select().count()
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses}
+
+
+class RequestCoalescer:
+    """Run one coroutine per key at a time; callers with the same key share its result."""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._inflight = {}
+
+    def in_flight(self, key):
+        return key in self._inflight
+
+    async def run(self, key, factory):
+        """Await factory() for key, or the call already running for it."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            metrics.count('ai.coalesced')
+            return await asyncio.shield(future)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await factory()
+        except BaseException as e:
+            future.set_exception(e)
+            # Tandai sudah diambil agar tidak ada peringatan jika tidak ada yang menunggu
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,162 @@
+"""Full-text search over transaction descriptions and categories.
+
+TransactionSearch is an FTS5 index over Transaction (see MIGRATIONS)
+kept in sync by triggers, so every write path, including bulk imports
+and raw SQL, updates it. The word being typed is matched as a prefix.
+FTS5 finds the newest matches by rowid (more of them when the first
+window is full) and they are ranked here by a weighted term frequency,
+description matches first: FTS5's own bm25 has to count every row
+containing each term, which for a common word costs more than the
+lookup itself (100-500 ms per keystroke over 500k rows, against under
+10 ms here).
+
+Bulk writers wrap their inserts in bulk_index(): FTS5 flushes its
+pending terms at the end of every statement, so a trigger per row
+writes one tiny index segment per row, several times slower than
+indexing all new rows in one statement.
+"""
+import re
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+from pony.orm import db_session
+
+from .models import db
+
+SEARCH_LIMIT = 20
+# Jeda setelah ketikan terakhir sebelum pencarian dijalankan, dalam detik
+SEARCH_DEBOUNCE = 0.15
+# Kecocokan terbaru sebanyak ini diranking dulu; kalau jendela penuh, diperlebar sampai
+# MAX_RANK_WINDOW. Kata yang umum (nama kategori, "makan") bisa cocok dengan ratusan
+# ribu baris, dan ranking di Python sekitar 10 us per baris
+RANK_WINDOW = 100
+MAX_RANK_WINDOW = 500
+# Bobot ranking: kecocokan di deskripsi lebih penting daripada di kategori
+DESCRIPTION_WEIGHT = 10.0
+CATEGORY_WEIGHT = 1.0
+# Satu huruf cocok dengan hampir semua baris; indeks prefix FTS5 mulai dari 2 huruf
+MIN_TERM_CHARS = 2
+
+_TERMS = re.compile(r"\w+")
+
+
+@contextmanager
+def bulk_index():
+    """Pause the index triggers for a bulk insert inside the caller's db_session.
+
+    Transactions inserted in the block are indexed with one INSERT ...
+    SELECT when it ends; updates and deletes in the block are not
+    indexed, so follow those with rebuild_index(). Like the rows
+    themselves, the pause commits or rolls back with the caller's session.
+    """
+    connection = db.get_connection()
+    last_id = connection.execute('SELECT coalesce(max("id"), 0) FROM "Transaction"').fetchone()[0]
+    connection.execute('INSERT INTO "SearchIndexPause" ("paused") VALUES (1)')
+    yield
+    connection.execute('DELETE FROM "SearchIndexPause"')
+    connection.execute(
+        'INSERT INTO "TransactionSearch" ("rowid", "description", "category")'
+        ' SELECT "id", "description", "category" FROM "Transaction" WHERE "id" > ?', (last_id,))
+
+
+@db_session
+def rebuild_index():
+    """Re-index every transaction from scratch."""
+    db.execute('INSERT INTO "TransactionSearch" ("TransactionSearch") VALUES (\'rebuild\')')
+
+
+def _fold(text):
+    """Casefold and strip accents, like the index's unicode61 remove_diacritics tokenizer."""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    text = unicodedata.normalize('NFKD', text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def query_terms(text):
+    """The searchable words of text and whether the last one is still being typed."""
+    terms = [term for term in _TERMS.findall(_fold(text)) if len(term) >= MIN_TERM_CHARS]
+    typing = bool(terms) and not text[-1].isspace() and _fold(text).rstrip().endswith(terms[-1])
+    return terms, typing
+
+
+def match_expression(text):
+    """FTS5 MATCH expression for what the user typed, or None if there is nothing to search.
+
+    All words must match. Only the word still being typed (the last one,
+    unless the text ends with a space) is a prefix term ("kop"*); finished
+    words are exact terms, which FTS5 looks up without merging the
+    doclists of every word sharing the prefix. Words are quoted, so FTS5
+    query syntax typed by the user is never interpreted.
+    """
+    terms, typing = query_terms(text)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' if typing and i == len(terms) - 1 else f'"{term}"'
+                    for i, term in enumerate(terms))
+
+
+@lru_cache(maxsize=32)
+def _hit_pattern(terms, typing):
+    """Regex for the words that hit one of terms (the last as a prefix if typing), one match per word."""
+    alternatives = [re.escape(term) + (r'\w*' if typing and i == len(terms) - 1 else r'\b')
+                    for i, term in enumerate(terms)]
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + ')')
+
+
+def relevance(description, category, terms, typing):
+    """Score of one match: term frequency per column, normalised by its length and weighted."""
+    # Dihitung oleh regex (C), bukan per kata di Python: dipanggil untuk setiap kandidat
+    hits = _hit_pattern(tuple(terms), typing)
+    score = 0.0
+    for text, weight in ((description, DESCRIPTION_WEIGHT), (category, CATEGORY_WEIGHT)):
+        text = _fold(text)
+        words = len(_TERMS.findall(text))
+        if words:
+            score += weight * len(hits.findall(text)) / words
+    return score
+
+
+def _candidates(expression, count, before=None):
+    """(id, description, category) of the newest count matches of expression, below id before if given."""
+    older = ' AND "rowid" < $before' if before is not None else ''
+    return db.select(
+        'SELECT t."id", t."description", t."category"'
+        ' FROM (SELECT "rowid" FROM "TransactionSearch" WHERE "TransactionSearch" MATCH $expression'
+        f'      {older} ORDER BY "rowid" DESC LIMIT $count) s'
+        ' JOIN "Transaction" t ON t."id" = s."rowid" ORDER BY t."id" DESC')
+
+
+def search_transactions(text, limit=SEARCH_LIMIT, window=RANK_WINDOW, max_window=MAX_RANK_WINDOW):
+    """Best matches for text, in the same tuple form as transactions_page() rows.
+
+    FTS5 walks the matches newest first (by rowid) and stops after window
+    of them. If that fills the window, older matches in the description
+    are fetched too, until max_window rows in all: an older match in the
+    category alone scores like the newer ones of its category already in
+    the window. The candidates are ordered by relevance(), newest first
+    among equal scores, and only the best limit are read in full. So
+    every match is ranked unless more than max_window match, and a term
+    that matches most of the ledger costs no more than max_window rows.
+    An empty or too short query returns [].
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    terms, typing = query_terms(text)
+    with db_session:
+        candidates = _candidates(expression, window)
+        if len(candidates) == window and max_window > window:
+            candidates += _candidates(f'{{description}} : ({expression})', max_window - window,
+                                      before=candidates[-1][0])
+        candidates.sort(key=lambda row: (-relevance(row[1], row[2], terms, typing), -row[0]))
+        ids = [row[0] for row in candidates[:limit]]
+        if not ids:
+            return []
+        rows = {row[0]: row for row in db.select(
+            'SELECT "id", "description", "amount", "currency", "amount_home_currency", "category", "timestamp"'
+            f' FROM "Transaction" WHERE "id" IN ({", ".join(map(str, ids))})')}
+    return [rows[i][:6] + (datetime.fromisoformat(rows[i][6]),) for i in ids]
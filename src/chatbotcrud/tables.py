@@ -0,0 +1,94 @@
+def count_widgets(widget):
+    """Number of widgets in the tree rooted at widget (inclusive)."""
+    return 1 + sum(count_widgets(child) for child in getattr(widget, 'children', None) or [])
+
+
+def apply_rows(source, rows, key=None):
+    """Make a table's ListSource match rows (a list of dicts) with row-level edits.
+
+    Rows that already show the same values are left alone, changed rows
+    get only their differing attributes assigned, and the tail is appended
+    or removed. The backend therefore redraws only the touched rows instead
+    of reloading the whole table. Returns the number of rows touched.
+
+    With key (the name of an identifying attribute) rows are matched by
+    identity instead of position: rows whose key is gone are removed and
+    new ones inserted where they belong, so a deleted or moved row never
+    hands its Row object (and the selection on it) to another record. Rows
+    whose key is None match nothing and are replaced on every call.
+    """
+    if key is None:
+        return _apply_by_position(source, rows)
+    touched = 0
+    wanted = {values[key] for values in rows if values[key] is not None}
+    for row in [row for row in source if getattr(row, key, None) not in wanted]:
+        source.remove(row)
+        touched += 1
+    by_key = {getattr(row, key): row for row in source}
+    for index, values in enumerate(rows):
+        row = source[index] if index < len(source) else None
+        if row is not None and values[key] is not None and getattr(row, key) == values[key]:
+            touched += _update_row(row, values)
+            continue
+        # Baris yang berpindah posisi (mis. timestamp berubah) dipindahkan, bukan ditimpa baris lain
+        moved = by_key.pop(values[key], None) if values[key] is not None else None
+        if moved is not None:
+            source.remove(moved)
+        source.insert(index, values)
+        touched += 1
+    while len(source) > len(rows):
+        source.remove(source[len(source) - 1])
+        touched += 1
+    return touched
+
+
+def _apply_by_position(source, rows):
+    touched = 0
+    existing = len(source)
+    for index, values in enumerate(rows):
+        if index >= existing:
+            source.append(values)
+            touched += 1
+            continue
+        touched += _update_row(source[index], values)
+    while len(source) > len(rows):
+        source.remove(source[len(source) - 1])
+        touched += 1
+    return touched
+
+
+def _update_row(row, values):
+    """Assign the attributes of row that differ from values; whether any did."""
+    changed = False
+    for key, value in values.items():
+        if getattr(row, key, None) != value:
+            setattr(row, key, value)
+            changed = True
+    return changed
+
+
+def category_rows(categories, home_currency):
+    """Rows for the category table from (category, amount, count) tuples."""
+    return [{'category': category, 'amount': f"{amount:,.0f} {home_currency}", 'count': str(count)}
+            for category, amount, count in categories]
+
+
+def transaction_rows(transactions, home_currency):
+    """Rows for the recent-transactions table from transactions_page() tuples.
+
+    The transaction id rides along on each row (not shown as a column) so
+    a selected row maps straight back to its Transaction. Rows without an
+    id are new transactions still queued in the LedgerWriter.
+    """
+    rows = []
+    for t_id, description, amount, currency, amount_home, category, timestamp in transactions:
+        amount_str = (f"{amount:,.0f} {currency}" if currency == home_currency else
+                      f"{amount:,.2f} {currency} (≈{amount_home:,.0f} {home_currency})")
+        rows.append({
+            'transaction_id': t_id,
+            'description': description[:30] + ("..." if len(description) > 30 else ""),
+            'amount': amount_str,
+            'category': category,
+            'date': timestamp.strftime("%m/%d %H:%M") if t_id is not None else "saving…",
+        })
+    return rows
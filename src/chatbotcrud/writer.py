@@ -0,0 +1,195 @@
+"""Ledger writes on one background thread, applied in group commits.
+
+The UI submits LedgerService calls to LedgerWriter and returns at once;
+the writer thread drains its queue, runs every queued call in one
+ledger.session() (one SQLite transaction, one commit) and hands the results
+back through dispatch, e.g. loop.call_soon_threadsafe. Until a call is
+committed it stays in writer.pending, and overlay_summary/overlay_rows
+show the ledger as it will be so the UI can update optimistically.
+"""
+import queue
+import threading
+from datetime import datetime
+
+from .diagnostics import log_event, metrics
+
+WRITE_BATCH_SIZE = 64
+# Setelah perintah pertama, tunggu sebentar agar perintah berikutnya ikut satu commit
+WRITE_BATCH_WINDOW = 0.005
+
+
+class WriteCommand:
+    """One queued LedgerService call.
+
+    row is the transaction as it will look after the call and previous
+    as it looked before, both in transactions_page() tuple form (None
+    for an insert's previous or a delete's row); they drive the overlay.
+    done is set on the writer thread as soon as the call has been applied,
+    before on_done runs, so the overlay never counts a committed change twice.
+    """
+
+    def __init__(self, method, args, on_done=None, row=None, previous=None):
+        self.method = method
+        self.args = args
+        self.on_done = on_done
+        self.row = row
+        self.previous = previous
+        self.done = False
+
+
+class LedgerWriter:
+    """Single writer thread for a LedgerService.
+
+    submit() queues a call by method name and returns immediately.
+    on_done(result, error) is called through dispatch once the batch
+    holding the call has committed (error is None) or failed. A failing
+    batch is retried one call per transaction, so only the bad call fails.
+    """
+
+    def __init__(self, ledger, dispatch=None, batch_size=WRITE_BATCH_SIZE, batch_window=WRITE_BATCH_WINDOW):
+        self.ledger = ledger
+        self.dispatch = dispatch or (lambda func, *args: func(*args))
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.pending = []
+        self.batches = 0
+        self.commands = 0
+        self.failures = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ledger-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, method, *args, on_done=None, row=None, previous=None):
+        command = WriteCommand(method, args, on_done, row, previous)
+        self.pending.append(command)
+        self._queue.put(command)
+        return command
+
+    def flush(self):
+        """Block until every submitted call has been applied."""
+        self._queue.join()
+
+    def stop(self):
+        """Apply what is queued, then end the thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {'batches': self.batches, 'commands': self.commands, 'failures': self.failures,
+                'pending': len(self.pending)}
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                command = self._queue.get(timeout=self.batch_window)
+            except queue.Empty:
+                break
+            if command is None:
+                # Sentinel stop: kembalikan ke antrean, diproses setelah batch ini
+                self._queue.task_done()
+                self._queue.put(None)
+                break
+            batch.append(command)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self._queue.task_done()
+                return
+            with metrics.timer('writer.batch'):
+                outcomes = self._apply(batch)
+            for command in batch:
+                command.done = True
+            self.batches += 1
+            self.commands += len(batch)
+            self.dispatch(self._finish, batch, outcomes)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _call(self, command):
+        return getattr(self.ledger, command.method)(*command.args)
+
+    def _apply(self, batch):
+        """[(result, error)] per command: one commit for the batch, or one per command after a failure."""
+        try:
+            with self.ledger.session():
+                return [(self._call(command), None) for command in batch]
+        except Exception as e:
+            if len(batch) == 1:
+                return [(None, e)]
+        outcomes = []
+        for command in batch:
+            try:
+                with self.ledger.session():
+                    outcomes.append((self._call(command), None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+
+    def _finish(self, batch, outcomes):
+        for command, (result, error) in zip(batch, outcomes):
+            self.pending.remove(command)
+            if error is not None:
+                self.failures += 1
+                log_event('writer.failed', method=command.method, error=str(error))
+            if command.on_done is not None:
+                command.on_done(result, error)
+
+
+# --- Tampilan optimistis: ledger seperti nanti setelah semua perintah pending di-commit ---
+def overlay_summary(summary, pending, now=None):
+    """Copy of a LedgerService.summary() with the pending commands applied."""
+    today = (now or datetime.now()).date()
+    categories = {category: [amount, count] for category, amount, count in summary['categories']}
+    total, today_spent = summary['total_spent'], summary['today_spent']
+    travel_budget = summary['travel_budget']
+    for command in pending:
+        if command.done:
+            continue
+        if command.method == 'save_settings':
+            travel_budget = command.args[1]
+        for row, sign in ((command.previous, -1), (command.row, 1)):
+            if row is None:
+                continue
+            amount_home, category, timestamp = row[4], row[5], row[6]
+            entry = categories.setdefault(category, [0.0, 0])
+            entry[0] += sign * amount_home
+            entry[1] += sign
+            total += sign * amount_home
+            if timestamp.date() == today:
+                today_spent += sign * amount_home
+    result = dict(summary)
+    result.update(
+        total_spent=total, today_spent=today_spent, travel_budget=travel_budget,
+        remaining=travel_budget - total,
+        categories=sorted(((category, amount, count) for category, (amount, count) in categories.items() if count > 0),
+                          key=lambda entry: entry[1], reverse=True),
+    )
+    return result
+
+
+def overlay_rows(rows, pending, newest=True):
+    """Page rows with pending edits and deletes applied; new rows go on top of the newest page."""
+    pending = [command for command in pending if not command.done]
+    replaced = {}
+    for command in pending:
+        if command.previous is not None:
+            replaced[command.previous[0]] = command.row
+    # Baris yang dihapus menjadi None lalu dibuang
+    rows = [row for row in (replaced.get(row[0], row) for row in rows) if row is not None]
+    if newest:
+        added = [command.row for command in pending if command.previous is None and command.row is not None]
+        rows = added[::-1] + rows
+    return rows
@@ -0,0 +1,36 @@
+import pytest
+from pony.orm import db_session
+
+from chatbotcrud.core import LedgerService, RatesService
+from chatbotcrud.models import ExchangeRate, UserSettings, db, init_database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database(tmp_path_factory):
+    """Bind the Pony entities once per test session to a throwaway SQLite file."""
+    db_path = tmp_path_factory.mktemp("data") / "tourist_money_manager.sqlite"
+    init_database(str(db_path))
+    return db
+
+
+@pytest.fixture
+def ledger(database):
+    """Start each test with an empty ledger."""
+    with db_session:
+        for entity in database.entities.values():
+            if entity.__name__ != 'UserSettings':
+                entity.select().delete(bulk=True)
+    yield database
+
+
+@pytest.fixture
+def service(ledger):
+    """A LedgerService over the empty ledger: home currency IDR, rates for USD and JPY."""
+    with db_session:
+        ExchangeRate(currency_code='USD', rate=0.0001)
+        ExchangeRate(currency_code='JPY', rate=0.01)
+        settings = UserSettings.select().first()
+        settings.home_currency, settings.travel_budget = 'IDR', 1000000.0
+    rates = RatesService()
+    rates.load()
+    return LedgerService(rates)
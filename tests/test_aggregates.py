@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+from pony.orm import db_session
+
+from chatbotcrud.aggregates import (
+    dashboard_aggregates, rebuild_rollup, record_transaction, verify_rollup,
+)
+from chatbotcrud.models import Transaction, db
+
+
+def add(amount, category, timestamp):
+    transaction = Transaction(description="x", amount=amount, currency="IDR",
+                              amount_home_currency=amount, category=category, timestamp=timestamp)
+    record_transaction(transaction)
+    return transaction
+
+
+def test_empty_ledger(ledger):
+    summary = dashboard_aggregates()
+    assert summary == {'total_spent': 0, 'today_spent': 0, 'categories': []}
+
+
+def test_totals_today_and_categories(ledger):
+    now = datetime(2025, 5, 26, 15, 0)
+    with db_session:
+        add(100.0, "Belanja", now)
+        add(50.0, "Belanja", now - timedelta(days=2))
+        add(300.0, "Akomodasi", now - timedelta(days=1))
+        add(25.0, "Transportasi", now.replace(hour=0))
+
+    summary = dashboard_aggregates(now=now)
+    assert summary['total_spent'] == 475.0
+    assert summary['today_spent'] == 125.0
+    assert summary['categories'] == [
+        ("Akomodasi", 300.0, 1),
+        ("Belanja", 150.0, 2),
+        ("Transportasi", 25.0, 1),
+    ]
+    assert verify_rollup() == []
+
+
+def test_update_and_delete_apply_deltas(ledger):
+    now = datetime(2025, 5, 26, 15, 0)
+    with db_session:
+        add(100.0, "Belanja", now)
+        moved = add(40.0, "Belanja", now)
+        removed = add(10.0, "Souvenir", now)
+        moved_id, removed_id = moved.id, removed.id
+
+    with db_session:
+        transaction = Transaction[moved_id]
+        record_transaction(transaction, sign=-1)
+        transaction.category = "Transportasi"
+        transaction.amount_home_currency = 60.0
+        record_transaction(transaction)
+
+        transaction = Transaction[removed_id]
+        record_transaction(transaction, sign=-1)
+        transaction.delete()
+
+    summary = dashboard_aggregates(now=now)
+    assert summary['categories'] == [("Belanja", 100.0, 1), ("Transportasi", 60.0, 1)]
+    assert summary['total_spent'] == 160.0
+    assert verify_rollup() == []
+
+
+def test_verify_detects_drift_and_rebuild_fixes_it(ledger):
+    now = datetime(2025, 5, 26, 15, 0)
+    with db_session:
+        add(100.0, "Belanja", now)
+        # Ditulis tanpa memperbarui rollup
+        Transaction(description="raw", amount=5.0, currency="IDR",
+                    amount_home_currency=5.0, category="Belanja", timestamp=now)
+
+    assert verify_rollup() == [
+        (now.date().isoformat(), "Belanja", (105.0, 2), (100.0, 1)),
+        (now.date().isoformat(), "Belanja", "IDR", (105.0, 2), (100.0, 1)),
+    ]
+    rebuild_rollup()
+    assert verify_rollup() == []
+    assert dashboard_aggregates(now=now)['total_spent'] == 105.0
+
+
+def test_verify_tolerates_rounding_drift_on_large_totals(ledger):
+    now = datetime(2025, 5, 26, 15, 0)
+    with db_session:
+        for _ in range(3):
+            add(123456789012.34, "Akomodasi", now)
+        # Selisih pembulatan seperti hasil banyak update inkremental
+        db.execute('UPDATE "SpendingRollup" SET "amount" = "amount" + 0.0001')
+    assert verify_rollup() == []
+    with db_session:
+        db.execute('UPDATE "SpendingRollup" SET "amount" = "amount" + 1000')
+    assert len(verify_rollup()) == 1
+
+
+def test_update_within_same_day_and_category(ledger):
+    now = datetime(2025, 5, 26, 15, 0)
+    with db_session:
+        transaction_id = add(100.0, "Belanja", now).id
+
+    with db_session:
+        transaction = Transaction[transaction_id]
+        record_transaction(transaction, sign=-1)
+        transaction.amount_home_currency = 80.0
+        record_transaction(transaction)
+
+    assert dashboard_aggregates(now=now)['categories'] == [("Belanja", 80.0, 1)]
+    assert verify_rollup() == []
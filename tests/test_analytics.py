@@ -0,0 +1,78 @@
+import threading
+from datetime import date, datetime, timedelta
+
+from pony.orm import db_session
+
+from chatbotcrud.aggregates import record_transaction, verify_rollup
+from chatbotcrud.analytics import Bucket, budget_forecast, spending_series
+from chatbotcrud.models import Transaction
+
+
+def add(amount, category, currency, timestamp):
+    record_transaction(Transaction(description="x", amount=amount, currency=currency,
+                                   amount_home_currency=amount, category=category, timestamp=timestamp))
+
+
+def test_series_by_day_week_category_and_currency(ledger):
+    # Rabu 28 Mei 2025; Senin minggu itu 26 Mei
+    wednesday = datetime(2025, 5, 28, 12, 0)
+    with db_session:
+        add(100.0, "Belanja", 'IDR', wednesday)
+        add(50.0, "Belanja", 'USD', wednesday.replace(hour=20))
+        add(30.0, "Transportasi", 'USD', wednesday - timedelta(days=2))
+        add(200.0, "Akomodasi", 'JPY', wednesday - timedelta(days=3))
+
+    series = spending_series()
+    assert [(b.start, b.amount, b.count) for b in series['daily']] == [
+        (date(2025, 5, 25), 200.0, 1), (date(2025, 5, 26), 30.0, 1), (date(2025, 5, 28), 150.0, 2)]
+    assert series['daily'][-1].categories == {"Belanja": 150.0}
+    assert series['daily'][-1].currencies == {'IDR': 100.0, 'USD': 50.0}
+    assert [(b.start, b.amount, b.count) for b in series['weekly']] == [
+        (date(2025, 5, 19), 200.0, 1), (date(2025, 5, 26), 180.0, 3)]
+    assert series['categories'] == [("Akomodasi", 200.0, 1), ("Belanja", 150.0, 2), ("Transportasi", 30.0, 1)]
+    assert series['currencies'] == [('JPY', 200.0, 1), ('IDR', 100.0, 1), ('USD', 80.0, 2)]
+    assert series['total_spent'] == 380.0
+    assert verify_rollup() == []
+
+
+def test_forecast_uses_recent_burn_rate():
+    today = date(2025, 6, 10)
+    daily = [Bucket(today - timedelta(days=19), 1000.0, 1, {}, {})]
+    daily += [Bucket(today - timedelta(days=i), 100.0, 1, {}, {}) for i in range(7)]
+
+    forecast = budget_forecast(daily, travel_budget=3000.0, today=today)
+    assert forecast['trip_days'] == 20
+    assert forecast['average_daily'] == 1700.0 / 20
+    assert forecast['burn_rate'] == 100.0
+    assert forecast['days_left'] == 13.0
+    assert forecast['depletion_date'] == date(2025, 6, 23)
+
+    assert budget_forecast(daily, travel_budget=0.0, today=today)['depletion_date'] is None
+    spent = budget_forecast(daily, travel_budget=1000.0, today=today)
+    assert (spent['days_left'], spent['depletion_date']) == (0, today)
+    empty = budget_forecast([], travel_budget=1000.0, today=today)
+    assert (empty['burn_rate'], empty['days_left']) == (0.0, None)
+
+
+def test_report_is_cached_per_ledger_version(service):
+    report = service.analytics()
+    assert service.analytics() is report
+    assert report['total_spent'] == 0
+
+    service.add_transaction("Taxi", 50000, 'IDR', "Transportasi")
+    report = service.analytics()
+    assert report is not service.analytics(today=date.today() + timedelta(days=1))
+    assert report['currencies'] == [('IDR', 50000.0, 1)]
+    assert report['forecast']['burn_rate'] == 50000.0
+
+
+def test_report_read_before_a_write_commits_is_not_cached_as_new(service):
+    with service.session():
+        service.add_transaction("Taxi", 50000, 'IDR', "Transportasi")
+        # Thread lain masih melihat ledger sebelum commit
+        reports = []
+        reader = threading.Thread(target=lambda: reports.append(service.analytics()))
+        reader.start()
+        reader.join()
+        assert reports[0]['total_spent'] == 0
+    assert service.analytics()['total_spent'] == 50000
@@ -1,3 +1,81 @@
+import asyncio
+import os
+
+import pytest
+from pony.orm import db_session
+
+os.environ.setdefault('TOGA_BACKEND', 'toga_dummy')
+pytest.importorskip('toga_dummy')
+
+from chatbotcrud import app as app_module  # noqa: E402
+
+
+class FakeGemini:
+    """GeminiClient stand-in that counts requests and answers after a short delay."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.requests = 0
+
+    async def stream(self, payload):
+        self.requests += 1
+        await asyncio.sleep(0.05)
+        yield self.answer
+
+
+@pytest.fixture
+def app(service, tmp_path, monkeypatch):
+    """The app on the dummy backend, over the service fixture's ledger."""
+    monkeypatch.setenv('HOME', str(tmp_path))
+    app = app_module.TouristMoneyManagerApp(
+        formal_name="Tourist Money Manager", app_id="com.example.touristmoneymanager", app_name="chatbotcrud")
+    yield app
+    app.writer.stop()
+    app.conversion_log.stop()
+
+
+def run_until(app, condition, timeout=5.0):
+    """Run the app's event loop until condition() holds."""
+    async def wait():
+        while not condition():
+            await asyncio.sleep(0.01)
+    app.loop.run_until_complete(asyncio.wait_for(wait(), timeout))
+
+
 def test_first():
     """An initial test for the app."""
     assert 1 + 1 == 2
+
+
+def test_double_tapped_send_makes_one_gemini_request(app, monkeypatch):
+    monkeypatch.setattr(app_module, 'GEMINI_API_KEY', 'test-key')
+    app.gemini = FakeGemini("Coba warung lokal.")
+    app.show_ai_assistant(None)
+    app.chat_input.value = "Tips hemat makan di Bali?"
+    app.on_send_message(app.chat_input)
+    # Tap kedua saat jawaban pertama masih di-stream
+    run_until(app, lambda: app.gemini.requests == 1)
+    app.chat_input.value = "Tips hemat makan di Bali?"
+    app.on_send_message(app.chat_input)
+    run_until(app, lambda: len(app.chat_history) == 4)
+
+    assert app.gemini.requests == 1
+    assert [m['content'] for m in app.chat_history if m['role'] == 'assistant'] == ["Coba warung lokal."] * 2
+
+
+def test_deleted_selection_does_not_move_to_another_transaction(app):
+    ids = [app.ledger.add_transaction(f"Makan {i}", 10000 * (i + 1), 'IDR', "Makanan & Minuman") for i in range(3)]
+    app.transaction_pager.reset()
+    app.show_dashboard(None)
+    app.recent_table._impl.simulate_selection(0)
+    assert app.selected_transaction_id == ids[-1]
+    assert app.btn_delete_transaction.enabled
+
+    app.ledger.delete_transaction(ids[-1])
+    app.transaction_pager.reset()
+    with db_session:
+        app.load_recent_transactions()
+
+    assert [row.transaction_id for row in app.recent_table.data] == ids[1::-1]
+    assert app.selected_transaction_id is None
+    assert not app.btn_edit_transaction.enabled and not app.btn_delete_transaction.enabled
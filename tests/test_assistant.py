@@ -0,0 +1,173 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from chatbotcrud.assistant import (AssistantError, ChatTranscript, ContextBuilder, GeminiClient, build_payload,
+                                  estimate_tokens, history_window)
+
+
+class MockGemini(BaseHTTPRequestHandler):
+    """streamGenerateContent stand-in: one chunked SSE event per word."""
+
+    protocol_version = 'HTTP/1.1'
+    words = ["Sisa ", "budget ", "Anda ", "aman."]
+    status = 200
+    connections = 0
+    requests = []
+    # Diset oleh test: server menahan sisa jawaban sampai klien sudah menerima potongan pertama
+    release = None
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        type(self).requests.append((self.path, body))
+        if self.status != 200:
+            payload = json.dumps({'error': {'message': 'API key not valid'}}).encode()
+            self.send_response(self.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, word in enumerate(self.words):
+            event = {'candidates': [{'content': {'parts': [{'text': word}], 'role': 'model'}}]}
+            data = f"data: {json.dumps(event)}\r\n\r\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            if i == 0 and self.release is not None:
+                assert self.release.wait(5)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    handler = type('Handler', (MockGemini,), {'connections': 0, 'requests': [], 'release': None})
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{httpd.server_address[1]}/v1beta/models/gemini:streamGenerateContent"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def collect(client, payload):
+    async def run():
+        return [chunk async for chunk in client.stream(payload)]
+    return asyncio.run(run())
+
+
+def test_streams_chunks_before_the_answer_is_complete(server):
+    handler, url = server
+    handler.release = threading.Event()
+    client = GeminiClient('test-key', url)
+    received = []
+
+    async def run():
+        async for chunk in client.stream(build_payload([{"role": "user", "parts": [{"text": "Halo"}]}])):
+            received.append(chunk)
+            # Potongan pertama sudah sampai padahal server masih menahan sisanya
+            handler.release.set()
+
+    asyncio.run(run())
+    assert received == MockGemini.words
+    path, body = handler.requests[0]
+    assert 'alt=sse' in path and 'key=test-key' in path
+    assert body['contents'][0]['parts'][0]['text'] == "Halo"
+
+
+def test_messages_reuse_one_keep_alive_connection(server):
+    handler, url = server
+    client = GeminiClient('test-key', url)
+    for _ in range(3):
+        assert "".join(collect(client, build_payload([]))) == "Sisa budget Anda aman."
+    assert handler.connections == 1
+
+
+def test_api_error_is_reported_to_the_user(server):
+    handler, url = server
+    handler.status = 400
+    with pytest.raises(AssistantError, match=r"Error API \(400\): API key not valid"):
+        collect(GeminiClient('bad-key', url), build_payload([]))
+
+
+def test_history_window_is_token_budgeted():
+    history = []
+    for i in range(50):
+        history.append({'role': 'user', 'content': f"question {i} " + "x" * 200})
+        history.append({'role': 'assistant', 'content': f"answer {i} " + "y" * 200})
+    history.append({'role': 'user', 'content': "latest"})
+    window = history_window(history, token_budget=300, max_messages=20)
+    assert window[-1]['content'] == "latest"
+    assert window[0]['role'] == 'user'
+    assert sum(estimate_tokens(m['content']) for m in window) <= 300
+    assert len(history_window(history, token_budget=10_000, max_messages=20)) <= 20
+
+    long_question = [{'role': 'user', 'content': "z" * 10_000}]
+    assert estimate_tokens(history_window(long_question, token_budget=100)[0]['content']) <= 101
+
+
+def test_context_is_cached_until_the_ledger_changes(service):
+    context = ContextBuilder(service)
+    history = [{'role': 'user', 'content': "Halo"}, {'role': 'assistant', 'content': "Hai!"},
+               {'role': 'user', 'content': "Sisa budget?"}]
+
+    payload = context.build(history)
+    context.build(history)
+    assert context.rebuilds == 1
+    assert [c['role'] for c in payload['contents']] == ['user', 'model', 'user']
+    assert "Total pengeluaran: 0" in payload['systemInstruction']['parts'][0]['text']
+
+    service.add_transaction("Taxi", 50000, 'IDR', "Transportasi")
+    payload = context.build(history)
+    assert context.rebuilds == 2
+    prompt = payload['systemInstruction']['parts'][0]['text']
+    assert "Transportasi 50,000 (1x)" in prompt
+    assert "Rata-rata pengeluaran per hari (7 hari terakhir): 50,000" in prompt
+    assert "Mata uang transaksi: IDR 50,000 (1x)" in prompt
+
+
+def test_fingerprint_covers_the_earlier_conversation(service):
+    context = ContextBuilder(service)
+    question = {'role': 'user', 'content': "Kalau begitu, berapa per hari?"}
+    after_food = [{'role': 'user', 'content': "Budget makan?"}, {'role': 'assistant', 'content': "200rb"}, question]
+    after_hotel = [{'role': 'user', 'content': "Budget hotel?"}, {'role': 'assistant', 'content': "1jt"}, question]
+    assert context.fingerprint(after_food) != context.fingerprint(after_hotel)
+    assert context.fingerprint(after_food) == context.fingerprint(list(after_food))
+    assert context.fingerprint([question]) == context.system_prompt()
+    assert context.fingerprint([question, question]) == context.fingerprint([question])
+    assert len(context.build([question, question])['contents']) == 1
+
+
+def test_context_read_before_a_write_commits_is_rebuilt(service):
+    context = ContextBuilder(service)
+    with service.session():
+        service.add_transaction("Taxi", 50000, 'IDR', "Transportasi")
+        reader = threading.Thread(target=context.system_prompt)
+        reader.start()
+        reader.join()
+        assert "Total pengeluaran: 0" in context.system_prompt()
+    assert "Transportasi 50,000 (1x)" in context.system_prompt()
+
+
+def test_transcript_appends_and_stays_bounded():
+    transcript = ChatTranscript(max_chars=200)
+    transcript.append('user', "Halo")
+    assert transcript.append('assistant', "Hai!") == "🧑 Anda: Halo\n\n🤖 Assistant: Hai!"
+    assert transcript.with_partial('assistant', "Sed").endswith("\n\n🤖 Assistant: Sed")
+    for i in range(100):
+        transcript.append('user', f"pesan {i}")
+    assert len(transcript.text) <= 200
+    assert transcript.text.endswith("🧑 Anda: pesan 99")
+    assert transcript.text.startswith("🧑 Anda: pesan")
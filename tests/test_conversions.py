@@ -0,0 +1,142 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from pony.orm import db_session
+
+from chatbotcrud.conversions import ConversionLog
+from chatbotcrud.core import LedgerService
+from chatbotcrud.models import ConversionHistory, ConversionRollup
+from chatbotcrud.writer import LedgerWriter
+
+NOW = datetime(2025, 6, 30, 12, 0)
+
+
+def history_count():
+    with db_session:
+        return ConversionHistory.select().count()
+
+
+def test_record_is_buffered_until_flush(ledger):
+    log = ConversionLog(clock=lambda: NOW)
+    for i in range(5):
+        log.record('USD', 'IDR', 1.0 + i, 16000.0 * (1 + i))
+    assert history_count() == 0
+    assert log.pending() == 5
+
+    assert log.flush() == 5
+    assert log.flush() == 0
+    assert history_count() == 5
+    assert log.stats() == {'recorded': 5, 'written': 5, 'pending': 0, 'flushes': 1, 'compacted': 0}
+    with db_session:
+        row = ConversionHistory.select().order_by(ConversionHistory.amount).first()
+        assert (row.from_currency, row.to_currency, row.result, row.timestamp) == ('USD', 'IDR', 16000.0, NOW)
+
+
+def test_flusher_thread_writes_full_batches_and_stop_drains(ledger):
+    log = ConversionLog(flush_interval=60, batch_size=3)
+    log.start()
+    for _ in range(4):
+        log.record('JPY', 'IDR', 100.0, 10000.0)
+    log.stop()
+    assert history_count() == 4
+    assert log.pending() == 0
+
+
+def test_ledger_records_the_conversions_that_price_transactions(service):
+    log = ConversionLog()
+    rates = service.rates
+    service = LedgerService(rates, conversions=log)
+    transaction_id = service.add_transaction("Ramen", 1200, 'JPY', "Makanan & Minuman")
+    service.update_transaction(transaction_id, "Ramen", 1500, 'JPY', "Makanan & Minuman")
+    assert history_count() == 0
+
+    log.stop()
+    home = rates.home_currency()
+    with db_session:
+        rows = sorted((c.from_currency, c.to_currency, c.amount, c.result, c.transaction_id)
+                      for c in ConversionHistory.select())
+        amount_home = service.get_transaction(transaction_id).amount_home_currency
+    assert rows == [('JPY', home, 1200.0, rates.convert(1200, 'JPY'), transaction_id),
+                    ('JPY', home, 1500.0, amount_home, transaction_id)]
+
+
+def test_conversions_are_recorded_only_for_committed_writes(service):
+    log = ConversionLog()
+    service = LedgerService(service.rates, conversions=log)
+    with pytest.raises(RuntimeError), service.session():
+        service.add_transaction("Ramen", 1200, 'JPY', "Makanan & Minuman")
+        raise RuntimeError("rollback")
+    assert log.pending() == 0
+
+    # Batch gagal diulang per perintah: yang berhasil tetap tercatat sekali
+    writer = LedgerWriter(service, batch_window=0.05)
+    ids = []
+    for amount in (1000, -5, 2000):
+        writer.submit('add_transaction', "Snack", amount, 'JPY', "Makanan & Minuman",
+                      on_done=lambda result, error: ids.append(result))
+    writer.start()
+    writer.stop()
+    log.stop()
+    with db_session:
+        rows = sorted((c.amount, c.transaction_id) for c in ConversionHistory.select())
+    assert rows == [(1000.0, ids[0]), (2000.0, ids[2])]
+
+
+def test_compact_folds_expired_rows_into_daily_rollups(ledger):
+    log = ConversionLog(retention=timedelta(days=30), clock=lambda: NOW)
+    old = datetime(2025, 5, 1, 9, 0)
+    log.record('USD', 'IDR', 10.0, 160000.0, timestamp=old)
+    log.record('USD', 'IDR', 5.0, 82500.0, timestamp=old + timedelta(hours=3))
+    log.record('USD', 'IDR', 2.0, 33000.0, timestamp=NOW)
+    log.flush()
+
+    assert log.compact() == 2
+    assert history_count() == 1
+    with db_session:
+        rollup = ConversionRollup[date(2025, 5, 1), 'USD', 'IDR']
+        assert (rollup.amount, rollup.result, rollup.conversions) == (15.0, 242500.0, 2)
+        assert (rollup.min_rate, rollup.max_rate) == (16000.0, 16500.0)
+
+    # Compaction berikutnya untuk hari yang sama menambah ke ringkasan yang ada
+    log.record('USD', 'IDR', 1.0, 15500.0, timestamp=old + timedelta(hours=5))
+    log.flush()
+    assert log.compact() == 1
+    with db_session:
+        rollup = ConversionRollup[date(2025, 5, 1), 'USD', 'IDR']
+        assert (rollup.amount, rollup.conversions, rollup.min_rate, rollup.max_rate) == (16.0, 3, 15500.0, 16500.0)
+
+
+def test_compact_counts_zero_amount_conversions(ledger):
+    log = ConversionLog(retention=timedelta(days=30), clock=lambda: NOW)
+    old = datetime(2025, 5, 1, 9, 0)
+    log.record('USD', 'IDR', 0.0, 0.0, timestamp=old)
+    log.flush()
+    assert log.compact() == 1
+    with db_session:
+        rollup = ConversionRollup[date(2025, 5, 1), 'USD', 'IDR']
+        assert (rollup.conversions, rollup.min_rate, rollup.max_rate) == (1, 0.0, 0.0)
+
+    # Kurs pertama hari itu menggantikan 0.0; konversi 0 berikutnya tidak mengubahnya
+    log.record('USD', 'IDR', 10.0, 160000.0, timestamp=old)
+    log.flush()
+    log.compact()
+    log.record('USD', 'IDR', 0.0, 0.0, timestamp=old)
+    log.flush()
+    log.compact()
+    with db_session:
+        rollup = ConversionRollup[date(2025, 5, 1), 'USD', 'IDR']
+        assert (rollup.conversions, rollup.min_rate, rollup.max_rate) == (3, 16000.0, 16000.0)
+    assert history_count() == 0
+
+
+def test_flush_over_the_row_cap_compacts_the_oldest_rows(ledger):
+    log = ConversionLog(max_rows=5, clock=lambda: NOW)
+    for i in range(8):
+        log.record('EUR', 'IDR', 1.0, 17000.0, timestamp=NOW - timedelta(days=8 - i))
+    log.flush()
+
+    assert history_count() == 5
+    assert log.stats()['compacted'] == 3
+    with db_session:
+        assert sum(r.conversions for r in ConversionRollup.select()) == 3
+        assert min(c.timestamp for c in ConversionHistory.select()) == NOW - timedelta(days=5)
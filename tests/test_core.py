@@ -0,0 +1,157 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from pony.orm import db_session
+
+from chatbotcrud import cli, export, importer
+from chatbotcrud.aggregates import verify_rollup
+from chatbotcrud.core import LedgerService
+from chatbotcrud.diagnostics import statement_listener
+from chatbotcrud.models import Transaction, db
+
+
+def test_add_update_delete_keep_rollup(service):
+    first = service.add_transaction("Taxi", 10, 'USD', "Transportasi")
+    second = service.add_transaction("Ramen", 1500, 'JPY', "Makanan & Minuman")
+    assert service.update_transaction(second, "Sushi", 3000, 'JPY', "Makanan & Minuman")
+    assert service.delete_transaction(first)
+    assert not service.delete_transaction(first)
+    assert service.version == 4
+
+    summary = service.summary()
+    assert summary['total_spent'] == 300000
+    assert summary['remaining'] == 700000
+    assert summary['categories'] == [("Makanan & Minuman", 300000, 1)]
+    assert [row[1] for row in service.recent()] == ["Sushi"]
+    assert verify_rollup() == []
+
+
+def test_connection_pragmas(ledger):
+    with db_session:
+        connection = db.get_connection()
+        assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert connection.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+
+def test_action_in_one_session_commits_once(service):
+    statements = []
+    with statement_listener(statements.append), db_session:
+        transaction_id = service.add_transaction("Taxi", 10, 'USD', "Transportasi")
+        summary = service.summary()
+        recent = service.recent()
+    assert transaction_id == recent[0][0]
+    assert summary['total_spent'] == 100000
+    assert [sql for sql in statements if sql.startswith(('BEGIN', 'COMMIT'))] == [
+        'BEGIN IMMEDIATE TRANSACTION', 'COMMIT']
+
+
+def test_version_moves_only_after_the_session_commits(service):
+    with service.session():
+        service.add_transaction("Taxi", 10, 'USD', "Transportasi")
+        service.add_transaction("Bus", 2, 'USD', "Transportasi")
+        assert service.version == 0
+    assert service.version == 2
+
+    with pytest.raises(RuntimeError), service.session():
+        service.add_transaction("Ferry", 30, 'USD', "Transportasi")
+        raise RuntimeError("rollback")
+    assert service.version == 2
+    assert [row[1] for row in service.recent()] == ["Bus", "Taxi"]
+
+
+def test_reads_do_not_open_write_transactions(service):
+    service.add_transaction("Taxi", 10, 'USD', "Transportasi")
+    statements = []
+    with statement_listener(statements.append), db_session:
+        service.summary()
+        service.recent()
+    assert not [sql for sql in statements if sql.startswith('BEGIN')]
+
+
+def test_dashboard_build_reads_settings_at_most_once(service):
+    service.add_transaction("Taxi", 10, 'USD', "Transportasi")
+    fresh = LedgerService(service.rates)
+    settings_reads = []
+
+    def dashboard_build():
+        settings_reads.clear()
+        with statement_listener(lambda sql: settings_reads.append(sql) if '"UserSettings"' in sql else None), \
+                db_session:
+            summary = fresh.summary()
+            fresh.recent()
+            fresh.rates.convert(5, 'JPY')
+            fresh.settings()
+        return summary
+
+    assert dashboard_build()['travel_budget'] == 1000000
+    assert len(settings_reads) == 1
+    dashboard_build()
+    assert settings_reads == []
+
+    fresh.save_settings('IDR', 2000000.0)
+    assert dashboard_build()['remaining'] == 2000000 - 100000
+    assert len(settings_reads) == 1
+
+
+def test_settings_snapshot_is_immutable(service):
+    settings = service.settings()
+    assert settings == ('IDR', 1000000.0)
+    with pytest.raises(AttributeError):
+        settings.travel_budget = 0
+
+
+@pytest.mark.parametrize('args,message', [
+    (("", 10, 'USD', "Transportasi"), "Description"),
+    (("Taxi", 0, 'USD', "Transportasi"), "positive"),
+    (("Taxi", 10, 'XXX', "Transportasi"), "currency"),
+    (("Taxi", 10, 'USD', "Unknown"), "category"),
+])
+def test_invalid_transactions_are_rejected(service, args, message):
+    with pytest.raises(ValueError, match=message):
+        service.add_transaction(*args)
+    with db_session:
+        assert not Transaction.select().exists()
+
+
+def test_new_home_currency_reprices(service):
+    service.add_transaction("Taxi", 10, 'USD', "Transportasi")
+    try:
+        assert service.save_settings('USD', 100.0)
+        assert service.summary()['total_spent'] == pytest.approx(10)
+        assert not service.save_settings('USD', 200.0)
+    finally:
+        service.save_settings('IDR', 0.0)
+
+
+def test_cli_commands(service, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr('chatbotcrud.core.open_ledger', lambda db_path: service)
+    assert cli.main(['add', 'Taxi', '10', 'usd', 'Transportasi', '--date', '2025-05-26T10:00']) == 0
+    assert cli.main(['list']) == 0
+    assert "Taxi" in capsys.readouterr().out
+    assert cli.main(['summary']) == 0
+    assert "100,000 IDR" in capsys.readouterr().out
+    out = tmp_path / "ledger.jsonl"
+    assert cli.main(['export', 'transactions', str(out)]) == 0
+    assert out.read_text().count("\n") == 1
+    assert cli.main(['add', 'Taxi', '-5', 'USD', 'Transportasi']) == 1
+
+
+def test_module_mains_delegate_to_cli(service, tmp_path, capsys, monkeypatch):
+    opened = []
+    monkeypatch.setattr('chatbotcrud.core.open_ledger', lambda db_path: opened.append(db_path) or service)
+    statement = tmp_path / "statement.csv"
+    statement.write_text("Date,Description,Amount,Currency\n2025-05-26,Taxi,10,USD\n2025-05-27,Bus,2,USD\n")
+    assert importer.main(['ledger.sqlite', str(statement), '--chunk-size', '1']) == 0
+    assert "Imported 2 transactions" in capsys.readouterr().out
+    out = tmp_path / "ledger.csv"
+    assert export.main(['ledger.sqlite', 'transactions', str(out), '--chunk-size', '1']) == 0
+    assert out.read_text().count("\n") == 3
+    assert opened == ['ledger.sqlite', 'ledger.sqlite']
+
+
+def test_headless_paths_do_not_import_toga():
+    code = ("import sys, chatbotcrud.cli, chatbotcrud.core; "
+            "sys.exit('toga' in sys.modules)")
+    assert subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parents[1] / 'src').returncode == 0
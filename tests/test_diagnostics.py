@@ -0,0 +1,66 @@
+import io
+import json
+
+from pony.orm import db_session
+
+from chatbotcrud.core import LedgerService, RatesService
+from chatbotcrud.diagnostics import (
+    Metrics, Profiler, configure_logging, executemany, format_snapshot, log_event, metrics, statement_listener,
+)
+from chatbotcrud.models import db
+
+
+def test_scope_counts_queries_on_this_thread(ledger):
+    service = LedgerService(RatesService())
+    local = Metrics()
+    with local.scope('dashboard'):
+        service.summary()
+    timings = local.snapshot()['timings']
+    assert timings['dashboard']['count'] == 1
+    # Pengaturan + total per kategori + total hari ini
+    assert timings['dashboard.queries']['last'] == 3
+    assert metrics.snapshot()['timings']['ledger.summary.queries']['last'] == 3
+
+
+def test_writes_count_transactions(ledger):
+    service = LedgerService(RatesService())
+    before = metrics.snapshot()['counters'].get('db.transactions', 0)
+    service.add_transaction("Taxi", 10, 'IDR', "Transportasi")
+    assert metrics.snapshot()['counters']['db.transactions'] == before + 1
+
+
+def test_log_events_are_json_lines():
+    stream = io.StringIO()
+    configure_logging(stream)
+    log_event('rates.fetch', outcome='updated', latency=0.25)
+    entry = json.loads(stream.getvalue())
+    assert entry['event'] == 'rates.fetch' and entry['level'] == 'info'
+    assert entry['outcome'] == 'updated' and entry['latency'] == 0.25
+
+
+def test_profiler_capture(tmp_path):
+    profiler = Profiler(output_dir=str(tmp_path))
+    profiler.start()
+    sorted(str(i) for i in range(10000))
+    report = profiler.stop()
+    assert not profiler.active
+    assert "function calls" in report and "KiB peak" in report
+    assert profiler.last_path and (tmp_path / profiler.last_path.split('/')[-1]).exists()
+
+
+def test_format_snapshot():
+    local = Metrics()
+    local.count('db.statements', 3)
+    local.record('screen.dashboard', 0.004)
+    local.record('screen.dashboard.queries', 5)
+    text = format_snapshot(local.snapshot())
+    assert "db.statements" in text and "4.00ms" in text and "screen.dashboard.queries" in text
+
+
+def test_executemany_is_traced_once(ledger):
+    statements = []
+    with db_session, statement_listener(statements.append):
+        executemany(db.get_connection(), 'INSERT INTO "ConversionHistory" ("from_currency", "to_currency",'
+                    ' "amount", "result", "timestamp") VALUES (\'USD\', \'IDR\', ?, ?, \'2025-05-26 12:00:00\')',
+                    [(i, i * 16000.0) for i in range(100)])
+    assert len([sql for sql in statements if sql.startswith('INSERT')]) == 1
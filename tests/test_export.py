@@ -0,0 +1,97 @@
+import csv
+import json
+import threading
+from datetime import datetime
+
+import pytest
+from pony.orm import db_session
+
+from chatbotcrud.export import export_chunks, export_table, read_columnar
+from chatbotcrud.models import ConversionHistory, Transaction
+
+
+@pytest.fixture
+def transactions(ledger):
+    with db_session:
+        for i, (description, currency) in enumerate([("Kopi ☕", 'IDR'), ("Taxi", 'USD'),
+                                                      ("Sushi", 'JPY'), ("Hotel", 'USD'), ("Peta", 'IDR')]):
+            Transaction(description=description, amount=10.5 * (i + 1), currency=currency,
+                        amount_home_currency=1000.0 * (i + 1), category="Lainnya",
+                        timestamp=datetime(2025, 5, 20 + i, 9, 30))
+    with db_session:
+        return [(t.id, t.description, t.amount, t.currency, t.amount_home_currency, t.category,
+                 f"{t.timestamp:%Y-%m-%d %H:%M:%S.%f}") for t in Transaction.select().order_by(Transaction.id)]
+
+
+def test_chunks_are_bounded(transactions):
+    assert [len(chunk) for chunk in export_chunks('transactions', chunk_size=2)] == [2, 2, 1]
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl', 'columnar'])
+def test_round_trip(transactions, tmp_path, fmt):
+    path = tmp_path / f"ledger.{fmt}"
+    result = export_table('transactions', str(path), fmt=fmt, chunk_size=2)
+    assert result['rows'] == 5
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))[1:]
+        assert rows == [[str(value) for value in row] for row in transactions]
+    elif fmt == 'jsonl':
+        rows = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+        assert [tuple(row.values()) for row in rows] == transactions
+    else:
+        assert list(read_columnar(str(path))) == transactions
+
+
+def test_export_does_not_block_writers(transactions, service):
+    chunks = export_chunks('transactions', chunk_size=2)
+    exported = next(chunks)
+    errors = []
+
+    def write():
+        try:
+            service.add_transaction("Taxi", 10, 'USD', "Transportasi")
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    writer.join(timeout=5)
+    blocked = writer.is_alive()
+    if blocked:
+        chunks.close()
+        writer.join()
+    assert not blocked and errors == []
+    # Export tetap membaca snapshot saat dimulai
+    for chunk in chunks:
+        exported += chunk
+    assert exported == transactions
+    with db_session:
+        assert Transaction.select().count() == 6
+
+
+def test_empty_conversion_history(ledger, tmp_path):
+    path = tmp_path / "conversions.tmmcol"
+    assert export_table('conversions', str(path))['rows'] == 0
+    assert list(read_columnar(str(path))) == []
+    with db_session:
+        ConversionHistory(from_currency='USD', to_currency='IDR', amount=1.0, result=16000.0)
+        ConversionHistory(from_currency='JPY', to_currency='IDR', amount=100.0, result=10000.0, transaction_id=7)
+    export_table('conversions', str(path))
+    assert [row[1:5] + row[6:] for row in read_columnar(str(path))] == [
+        ('USD', 'IDR', 1.0, 16000.0, None), ('JPY', 'IDR', 100.0, 10000.0, 7)]
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+def test_conversions_export_keeps_the_transaction_link(ledger, tmp_path, fmt):
+    path = tmp_path / f"conversions.{fmt}"
+    with db_session:
+        ConversionHistory(from_currency='USD', to_currency='IDR', amount=1.0, result=16000.0)
+        ConversionHistory(from_currency='JPY', to_currency='IDR', amount=100.0, result=10000.0, transaction_id=7)
+    export_table('conversions', str(path))
+    lines = path.read_text(encoding='utf-8').splitlines()
+    if fmt == 'csv':
+        assert lines[0].endswith(',transaction_id')
+        assert [line.rsplit(',', 1)[1] for line in lines[1:]] == ['', '7']
+    else:
+        assert [json.loads(line)['transaction_id'] for line in lines] == [None, 7]
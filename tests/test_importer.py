@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+
+import pytest
+from pony.orm import db_session, select
+
+from chatbotcrud import importer
+from chatbotcrud.aggregates import verify_rollup
+from chatbotcrud.importer import import_statement, map_category, map_row, read_ofx_rows
+from chatbotcrud.models import Transaction
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<CURDEF>USD
+<BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250526101500.000[-5:EST]
+<TRNAMT>-12.50
+<NAME>STARBUCKS 1234
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20250527
+<TRNAMT>100.00
+<NAME>PAYMENT THANK YOU
+</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250528<TRNAMT>-3000<NAME>Ramen shop<CURRENCY><CURSYM>JPY<CURRATE>1</CURRENCY></STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+@pytest.fixture
+def rates(service):
+    return service.rates.cache
+
+
+def write_csv(path, count):
+    lines = ["Date,Description,Amount,Currency"]
+    lines += [f"2025-05-{1 + i % 28:02d},Grab ride {i},{i + 1},USD" for i in range(count)]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_csv_import_converts_and_maps(rates, tmp_path):
+    statement = tmp_path / "statement.csv"
+    statement.write_text(
+        "Date,Description,Amount,Currency,Category\n"
+        "2025-05-26 10:00:00,Hotel Indonesia,100,USD,\n"
+        "26/05/2025,Lunch,1500,JPY,Makanan & Minuman\n"
+        "2025-05-27,Refund,-20,USD,\n"
+        "2025-05-27,Mystery,5,XXX,\n"
+    )
+    result = import_statement(str(statement), rates)
+    assert (result['imported'], result['skipped']) == (2, 2)
+    assert [line for line, _ in result['errors']] == [4, 5]
+    with db_session:
+        rows = select((t.description, t.amount_home_currency, t.category, t.timestamp)
+                      for t in Transaction).order_by(1)[:]
+    assert rows == [
+        ("Hotel Indonesia", 1000000, "Akomodasi", datetime(2025, 5, 26, 10)),
+        ("Lunch", 150000, "Makanan & Minuman", datetime(2025, 5, 26)),
+    ]
+    assert verify_rollup() == []
+
+
+def test_offset_timestamps_are_stored_as_local_time(service, rates, tmp_path):
+    statement = tmp_path / "statement.csv"
+    statement.write_text("Date,Description,Amount,Currency\n2025-05-26T10:00:00+07:00,Bus Damri,5,USD\n")
+    assert import_statement(str(statement), rates)['imported'] == 1
+    local = datetime(2025, 5, 26, 3, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    with db_session:
+        transaction_id = Transaction.select().first().id
+    # Terbaca kembali sebagai datetime (bukan str), jadi update dan delete bisa memakai .date()
+    assert service.transaction_row(transaction_id)[6] == local
+    assert service.update_transaction(transaction_id, "Bus Damri", 6, 'USD', "Transportasi")
+    service.delete_transaction(transaction_id)
+    assert verify_rollup() == []
+
+
+def test_ofx_reader_flips_debits_and_defaults_currency(tmp_path):
+    statement = tmp_path / "card.ofx"
+    statement.write_text(OFX)
+    rows = [fields for _, fields in read_ofx_rows(str(statement))]
+    assert rows[0] == {'timestamp': '20250526101500.000[-5:EST]', 'amount': '12.50',
+                       'description': 'STARBUCKS 1234', 'currency': 'USD'}
+    assert rows[1]['amount'] == '-100.00'
+    assert rows[2]['currency'] == 'JPY' and rows[2]['amount'] == '3000'
+
+
+def test_category_keywords_match_whole_words():
+    assert map_category(None, "STARBUCKS 1234") == "Makanan & Minuman"
+    assert map_category(None, "Dinner at home") == "Lainnya"
+    assert map_category("transportasi", "anything") == "Transportasi"
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("10.000", 10000.0),       # ribuan IDR
+    ("1.250.000", 1250000.0),
+    ("12,50", 12.5),           # desimal Eropa
+    ("1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("1 234,56", 1234.56),
+    ("12.50", 12.5),
+])
+def test_amounts_in_local_formats(text, expected):
+    fields = {'description': "Makan", 'amount': text, 'timestamp': "2025-05-26"}
+    assert map_row(fields, 'IDR')[1] == expected
+
+
+def test_csv_import_reads_thousands_and_decimal_commas(rates, tmp_path):
+    path = tmp_path / "mutasi.csv"
+    path.write_text('Tanggal,Keterangan,Jumlah,Currency\n'
+                    '2025-05-26,Nasi goreng,"10.000",IDR\n'
+                    '2025-05-26,Museum ticket,"12,50",USD\n')
+    assert import_statement(str(path), rates)['imported'] == 2
+    with db_session:
+        assert sorted(select((t.description, t.amount) for t in Transaction)) == [
+            ("Museum ticket", 12.5), ("Nasi goreng", 10000.0)]
+
+
+def test_resume_after_failure(rates, tmp_path, monkeypatch):
+    statement = write_csv(tmp_path / "big.csv", 25)
+    write_chunk = importer._write_chunk
+    calls = []
+
+    def failing(rows, *args):
+        calls.append(len(rows))
+        if len(calls) == 3:
+            raise OSError("disk full")
+        write_chunk(rows, *args)
+
+    monkeypatch.setattr(importer, '_write_chunk', failing)
+    with pytest.raises(OSError):
+        import_statement(statement, rates, chunk_size=10)
+    monkeypatch.setattr(importer, '_write_chunk', write_chunk)
+
+    result = import_statement(statement, rates, chunk_size=10)
+    assert result['resumed_from'] == 20 and result['imported'] == 5
+    # Sudah selesai: menjalankan ulang tidak menggandakan baris
+    assert import_statement(statement, rates)['imported'] == 0
+    with db_session:
+        assert Transaction.select().count() == 25
+    assert verify_rollup() == []
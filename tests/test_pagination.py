@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from pony.orm import db_session
+
+from chatbotcrud.models import Transaction
+from chatbotcrud.pagination import TransactionPager, transactions_page
+
+
+def fill(n, same_timestamp_every=3):
+    start = datetime(2025, 5, 1, 8, 0)
+    with db_session:
+        for i in range(n):
+            # Beberapa transaksi berbagi timestamp yang sama: urutan ditentukan oleh id
+            Transaction(description=f"t{i}", amount=1.0, currency="IDR", amount_home_currency=1.0,
+                        category="Lainnya", timestamp=start + timedelta(minutes=i // same_timestamp_every))
+    return [f"t{i}" for i in reversed(range(n))]
+
+
+def descriptions(rows):
+    return [row[1] for row in rows]
+
+
+def test_keyset_pages_cover_history_without_gaps(ledger):
+    expected = fill(23)
+    seen, before = [], None
+    while True:
+        rows, keys = transactions_page(10, before=before)
+        if not rows:
+            break
+        seen += descriptions(rows)
+        before = keys[-1]
+    assert seen == expected
+
+    _, first_keys = transactions_page(10)
+    newer, _ = transactions_page(5, after=first_keys[-1])
+    assert descriptions(newer) == expected[4:9]
+
+
+def test_pager_walks_back_and_forth_with_bounded_cache(ledger):
+    expected = fill(47)
+    pager = TransactionPager(page_size=10, max_cached_pages=3)
+    assert descriptions(pager.current()) == expected[:10]
+    assert not pager.has_newer() and pager.has_older()
+
+    pages = [descriptions(pager.current())]
+    while pager.has_older():
+        pages.append(descriptions(pager.older()))
+        assert len(pager._pages) <= 3
+    assert sum(pages, []) == expected
+    assert pager.page_number == 4
+    assert descriptions(pager.older()) == expected[40:]
+
+    for number in reversed(range(4)):
+        assert descriptions(pager.newer()) == expected[number * 10:(number + 1) * 10]
+    assert pager.page_number == 0 and not pager.has_newer()
+
+
+def test_pager_prefetches_and_reset_reloads(ledger):
+    expected = fill(25)
+    pager = TransactionPager(page_size=10)
+    pager.current()
+    assert pager.queries == 2  # halaman pertama + prefetch halaman berikutnya
+    pager.older()
+    assert pager.queries == 3
+
+    with db_session:
+        Transaction(description="new", amount=1.0, currency="IDR", amount_home_currency=1.0,
+                    category="Lainnya", timestamp=datetime(2026, 1, 1))
+    pager.reset()
+    assert descriptions(pager.current()) == ["new"] + expected[:9]
@@ -0,0 +1,72 @@
+import pytest
+from pony.orm import db_session
+
+from chatbotcrud.diagnostics import statement_listener
+from chatbotcrud.models import ExchangeRate, UserSettings
+from chatbotcrud.preview import ConversionPreview, format_amount, parse_amount
+from chatbotcrud.rates import RateCache
+
+
+def loaded_cache(**rates):
+    with db_session:
+        for code, rate in rates.items():
+            ExchangeRate(currency_code=code, rate=rate)
+        UserSettings.select().first().home_currency = 'IDR'
+    cache = RateCache()
+    cache.load()
+    return cache
+
+
+def test_preview_text_and_memo(ledger):
+    preview = ConversionPreview(loaded_cache(USD=0.0001))
+    assert preview.text("10", 'USD') == "≈ 100,000 IDR"
+    assert preview.text("10", 'USD') == "≈ 100,000 IDR"
+    assert preview.text("1.500", 'IDR') == ""
+    assert preview.text("", 'USD') == ""
+    assert preview.text("12a", 'USD') == ""
+    stats = preview.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2
+
+
+def test_preview_follows_rate_reload(ledger):
+    cache = loaded_cache(USD=0.0001)
+    preview = ConversionPreview(cache)
+    assert preview.text("10", 'USD') == "≈ 100,000 IDR"
+    with db_session:
+        ExchangeRate['USD'].rate = 0.0002
+    cache.load()
+    assert preview.text("10", 'USD') == "≈ 50,000 IDR"
+
+
+def test_keystrokes_never_query(ledger):
+    cache = loaded_cache(USD=0.0001, JPY=0.01)
+    preview = ConversionPreview(cache)
+    statements = []
+    with statement_listener(statements.append):
+        typed = ""
+        for key in "1500000":
+            typed += key
+            preview.text(typed, 'JPY')
+        # Tabel kurs belum dimuat ulang: preview kosong, bukan query
+        cache.invalidate()
+        assert preview.text("15", 'USD') == ""
+    assert statements == []
+    assert cache.misses == 0
+
+
+@pytest.mark.parametrize('text,expected', [
+    ("1500", 1500), ("1.500", 1500), ("10,000", 10000), ("1.500.000", 1500000),
+    ("12.5", 12.5), ("12,50", 12.5), ("1.234,56", 1234.56), ("1,234.5678", 1234.5678),
+])
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+def test_edit_form_round_trip_keeps_the_amount(service):
+    for amount in (12.5, 0.1 + 0.2, 1234.567, 1500.0, 0.00001, 99999.99):
+        assert parse_amount(format_amount(amount)) == amount
+    transaction_id = service.add_transaction("Museum", 12.5, 'USD', "Tiket Masuk")
+    stored = service.get_transaction(transaction_id)
+    service.update_transaction(transaction_id, stored.description, parse_amount(format_amount(stored.amount)),
+                               stored.currency, stored.category)
+    assert service.get_transaction(transaction_id).amount == 12.5
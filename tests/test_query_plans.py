@@ -0,0 +1,69 @@
+"""EXPLAIN QUERY PLAN checks for the queries behind the dashboard."""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from pony.orm import db_session, select, sum
+
+from chatbotcrud.aggregates import dashboard_aggregates, today_start
+from chatbotcrud.diagnostics import statement_listener
+from chatbotcrud.models import db, migrate, MIGRATIONS, Transaction
+from chatbotcrud.pagination import transactions_page
+
+# The rollups hold one row per (day, category[, currency]); aggregating over
+# all of them is a scan by design and stays small regardless of ledger size.
+BOUNDED_TABLES = {'SpendingRollup', 'CurrencyRollup'}
+
+
+def traced_selects(func, *args):
+    """Run func inside one db_session and return the SELECTs it sent to SQLite."""
+    statements = []
+    with db_session, statement_listener(statements.append):
+        func(*args)
+    return [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+
+
+def query_plan(sql):
+    with db_session:
+        return [row[-1] for row in db.get_connection().execute('EXPLAIN QUERY PLAN ' + sql)]
+
+
+def assert_indexed(sql):
+    # Pony aliases every table ("Transaction" "t-1"); the plan reports the alias
+    aliases = {alias: table for table, alias in re.findall(r'"(\w+)" "([^"]+)"', sql)}
+    for step in query_plan(sql):
+        assert 'USE TEMP B-TREE FOR ORDER BY' not in step, (step, sql)
+        if step.startswith('SCAN ') and aliases.get(step.split()[1]) not in BOUNDED_TABLES:
+            assert 'USING INDEX' in step or 'USING COVERING INDEX' in step, (step, sql)
+
+
+def today_filter():
+    start = today_start()
+    return sum(t.amount_home_currency for t in Transaction if t.timestamp >= start)
+
+
+def category_window():
+    start = datetime.now() - timedelta(days=7)
+    return select(t for t in Transaction if t.category == "Belanja" and t.timestamp >= start)[:]
+
+
+@pytest.mark.parametrize('func,args', [
+    (dashboard_aggregates, ()),
+    (transactions_page, (10,)),
+    (transactions_page, (10, ('2025-05-26 10:00:00', 42))),
+    (transactions_page, (10, None, ('2025-05-26 10:00:00', 42))),
+    (today_filter, ()),
+    (category_window, ()),
+])
+def test_dashboard_queries_use_indexes(ledger, func, args):
+    statements = traced_selects(func, *args)
+    assert statements
+    for sql in statements:
+        assert_indexed(sql)
+
+
+def test_migrations_are_recorded(ledger):
+    assert migrate() == len(MIGRATIONS)
+    with db_session:
+        indexes = set(db.select("name FROM sqlite_master WHERE type = 'index'"))
+    assert {'idx_transaction__timestamp', 'idx_transaction__category_timestamp'} <= indexes
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from pony.orm import db_session
+
+from chatbotcrud.models import ExchangeRate
+from chatbotcrud.rates import RateCache, RateRefresher
+
+
+class FakeExchangeRateApi(BaseHTTPRequestHandler):
+    """Local stand-in for GET /v6/<key>/latest/IDR."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get('If-None-Match'))
+        time.sleep(server.delay)
+        if server.status != 200:
+            self.send_response(server.status)
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps({'result': 'success', 'conversion_rates': server.rates}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeExchangeRateApi)
+    server.requests = []
+    server.delay = 0.0
+    server.status = 200
+    server.etag = '"v1"'
+    server.rates = {'IDR': 1, 'USD': 0.0001, 'JPY': 0.01}
+    server.url = f"http://127.0.0.1:{server.server_port}/v6/test/latest/IDR"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fetches_when_empty_then_respects_ttl(ledger, api):
+    cache = RateCache()
+    refresher = RateRefresher(api.url, rate_cache=cache, ttl=timedelta(hours=1))
+    assert refresher.refresh() is True
+    assert cache.get_rate('USD') == 0.0001
+
+    assert refresher.refresh() is False
+    assert len(api.requests) == 1
+
+    with db_session:
+        for rate in ExchangeRate.select():
+            rate.last_updated = datetime.now() - timedelta(hours=2)
+    assert refresher.is_stale()
+    assert refresher.refresh() is True
+    # Permintaan kedua membawa ETag, server menjawab 304
+    assert api.requests == [None, '"v1"']
+    assert refresher.fetches[-1][2] == 'not-modified'
+    assert not refresher.is_stale()
+
+
+def test_concurrent_refreshes_share_one_fetch(ledger, api):
+    api.delay = 0.3
+    refresher = RateRefresher(api.url)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(refresher.refresh()))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 5
+    assert len(api.requests) == 1
+    assert refresher.stats()['last_latency'] >= 0.3
+
+
+def test_failures_back_off_exponentially(ledger, api):
+    api.status = 500
+    clock = FakeClock()
+    refresher = RateRefresher(api.url, clock=clock, backoff_base=10, backoff_max=35)
+
+    assert refresher.refresh() is False
+    assert refresher.retry_at == clock.now + 10
+    assert refresher.refresh() is False  # masih dalam backoff, tidak ada request
+    assert len(api.requests) == 1
+
+    clock.now += 10
+    refresher.refresh()
+    assert refresher.retry_at == clock.now + 20
+    clock.now += 20
+    refresher.refresh()
+    assert refresher.retry_at == clock.now + 35
+    assert refresher.failures == 3
+
+    api.status = 200
+    clock.now += 35
+    assert refresher.refresh() is True
+    assert refresher.failures == 0 and not refresher.in_backoff()
+    assert [outcome for _, _, outcome in refresher.fetches] == ['error'] * 3 + ['updated']
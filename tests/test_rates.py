@@ -0,0 +1,132 @@
+from datetime import date, datetime
+
+from pony.orm import db_session
+
+from chatbotcrud.aggregates import dashboard_aggregates, record_transaction, verify_rollup
+from chatbotcrud.models import ExchangeRate, RateHistory, Transaction, UserSettings
+from chatbotcrud.rates import (
+    RateCache, RateHistoryIndex, record_rate_history, reprice_ledger, store_rates,
+)
+
+
+def set_rates(home_currency='IDR', **rates):
+    with db_session:
+        for code, rate in rates.items():
+            ExchangeRate(currency_code=code, rate=rate)
+        UserSettings.select().first().home_currency = home_currency
+
+
+def test_conversions_to_idr_home(ledger):
+    set_rates(USD=0.0001, JPY=0.01)
+    cache = RateCache()
+    assert cache.convert(10, 'USD') == 100000
+    assert cache.convert(1500, 'JPY') == 150000
+    assert cache.convert(5000, 'IDR') == 5000
+    # Kurs tidak dikenal: jumlah tidak dikonversi
+    assert cache.convert(7, 'EUR') == 7
+
+
+def test_conversions_to_foreign_home(ledger):
+    set_rates(home_currency='USD', USD=0.0001, JPY=0.01)
+    try:
+        cache = RateCache()
+        assert cache.convert(100000, 'IDR') == 10
+        assert cache.convert(1500, 'JPY') == 15
+        assert cache.convert(10, 'USD') == 10
+        assert cache.get_rate('JPY') == 0.01
+        assert cache.get_rate('IDR') == 1.0
+    finally:
+        set_rates()
+
+
+def test_served_from_memory_until_invalidated(ledger):
+    set_rates(USD=0.0001)
+    cache = RateCache()
+    cache.convert(1, 'USD')
+    assert cache.stats() == {'hits': 0, 'misses': 1, 'currencies': 1}
+
+    with db_session:
+        ExchangeRate['USD'].rate = 0.0002
+    for _ in range(5):
+        assert cache.convert(1, 'USD') == 10000
+    assert cache.hits == 5 and cache.misses == 1
+
+    cache.invalidate()
+    assert cache.convert(1, 'USD') == 5000
+    assert cache.misses == 2
+    assert cache.last_updated('USD') is not None
+
+
+def test_convert_many_matches_scalar(ledger):
+    set_rates(USD=0.0001, JPY=0.01)
+    cache = RateCache()
+    amounts = [10, 1500, 5000, 7]
+    currencies = ['USD', 'JPY', 'IDR', 'EUR']
+    assert cache.convert_many(amounts, currencies) == [
+        cache.convert(amount, code) for amount, code in zip(amounts, currencies)
+    ]
+
+
+def test_reprice_ledger_after_home_currency_change(ledger):
+    set_rates(USD=0.0001, JPY=0.01)
+    now = datetime.now()
+    with db_session:
+        for amount, currency in [(10, 'USD'), (1500, 'JPY'), (50000, 'IDR')]:
+            record_transaction(Transaction(
+                description="x", amount=amount, currency=currency,
+                amount_home_currency=amount, category="Belanja", timestamp=now))
+
+    set_rates(home_currency='USD')
+    try:
+        assert reprice_ledger(RateCache()) == 3
+        with db_session:
+            repriced = sorted(t.amount_home_currency for t in Transaction.select())
+        assert [round(value, 6) for value in repriced] == [5, 10, 15]
+        assert round(dashboard_aggregates()['total_spent'], 6) == 30
+        assert verify_rollup() == []
+    finally:
+        set_rates()
+
+
+def test_store_rates_keeps_one_history_row_per_day(ledger):
+    store_rates({'USD': 0.0001, 'JPY': 0.01, 'XYZ': 5})
+    store_rates({'USD': 0.00011})
+    with db_session:
+        history = sorted((h.currency_code, h.rate) for h in RateHistory.select())
+        assert ExchangeRate['USD'].rate == 0.00011
+    assert history == [('JPY', 0.01), ('USD', 0.00011)]
+
+
+def test_rate_as_of_uses_latest_rate_on_or_before_day(ledger):
+    with db_session:
+        record_rate_history({'USD': 0.0001}, date(2025, 1, 1))
+        record_rate_history({'USD': 0.0002}, date(2025, 2, 1))
+        record_rate_history({'USD': 0.0004}, date(2025, 3, 1))
+    history = RateHistoryIndex()
+    assert history.rate_as_of('USD', date(2024, 12, 1)) == 0.0001
+    assert history.rate_as_of('USD', datetime(2025, 2, 1, 23, 59)) == 0.0002
+    assert history.rate_as_of('USD', '2025-02-28 10:00:00') == 0.0002
+    assert history.rate_as_of('USD', date(2025, 6, 1)) == 0.0004
+    assert history.rate_as_of('IDR', date(2025, 6, 1)) == 1.0
+    assert history.rate_as_of('JPY', date(2025, 6, 1)) is None
+    assert history.convert_many([1, 1, 10], ['USD', 'USD', 'IDR'],
+                                ['2025-01-15', '2025-03-02', '2025-03-02'], 'IDR') == [10000, 2500, 10]
+
+
+def test_reprice_ledger_with_history_prices_each_day(ledger):
+    with db_session:
+        record_rate_history({'USD': 0.0001, 'JPY': 0.01}, date(2025, 1, 1))
+        record_rate_history({'USD': 0.0002, 'JPY': 0.01}, date(2025, 2, 1))
+        for day in (datetime(2025, 1, 10), datetime(2025, 2, 10)):
+            record_transaction(Transaction(
+                description="x", amount=1000, currency='JPY',
+                amount_home_currency=100000, category="Belanja", timestamp=day))
+
+    set_rates(home_currency='USD')
+    try:
+        reprice_ledger(RateCache(), history=RateHistoryIndex())
+        with db_session:
+            repriced = [t.amount_home_currency for t in Transaction.select().order_by(Transaction.timestamp)]
+        assert [round(value, 6) for value in repriced] == [10, 20]
+    finally:
+        set_rates()
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from chatbotcrud.responses import (RequestCoalescer, ResponseCache, local_answer, normalize_question,
+                                   response_key)
+
+SUMMARY = {'home_currency': 'IDR', 'total_spent': 750000.0, 'today_spent': 120000.0,
+           'travel_budget': 1000000.0, 'remaining': 250000.0, 'categories': []}
+
+
+def test_normalized_questions_share_a_key():
+    assert normalize_question("  Tips  hemat, untuk MAKAN?! ") == "tips hemat untuk makan"
+    assert response_key("Tips hemat makan?", "f1") == response_key("tips hemat makan", "f1")
+    assert response_key("Tips hemat makan?", "f1") != response_key("Tips hemat makan?", "f2")
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Berapa sisa budget saya?", "Sisa budget Anda: 250,000 IDR dari 1,000,000 IDR."),
+    ("how much left today?", "Pengeluaran hari ini: 120,000 IDR."),
+    ("Pengeluaran hari ini berapa?", "Pengeluaran hari ini: 120,000 IDR."),
+    ("What is my total spending?", "Total pengeluaran perjalanan: 750,000 IDR."),
+])
+def test_numeric_questions_are_answered_locally(question, expected):
+    assert expected in local_answer(question, SUMMARY)
+
+
+@pytest.mark.parametrize("question", [
+    "Tips saving on food?",
+    "Bagaimana cara hemat sisa budget?",
+    "Rekomendasi tempat makan murah di Bali",
+])
+def test_other_questions_go_to_the_model(question):
+    assert local_answer(question, SUMMARY) is None
+
+
+def test_response_cache_ttl_and_lru(ledger):
+    now = [datetime(2025, 6, 1, 8, 0)]
+    cache = ResponseCache(ttl=timedelta(hours=1), max_entries=2, clock=lambda: now[0])
+    cache.put('a', "q a", "answer a")
+    cache.put('b', "q b", "answer b")
+    now[0] += timedelta(minutes=1)
+    assert cache.get('a') == "answer a"
+    cache.put('c', "q c", "answer c")
+    # 'b' paling lama tidak dipakai
+    assert cache.get('b') is None
+    assert cache.get('a') == "answer a"
+    now[0] += timedelta(hours=2)
+    assert cache.get('c') is None
+    assert cache.stats() == {'entries': 1, 'hits': 2, 'misses': 2}
+
+
+def test_identical_requests_share_one_call():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def ask():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "jawaban"
+
+    async def run():
+        return await asyncio.gather(coalescer.run('k', ask), coalescer.run('k', ask), coalescer.run('other', ask))
+
+    assert asyncio.run(run()) == ["jawaban"] * 3
+    assert len(calls) == 2
+    assert coalescer.coalesced == 1
+    assert not coalescer.in_flight('k')
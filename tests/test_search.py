@@ -0,0 +1,83 @@
+import pytest
+from pony.orm import db_session
+
+from chatbotcrud.models import db
+from chatbotcrud.search import bulk_index, match_expression, search_transactions
+
+
+def descriptions(text):
+    return [row[1] for row in search_transactions(text)]
+
+
+def assert_index_consistent():
+    with db_session:
+        db.execute('INSERT INTO "TransactionSearch" ("TransactionSearch") VALUES (\'integrity-check\')')
+
+
+@pytest.mark.parametrize('text,expected', [
+    ("kop", '"kop"*'),
+    ("Kopi susu", '"kopi" "susu"*'),
+    ("kopi ", '"kopi"'),
+    ('nasi" OR x*', '"nasi" "or"'),
+    ("a", None),
+    ("  ", None),
+])
+def test_match_expression(text, expected):
+    assert match_expression(text) == expected
+
+
+def test_prefix_search_is_ranked_and_accent_insensitive(service):
+    service.add_transaction("Café latte", 45000, 'IDR', "Makanan & Minuman")
+    service.add_transaction("Kopi susu", 20000, 'IDR', "Makanan & Minuman")
+    service.add_transaction("Oleh-oleh kopi Bali", 150000, 'IDR', "Belanja")
+    service.add_transaction("Taxi bandara", 120000, 'IDR', "Transportasi")
+
+    assert descriptions("cafe") == ["Café latte"]
+    assert set(descriptions("ko")) == {"Kopi susu", "Oleh-oleh kopi Bali"}
+    assert descriptions("kopi bal") == ["Oleh-oleh kopi Bali"]
+    assert descriptions("transport") == ["Taxi bandara"]
+    assert descriptions("sushi") == []
+    # Kecocokan di deskripsi lebih berbobot daripada di kategori
+    service.add_transaction("Belanja oleh-oleh", 90000, 'IDR', "Belanja")
+    assert descriptions("belanja")[0] == "Belanja oleh-oleh"
+    assert service.search("taxi")[0][5] == "Transportasi"
+
+
+def test_older_matches_are_ranked_when_the_window_fills(service):
+    service.add_transaction("Kopi", 20000, 'IDR', "Makanan & Minuman")
+    for i in range(5):
+        service.add_transaction(f"Oleh-oleh kopi bubuk {i}", 90000, 'IDR', "Belanja")
+
+    assert search_transactions("kopi", window=3, max_window=10)[0][1] == "Kopi"
+    # Lebih banyak kecocokan daripada max_window: hanya yang terbaru diranking
+    assert "Kopi" not in [row[1] for row in search_transactions("kopi", window=3, max_window=5)]
+
+
+def test_triggers_keep_the_index_in_sync(service):
+    transaction_id = service.add_transaction("Ramen Ichiran", 1200, 'JPY', "Makanan & Minuman")
+    service.update_transaction(transaction_id, "Sushi Jiro", 3000, 'JPY', "Makanan & Minuman")
+    assert descriptions("ramen") == []
+    assert descriptions("sushi") == ["Sushi Jiro"]
+
+    # Penulisan lewat SQL mentah (import massal) juga terindeks
+    with db_session:
+        db.execute('INSERT INTO "Transaction" ("description", "amount", "currency", "amount_home_currency",'
+                   ' "category", "timestamp") VALUES (\'Sushi train\', 900, \'JPY\', 90000, \'Makanan & Minuman\','
+                   ' \'2025-05-26 12:00:00\')')
+    assert set(descriptions("sushi")) == {"Sushi Jiro", "Sushi train"}
+
+    service.delete_transaction(transaction_id)
+    assert descriptions("sushi") == ["Sushi train"]
+    assert_index_consistent()
+
+
+def test_bulk_index_indexes_inserted_rows_at_the_end(service):
+    service.add_transaction("Kopi tubruk", 15000, 'IDR', "Makanan & Minuman")
+    with db_session, bulk_index():
+        db.get_connection().executemany(
+            'INSERT INTO "Transaction" ("description", "amount", "currency", "amount_home_currency",'
+            ' "category", "timestamp") VALUES (?, 1, \'IDR\', 1, \'Belanja\', \'2025-05-26 12:00:00\')',
+            [(f"Kopi luwak {i}",) for i in range(50)])
+        assert descriptions("luwak") == []
+    assert len(search_transactions("kopi", limit=100)) == 51
+    assert_index_consistent()
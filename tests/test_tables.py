@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+
+from chatbotcrud.tables import apply_rows, count_widgets, transaction_rows
+
+sources = pytest.importorskip("toga.sources")
+
+
+class Recorder:
+    """ListSource listener that records change notifications."""
+
+    def __init__(self):
+        self.events = []
+
+    def change(self, item):
+        self.events.append(('change', item.name))
+
+    def insert(self, index, item):
+        self.events.append(('insert', item.name))
+
+    def remove(self, index, item):
+        self.events.append(('remove', item.name))
+
+    def clear(self):
+        self.events.append(('clear', None))
+
+
+def make_source(rows):
+    source = sources.ListSource(accessors=['name', 'amount'], data=rows)
+    recorder = Recorder()
+    source.add_listener(recorder)
+    return source, recorder
+
+
+def test_unchanged_rows_are_not_touched():
+    source, recorder = make_source([{'name': 'a', 'amount': '1'}, {'name': 'b', 'amount': '2'}])
+    assert apply_rows(source, [{'name': 'a', 'amount': '1'}, {'name': 'b', 'amount': '2'}]) == 0
+    assert recorder.events == []
+
+
+def test_changes_appends_and_removals_are_row_level():
+    source, recorder = make_source([{'name': 'a', 'amount': '1'}, {'name': 'b', 'amount': '2'},
+                                    {'name': 'c', 'amount': '3'}])
+    assert apply_rows(source, [{'name': 'a', 'amount': '5'}, {'name': 'b', 'amount': '2'}]) == 2
+    assert recorder.events == [('change', 'a'), ('remove', 'c')]
+
+    recorder.events.clear()
+    apply_rows(source, [{'name': 'a', 'amount': '5'}, {'name': 'b', 'amount': '2'}, {'name': 'd', 'amount': '4'}])
+    assert recorder.events == [('insert', 'd')]
+    assert [(row.name, row.amount) for row in source] == [('a', '5'), ('b', '2'), ('d', '4')]
+
+
+
+def test_keyed_rows_keep_their_identity():
+    source, recorder = make_source([{'name': 'a', 'amount': '1'}, {'name': 'b', 'amount': '2'},
+                                    {'name': 'c', 'amount': '3'}])
+    b, c = source[1], source[2]
+    assert apply_rows(source, [{'name': 'b', 'amount': '2'}, {'name': 'c', 'amount': '4'}], key='name') == 2
+    assert recorder.events == [('remove', 'a'), ('change', 'c')]
+    assert list(source) == [b, c]
+
+    recorder.events.clear()
+    apply_rows(source, [{'name': 'c', 'amount': '4'}, {'name': 'd', 'amount': '5'}, {'name': 'b', 'amount': '2'}],
+               key='name')
+    assert [(row.name, row.amount) for row in source] == [('c', '4'), ('d', '5'), ('b', '2')]
+    assert source[2] is b
+    assert recorder.events == [('remove', 'c'), ('insert', 'c'), ('insert', 'd')]
+
+
+def test_rows_without_a_key_are_replaced():
+    source, recorder = make_source([{'name': None, 'amount': '1'}, {'name': 'a', 'amount': '2'}])
+    apply_rows(source, [{'name': None, 'amount': '1'}, {'name': 'a', 'amount': '2'}], key='name')
+    assert recorder.events == [('remove', None), ('insert', None)]
+    assert [(row.name, row.amount) for row in source] == [(None, '1'), ('a', '2')]
+
+def test_count_widgets():
+    class Widget:
+        def __init__(self, *children):
+            self.children = list(children)
+
+    assert count_widgets(Widget(Widget(), Widget(Widget(), Widget()))) == 5
+
+
+def test_transaction_rows_show_home_amount_for_foreign_currency():
+    rows = transaction_rows([
+        (1, "Lunch", 25000.0, 'IDR', 25000.0, "Makanan & Minuman", datetime(2025, 5, 26, 12, 5)),
+        (2, "A very long description of a souvenir shop", 12.5, 'USD', 200000.0, "Souvenir",
+         datetime(2025, 5, 27, 9, 0)),
+    ], 'IDR')
+    assert rows[0]['amount'] == "25,000 IDR" and rows[0]['date'] == "05/26 12:05"
+    assert rows[1]['amount'] == "12.50 USD (≈200,000 IDR)"
+    assert rows[1]['description'] == "A very long description of a s..."
+    assert rows[1]['transaction_id'] == 2
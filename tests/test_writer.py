@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+
+from chatbotcrud.aggregates import verify_rollup
+from chatbotcrud.diagnostics import statement_listener
+from chatbotcrud.writer import LedgerWriter, WriteCommand, overlay_rows, overlay_summary
+
+
+def test_queued_writes_share_one_commit(service):
+    writer = LedgerWriter(service, batch_window=0.05)
+    results = []
+    for i in range(10):
+        writer.submit('add_transaction', f"Coffee {i}", 25000, 'IDR', "Makanan & Minuman",
+                      on_done=lambda result, error: results.append((result, error)))
+    statements = []
+    with statement_listener(statements.append):
+        writer.start()
+        writer.stop()
+    assert writer.stats() == {'batches': 1, 'commands': 10, 'failures': 0, 'pending': 0}
+    assert sum(sql == 'COMMIT' for sql in statements) == 1
+    assert [error for _, error in results] == [None] * 10
+    assert len({result for result, _ in results}) == 10
+    assert service.summary()['total_spent'] == 250000
+
+
+def test_failed_command_does_not_sink_its_batch(service):
+    writer = LedgerWriter(service, batch_window=0.05)
+    outcomes = []
+    for amount in (1000, -5, 2000):
+        writer.submit('add_transaction', "Snack", amount, 'IDR', "Makanan & Minuman",
+                      on_done=lambda result, error: outcomes.append(error))
+    writer.start()
+    writer.stop()
+    assert outcomes[0] is None and outcomes[2] is None
+    assert isinstance(outcomes[1], ValueError)
+    assert writer.failures == 1
+    assert service.summary()['total_spent'] == 3000
+    assert verify_rollup() == []
+
+
+def test_overlay_shows_pending_changes():
+    now = datetime(2025, 6, 1, 12, 0)
+    yesterday = now - timedelta(days=1)
+    summary = {'total_spent': 500.0, 'today_spent': 0.0, 'travel_budget': 1000.0, 'remaining': 500.0,
+               'home_currency': 'IDR', 'categories': [("Belanja", 300.0, 2), ("Transportasi", 200.0, 1)]}
+    rows = [(2, "Bus", 200.0, 'IDR', 200.0, "Transportasi", yesterday),
+            (1, "Shirt", 150.0, 'IDR', 150.0, "Belanja", yesterday)]
+    added = (None, "Ramen", 80.0, 'IDR', 80.0, "Makanan & Minuman", now)
+    pending = [
+        WriteCommand('add_transaction', (), row=added),
+        WriteCommand('delete_transaction', (2,), previous=rows[0]),
+        WriteCommand('save_settings', ('IDR', 2000.0)),
+    ]
+    view = overlay_summary(summary, pending, now=now)
+    assert view['total_spent'] == 380.0
+    assert view['today_spent'] == 80.0
+    assert view['remaining'] == 1620.0
+    assert view['categories'] == [("Belanja", 300.0, 2), ("Makanan & Minuman", 80.0, 1)]
+    assert [row[1] for row in overlay_rows(rows, pending)] == ["Ramen", "Shirt"]
+    assert [row[1] for row in overlay_rows(rows, pending, newest=False)] == ["Shirt"]
+
+    for command in pending:
+        command.done = True
+    assert overlay_summary(summary, pending, now=now)['total_spent'] == 500.0
+    assert overlay_rows(rows, pending) == rows